@@ -1,6 +1,16 @@
 from django.contrib import admin
 
-from planner.models import CityCoordinate, FuelStation
+from planner.models import (
+    CachedRoute,
+    CityCoordinate,
+    FuelPriceHistory,
+    FuelStation,
+    GeocodeResult,
+    RegionalPriceSummary,
+    RegionVersion,
+)
+from planner.services.price_regions import publish_region_changes, region_cell
+from planner.services.price_summary import refresh_price_summaries
 
 
 @admin.register(CityCoordinate)
@@ -9,6 +19,13 @@ class CityCoordinateAdmin(admin.ModelAdmin):
     search_fields = ("city", "state")
 
 
+@admin.register(GeocodeResult)
+class GeocodeResultAdmin(admin.ModelAdmin):
+    list_display = ("query", "source", "latitude", "longitude", "confidence", "expires_at", "updated_at")
+    list_filter = ("source",)
+    search_fields = ("query", "display_name")
+
+
 @admin.register(FuelStation)
 class FuelStationAdmin(admin.ModelAdmin):
     list_display = (
@@ -21,3 +38,56 @@ class FuelStationAdmin(admin.ModelAdmin):
     )
     list_filter = ("state",)
     search_fields = ("truckstop_name", "city", "state", "address")
+
+    # Manual edits invalidate cached route candidates and refresh price summaries the same way imports do.
+    def save_model(self, request, obj, form, change):
+        states, cells = [obj.state], [region_cell(obj.latitude, obj.longitude)]
+        if change:
+            previous = FuelStation.objects.filter(pk=obj.pk).values_list("state", "latitude", "longitude").first()
+            if previous:
+                states.append(previous[0])
+                cells.append(region_cell(previous[1], previous[2]))
+        super().save_model(request, obj, form, change)
+        self._regions_changed(states, cells)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._regions_changed([obj.state], [region_cell(obj.latitude, obj.longitude)])
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list("state", "latitude", "longitude").distinct())
+        super().delete_queryset(request, queryset)
+        self._regions_changed(
+            [state for state, _, _ in rows], [region_cell(latitude, longitude) for _, latitude, longitude in rows]
+        )
+
+    def _regions_changed(self, states, cells):
+        publish_region_changes(cells)
+        refresh_price_summaries(states, cells)
+
+
+@admin.register(FuelPriceHistory)
+class FuelPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ("opis_truckstop_id", "rack_id", "effective_date", "price_tenths_cent")
+    search_fields = ("opis_truckstop_id",)
+    date_hierarchy = "effective_date"
+
+
+@admin.register(RegionalPriceSummary)
+class RegionalPriceSummaryAdmin(admin.ModelAdmin):
+    list_display = ("level", "region", "min_price", "median_price", "avg_price", "station_count", "updated_at")
+    list_filter = ("level",)
+    search_fields = ("region",)
+
+
+@admin.register(RegionVersion)
+class RegionVersionAdmin(admin.ModelAdmin):
+    list_display = ("region", "version", "updated_at")
+    search_fields = ("region",)
+
+
+@admin.register(CachedRoute)
+class CachedRouteAdmin(admin.ModelAdmin):
+    list_display = ("cache_key", "provider", "distance_miles", "size_bytes", "last_accessed_at")
+    list_filter = ("provider",)
+    exclude = ("geometry",)
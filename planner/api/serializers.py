@@ -2,6 +2,8 @@ from django.conf import settings
 from rest_framework import serializers
 
 EPSILON = 1e-6
+MAX_ROUTE_ALTERNATIVES = 3
+MAX_LOCATION_SUGGESTIONS = 20
 
 
 class TripPlanRequestSerializer(serializers.Serializer):
@@ -30,6 +32,17 @@ class TripPlanRequestSerializer(serializers.Serializer):
         default=settings.DEFAULT_STOP_PENALTY_USD,
         min_value=0,
     )
+    route_alternatives = serializers.IntegerField(
+        default=0,
+        min_value=0,
+        max_value=MAX_ROUTE_ALTERNATIVES,
+    )
+    time_value_usd_per_hour = serializers.FloatField(
+        default=settings.DEFAULT_TIME_VALUE_USD_PER_HOUR,
+        min_value=0,
+    )
+    refine_detours = serializers.BooleanField(default=settings.DEFAULT_REFINE_DETOURS)
+    as_of = serializers.DateField(required=False, allow_null=True, default=None)
 
     def validate(self, attrs):
         if not settings.ENFORCE_ASSIGNMENT_CONSTRAINTS:
@@ -48,3 +61,34 @@ class TripPlanRequestSerializer(serializers.Serializer):
             raise serializers.ValidationError(errors)
 
         return attrs
+
+
+class TripPlanBatchRequestSerializer(serializers.Serializer):
+    items = serializers.ListField(
+        child=TripPlanRequestSerializer(),
+        min_length=1,
+        max_length=settings.TRIP_PLAN_BATCH_MAX_ITEMS,
+    )
+
+
+class GeocodeBatchRequestSerializer(serializers.Serializer):
+    locations = serializers.ListField(
+        child=serializers.CharField(max_length=255, allow_blank=True, trim_whitespace=False),
+        min_length=1,
+        max_length=settings.GEOCODE_BATCH_MAX_LOCATIONS,
+    )
+
+
+class LocationSuggestQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=128, trim_whitespace=False)
+    limit = serializers.IntegerField(default=8, min_value=1, max_value=MAX_LOCATION_SUGGESTIONS)
+
+
+class PriceSummaryQuerySerializer(serializers.Serializer):
+    level = serializers.ChoiceField(choices=["state", "cell"], default="state")
+    state = serializers.CharField(max_length=8, required=False)
+
+    def validate(self, attrs):
+        if "state" in attrs and attrs["level"] != "state":
+            raise serializers.ValidationError({"state": "Only supported with level=state."})
+        return attrs
@@ -1,7 +1,17 @@
 from django.urls import path
 
-from planner.api.views import TripPlanView
+from planner.api.views import (
+    GeocodeBatchView,
+    LocationSuggestView,
+    PriceSummaryView,
+    TripPlanBatchView,
+    TripPlanView,
+)
 
 urlpatterns = [
     path("trip-plan/", TripPlanView.as_view(), name="trip-plan"),
+    path("trip-plans/batch/", TripPlanBatchView.as_view(), name="trip-plan-batch"),
+    path("geocode/batch/", GeocodeBatchView.as_view(), name="geocode-batch"),
+    path("locations/suggest/", LocationSuggestView.as_view(), name="location-suggest"),
+    path("prices/summary/", PriceSummaryView.as_view(), name="price-summary"),
 ]
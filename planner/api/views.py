@@ -1,16 +1,59 @@
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import OpenApiResponse, extend_schema
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from requests import HTTPError, RequestException
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from planner.api.serializers import TripPlanRequestSerializer
-from planner.domain.optimizer import FuelPlanningError
-from planner.services.geocoding import GeocodingError
-from planner.services.routing import RoutingError
+from planner.api.serializers import (
+    GeocodeBatchRequestSerializer,
+    LocationSuggestQuerySerializer,
+    PriceSummaryQuerySerializer,
+    TripPlanBatchRequestSerializer,
+    TripPlanRequestSerializer,
+)
+from planner.models import RegionalPriceSummary
+from planner.services.batch_planner import PLAN_ERRORS, build_trip_plans
+from planner.services.geocoding import GeocodingError, iter_geocode_many, suggest_locations
+from planner.services.price_regions import cell_bounds
+from planner.services.rate_limit import RateLimitExceeded
 from planner.services.trip_planner import build_trip_plan
 
+SUGGEST_CACHE_SECONDS = 60 * 60
+PRICE_SUMMARY_CACHE_SECONDS = 15 * 60
+
+
+def _trip_plan_kwargs(payload: dict) -> dict:
+    return {
+        "start_location": payload["start_location"],
+        "end_location": payload["finish_location"],
+        "mpg": payload["mpg"],
+        "max_range_miles": payload["max_range_miles"],
+        "route_mode": payload["route_mode"],
+        "max_stop_detour_miles": payload["max_stop_detour_miles"],
+        "min_stop_gallons": payload["min_stop_gallons"],
+        "stop_penalty_usd": payload["stop_penalty_usd"],
+        "route_alternatives": payload["route_alternatives"],
+        "time_value_usd_per_hour": payload["time_value_usd_per_hour"],
+        "refine_detours": payload["refine_detours"],
+        "as_of": payload["as_of"],
+    }
+
+
+def _plan_error(exc: Exception) -> tuple[int, str]:
+    """HTTP status and detail message for an exception raised while planning a trip."""
+    if isinstance(exc, RateLimitExceeded):
+        return status.HTTP_503_SERVICE_UNAVAILABLE, str(exc)
+    if isinstance(exc, HTTPError):
+        return status.HTTP_502_BAD_GATEWAY, f"External API error: {exc}"
+    if isinstance(exc, RequestException):
+        return status.HTTP_502_BAD_GATEWAY, f"Network error while calling external service: {exc}"
+    return status.HTTP_400_BAD_REQUEST, str(exc)
+
 
 class TripPlanView(APIView):
     @extend_schema(
@@ -19,35 +62,183 @@ class TripPlanView(APIView):
             200: OpenApiResponse(response=OpenApiTypes.OBJECT, description="Trip plan result."),
             400: OpenApiResponse(description="Validation or planning error."),
             502: OpenApiResponse(description="Upstream API/network error."),
+            503: OpenApiResponse(description="Geocoding rate limit queue is full; retry shortly."),
         },
     )
     def post(self, request):
         serializer = TripPlanRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        payload = serializer.validated_data
         try:
-            result = build_trip_plan(
-                start_location=payload["start_location"],
-                end_location=payload["finish_location"],
-                mpg=payload["mpg"],
-                max_range_miles=payload["max_range_miles"],
-                route_mode=payload["route_mode"],
-                max_stop_detour_miles=payload["max_stop_detour_miles"],
-                min_stop_gallons=payload["min_stop_gallons"],
-                stop_penalty_usd=payload["stop_penalty_usd"],
-            )
-        except (GeocodingError, RoutingError, FuelPlanningError) as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-        except HTTPError as exc:
-            return Response(
-                {"detail": f"External API error: {exc}"},
-                status=status.HTTP_502_BAD_GATEWAY,
-            )
-        except RequestException as exc:
-            return Response(
-                {"detail": f"Network error while calling external service: {exc}"},
-                status=status.HTTP_502_BAD_GATEWAY,
-            )
+            result = build_trip_plan(**_trip_plan_kwargs(serializer.validated_data))
+        except PLAN_ERRORS as exc:
+            status_code, detail = _plan_error(exc)
+            headers = {"Retry-After": "1"} if status_code == status.HTTP_503_SERVICE_UNAVAILABLE else None
+            return Response({"detail": detail}, status=status_code, headers=headers)
 
         return Response(result, status=status.HTTP_200_OK)
+
+
+class TripPlanBatchView(APIView):
+    @extend_schema(
+        request=TripPlanBatchRequestSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=OpenApiTypes.OBJECT,
+                description=(
+                    "One entry per item, in order: `index`, `status` and either `plan` or `detail`; "
+                    "`meta` counts the deduplicated geocoding and routing work."
+                ),
+            ),
+            400: OpenApiResponse(description="Validation error (per item under `items`)."),
+        },
+    )
+    def post(self, request):
+        serializer = TripPlanBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        outcomes, stats = build_trip_plans([_trip_plan_kwargs(item) for item in serializer.validated_data["items"]])
+        results = []
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                status_code, detail = _plan_error(outcome)
+                results.append({"index": index, "status": status_code, "detail": detail})
+            else:
+                results.append({"index": index, "status": status.HTTP_200_OK, "plan": outcome})
+
+        return Response(
+            {
+                "results": results,
+                "meta": {
+                    "items": stats.items,
+                    "unique_items": stats.unique_items,
+                    "unique_locations": stats.unique_locations,
+                    "unique_routes": stats.unique_routes,
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class GeocodeBatchView(APIView):
+    @extend_schema(
+        request=GeocodeBatchRequestSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=OpenApiTypes.STR,
+                description=(
+                    "Newline-delimited JSON, one object per location as it resolves: "
+                    "`index`, `query` and either the point fields or `error`."
+                ),
+            ),
+            400: OpenApiResponse(description="Validation error."),
+        },
+    )
+    def post(self, request):
+        serializer = GeocodeBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        locations = serializer.validated_data["locations"]
+
+        def lines():
+            for index, result in iter_geocode_many(locations):
+                item = {"index": index, "query": locations[index]}
+                if isinstance(result, GeocodingError):
+                    item["error"] = str(result)
+                else:
+                    item.update(
+                        latitude=result.latitude,
+                        longitude=result.longitude,
+                        display_name=result.display_name,
+                        source=result.source,
+                        confidence=result.confidence,
+                    )
+                yield json.dumps(item) + "\n"
+
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
+class LocationSuggestView(APIView):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("q", OpenApiTypes.STR, description="City prefix, optionally followed by `, ST`."),
+            OpenApiParameter("limit", OpenApiTypes.INT, description="Maximum suggestions (1-20, default 8)."),
+        ],
+        responses={
+            200: OpenApiResponse(response=OpenApiTypes.OBJECT, description="Ranked `City, ST` suggestions."),
+            400: OpenApiResponse(description="Validation error."),
+        },
+    )
+    def get(self, request):
+        serializer = LocationSuggestQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        query = serializer.validated_data["q"]
+        suggestions = suggest_locations(query, limit=serializer.validated_data["limit"])
+        response = Response(
+            {
+                "query": query,
+                "results": [
+                    {
+                        "label": f"{item.name}, {item.state}",
+                        "city": item.name,
+                        "state": item.state,
+                        "latitude": item.latitude,
+                        "longitude": item.longitude,
+                    }
+                    for item in suggestions
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+        # Place data only changes with a new city index, so keystroke lookups can be cached downstream.
+        patch_cache_control(response, public=True, max_age=SUGGEST_CACHE_SECONDS)
+        return response
+
+
+class PriceSummaryView(APIView):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("level", OpenApiTypes.STR, description="`state` (default) or `cell` (1-degree grid)."),
+            OpenApiParameter("state", OpenApiTypes.STR, description="Only this state (state level only)."),
+        ],
+        responses={
+            200: OpenApiResponse(
+                response=OpenApiTypes.OBJECT,
+                description="Min, median, average price and station count per region, cheapest first.",
+            ),
+            400: OpenApiResponse(description="Validation error."),
+        },
+    )
+    def get(self, request):
+        serializer = PriceSummaryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        level = serializer.validated_data["level"]
+        summaries = RegionalPriceSummary.objects.filter(level=level).order_by("min_price", "region")
+        if "state" in serializer.validated_data:
+            summaries = summaries.filter(region=serializer.validated_data["state"].strip().upper())
+
+        results = []
+        for summary in summaries:
+            item = {
+                "region": summary.region,
+                "min_price": float(summary.min_price),
+                "median_price": float(summary.median_price),
+                "avg_price": float(summary.avg_price),
+                "station_count": summary.station_count,
+            }
+            if level == RegionalPriceSummary.LEVEL_CELL:
+                item["bounds"] = cell_bounds(summary.region)
+            results.append(item)
+
+        response = Response(
+            {
+                "level": level,
+                "updated_at": max((summary.updated_at for summary in summaries), default=None),
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+        # Summaries only change when an import runs, so dashboards can poll through shared caches.
+        patch_cache_control(response, public=True, max_age=PRICE_SUMMARY_CACHE_SECONDS)
+        return response
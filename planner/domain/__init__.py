@@ -1,9 +1,11 @@
 from planner.domain.optimizer import FuelPlanningError, optimize_fuel_plan
-from planner.domain.types import FuelNode, StationCandidate, StopAction
+from planner.domain.types import FuelNode, GeocodedPoint, RouteResult, StationCandidate, StopAction
 
 __all__ = [
     "FuelNode",
     "FuelPlanningError",
+    "GeocodedPoint",
+    "RouteResult",
     "StationCandidate",
     "StopAction",
     "optimize_fuel_plan",
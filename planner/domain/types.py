@@ -30,3 +30,21 @@ class StopAction:
     node: FuelNode
     gallons_purchased: float
     purchase_cost: float
+
+
+@dataclass(frozen=True)
+class RouteResult:
+    distance_miles: float
+    duration_minutes: float
+    geometry: list[list[float]]
+    provider: str
+    cache_key: str = ""
+
+
+@dataclass(frozen=True)
+class GeocodedPoint:
+    latitude: float
+    longitude: float
+    display_name: str
+    source: str
+    confidence: float = 1.0
@@ -0,0 +1,116 @@
+import hashlib
+import resource
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from planner.management.commands.import_fuel_prices import IMPORT_PHASES
+from planner.management.commands.import_fuel_prices import Command as ImportCommand
+from planner.services import geocoding
+from planner.services.city_locator import write_city_index
+from planner.services.synthetic_feed import load_feed_templates, write_synthetic_feed
+
+# Contiguous-US bounds for the placeholder centroids used when no compiled city index exists.
+SYNTHETIC_LAT_RANGE = (25.0, 49.0)
+SYNTHETIC_LON_RANGE = (-124.0, -67.0)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _placeholder_centroid(city: str, state: str) -> tuple[float, float]:
+    digest = hashlib.sha256(f"{state}\t{city}".encode("utf-8")).digest()
+    lat_share = int.from_bytes(digest[:4], "big") / 2**32
+    lon_share = int.from_bytes(digest[4:8], "big") / 2**32
+    return (
+        SYNTHETIC_LAT_RANGE[0] + lat_share * (SYNTHETIC_LAT_RANGE[1] - SYNTHETIC_LAT_RANGE[0]),
+        SYNTHETIC_LON_RANGE[0] + lon_share * (SYNTHETIC_LON_RANGE[1] - SYNTHETIC_LON_RANGE[0]),
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark import_fuel_prices on a synthetic feed in a throwaway database, phase by phase"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Synthetic rows to generate")
+        parser.add_argument("--csv", default=None, help="Import this feed instead of generating one")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the generated feed")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Passed through to import_fuel_prices")
+        parser.add_argument(
+            "--incremental-rerun",
+            action="store_true",
+            help="Import the same feed again with --incremental to time the unchanged-refresh path",
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_path = Path(tmpdir)
+            templates = load_feed_templates(Path(settings.FUEL_DATA_CSV_PATH))
+            if options["csv"]:
+                feed_path = Path(options["csv"]).expanduser().resolve()
+                if not feed_path.exists():
+                    raise CommandError(f"CSV file not found: {feed_path}")
+            else:
+                if options["rows"] < 1:
+                    raise CommandError("--rows must be at least 1")
+                feed_path = tmp_path / "feed.csv"
+                started = time.perf_counter()
+                write_synthetic_feed(feed_path, templates, options["rows"], seed=options["seed"])
+                self.stdout.write(f"Generated {options['rows']} rows in {time.perf_counter() - started:.1f}s")
+
+            index_path = Path(settings.CITY_INDEX_PATH)
+            if not index_path.exists():
+                # Keep the benchmark offline: known template cities get placeholder centroids,
+                # synthetic ones still take the state-centroid fallback like unknown real cities.
+                index_path = tmp_path / "city-index.bin"
+                places = {(state, city) for _, _, city, state, _, _ in templates}
+                write_city_index(
+                    index_path, [(state, city, *_placeholder_centroid(city, state)) for state, city in places]
+                )
+                self.stdout.write(self.style.WARNING(f"No city index at {settings.CITY_INDEX_PATH}; using placeholder"))
+
+            import_options = {"csv": str(feed_path)}
+            if options["chunk_size"]:
+                import_options["chunk_size"] = options["chunk_size"]
+            runs = [("full import", import_options)]
+            if options["incremental_rerun"]:
+                runs.append(("incremental rerun", {**import_options, "incremental": True}))
+
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            previous_locator = geocoding._city_locator
+            geocoding._city_locator = None
+            try:
+                with override_settings(CITY_INDEX_PATH=str(index_path)):
+                    for label, run_options in runs:
+                        self._run_import(label, feed_path, run_options)
+            finally:
+                geocoding._city_locator = previous_locator
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run_import(self, label: str, feed_path: Path, import_options: dict):
+        with feed_path.open(encoding="utf-8") as infile:
+            row_count = sum(1 for _ in infile) - 1
+        command = ImportCommand(stdout=StringIO(), stderr=StringIO())
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        call_command(command, **import_options)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.NOTICE(f"{label}: {row_count} rows in {elapsed:.2f}s"))
+        for phase in IMPORT_PHASES:
+            seconds = command.phase_seconds[phase]
+            self.stdout.write(f"  {phase:<12} {seconds:8.2f}s {seconds / elapsed if elapsed else 0:6.1%}")
+        self.stdout.write(f"  {'rows/s':<12} {row_count / elapsed if elapsed else 0:9.0f}")
+        self.stdout.write(f"  {'peak RSS':<12} {_peak_rss_mb():8.1f} MB (was {rss_before:.1f} MB before import)")
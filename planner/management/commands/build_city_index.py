@@ -0,0 +1,25 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from planner.services.city_locator import compile_city_index
+
+
+class Command(BaseCommand):
+    help = "Compile pgeocode's US postal table into the binary city index used by CityLocator"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=str(settings.CITY_INDEX_PATH),
+            help="Where to write the compiled city index",
+        )
+
+    def handle(self, *args, **options):
+        output_path = Path(options["output"]).expanduser().resolve()
+        started = time.perf_counter()
+        city_count = compile_city_index(output_path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {city_count} city centroids to {output_path} in {elapsed:.1f}s"))
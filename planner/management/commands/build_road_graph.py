@@ -0,0 +1,121 @@
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.services.distance import haversine_miles
+from planner.services.road_graph import RoadGraph
+
+METERS_PER_MILE = 1609.344
+HIGHWAY_SPEEDS_MPH = {
+    "motorway": 65.0,
+    "motorway_link": 45.0,
+    "trunk": 55.0,
+    "trunk_link": 40.0,
+    "primary": 45.0,
+    "primary_link": 35.0,
+    "secondary": 40.0,
+    "secondary_link": 30.0,
+    "tertiary": 35.0,
+    "tertiary_link": 25.0,
+    "unclassified": 30.0,
+    "residential": 25.0,
+}
+IMPLIED_ONEWAY_HIGHWAYS = {"motorway", "motorway_link"}
+
+
+class Command(BaseCommand):
+    help = "Build a contraction-hierarchy road graph for MAP_PROVIDER=local from an OSM XML extract"
+
+    def add_arguments(self, parser):
+        parser.add_argument("osm", help="Path to an .osm XML extract")
+        parser.add_argument(
+            "--output",
+            default=str(settings.LOCAL_ROAD_GRAPH_PATH),
+            help="Where to write the preprocessed graph file",
+        )
+
+    def handle(self, *args, **options):
+        osm_path = Path(options["osm"]).expanduser().resolve()
+        if not osm_path.exists():
+            raise CommandError(f"OSM file not found: {osm_path}")
+
+        started = time.perf_counter()
+        latitudes, longitudes, edges = self._parse_osm(osm_path)
+        if not edges:
+            raise CommandError("No drivable ways found in OSM extract")
+        self.stdout.write(self.style.NOTICE(f"Parsed {len(latitudes)} nodes and {len(edges)} directed road segments"))
+
+        graph = RoadGraph.build(latitudes=latitudes, longitudes=longitudes, edges=edges)
+        output_path = Path(options["output"]).expanduser().resolve()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        graph.save(output_path)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {len(graph.edges)} graph edges to {output_path} in {elapsed:.1f}s")
+        )
+
+    def _parse_osm(
+        self,
+        osm_path: Path,
+    ) -> tuple[list[float], list[float], list[tuple[int, int, float, float]]]:
+        node_coordinates: dict[str, tuple[float, float]] = {}
+        ways: list[tuple[list[str], float, int]] = []
+
+        for _, element in ET.iterparse(osm_path, events=("end",)):
+            if element.tag == "node":
+                node_coordinates[element.attrib["id"]] = (
+                    float(element.attrib["lat"]),
+                    float(element.attrib["lon"]),
+                )
+                element.clear()
+            elif element.tag == "way":
+                tags = {tag.attrib["k"]: tag.attrib["v"] for tag in element.iter("tag")}
+                highway = tags.get("highway")
+                if highway in HIGHWAY_SPEEDS_MPH:
+                    node_refs = [nd.attrib["ref"] for nd in element.iter("nd")]
+                    ways.append((node_refs, HIGHWAY_SPEEDS_MPH[highway], self._oneway_direction(tags, highway)))
+                element.clear()
+
+        node_index: dict[str, int] = {}
+        latitudes: list[float] = []
+        longitudes: list[float] = []
+        edges: list[tuple[int, int, float, float]] = []
+
+        for node_refs, speed_mph, direction in ways:
+            refs = [ref for ref in node_refs if ref in node_coordinates]
+            for source_ref, target_ref in zip(refs, refs[1:], strict=False):
+                for ref in (source_ref, target_ref):
+                    if ref not in node_index:
+                        node_index[ref] = len(latitudes)
+                        latitudes.append(node_coordinates[ref][0])
+                        longitudes.append(node_coordinates[ref][1])
+
+                source_lat, source_lon = node_coordinates[source_ref]
+                target_lat, target_lon = node_coordinates[target_ref]
+                miles = haversine_miles(source_lat, source_lon, target_lat, target_lon)
+                duration_seconds = miles / speed_mph * 3600.0
+                distance_meters = miles * METERS_PER_MILE
+                source = node_index[source_ref]
+                target = node_index[target_ref]
+                if direction >= 0:
+                    edges.append((source, target, duration_seconds, distance_meters))
+                if direction <= 0:
+                    edges.append((target, source, duration_seconds, distance_meters))
+
+        return latitudes, longitudes, edges
+
+    @staticmethod
+    def _oneway_direction(tags: dict[str, str], highway: str) -> int:
+        """Return 1 for forward-only, -1 for reverse-only and 0 for two-way ways."""
+        oneway = tags.get("oneway", "").lower()
+        if oneway in {"yes", "true", "1"}:
+            return 1
+        if oneway == "-1":
+            return -1
+        if oneway == "no":
+            return 0
+        return 1 if highway in IMPLIED_ONEWAY_HIGHWAYS else 0
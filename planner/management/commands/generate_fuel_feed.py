@@ -0,0 +1,69 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.services.synthetic_feed import (
+    DEFAULT_DUPLICATE_RATE,
+    DEFAULT_INVALID_PRICE_RATE,
+    DEFAULT_UNKNOWN_CITY_RATE,
+    load_feed_templates,
+    write_synthetic_feed,
+)
+
+
+class Command(BaseCommand):
+    help = "Write a synthetic OPIS-format fuel price feed modelled on a real one, for import benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", required=True, help="Where to write the synthetic CSV")
+        parser.add_argument("--rows", type=int, default=100_000, help="Data rows to generate")
+        parser.add_argument(
+            "--template-csv",
+            default=str(settings.FUEL_DATA_CSV_PATH),
+            help="Real feed whose stations, cities, racks and prices seed the generator",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; equal seeds give identical feeds")
+        parser.add_argument(
+            "--duplicate-rate",
+            type=float,
+            default=DEFAULT_DUPLICATE_RATE,
+            help="Share of rows repeating an earlier truckstop ID",
+        )
+        parser.add_argument(
+            "--unknown-city-rate",
+            type=float,
+            default=DEFAULT_UNKNOWN_CITY_RATE,
+            help="Share of new stations placed in a city the geocoder does not know",
+        )
+        parser.add_argument(
+            "--invalid-price-rate",
+            type=float,
+            default=DEFAULT_INVALID_PRICE_RATE,
+            help="Share of rows with an unparseable price",
+        )
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1:
+            raise CommandError("--rows must be at least 1")
+        template_path = Path(options["template_csv"]).expanduser().resolve()
+        if not template_path.exists():
+            raise CommandError(f"Template CSV not found: {template_path}")
+        templates = load_feed_templates(template_path)
+        if not templates:
+            raise CommandError("Template CSV has no usable rows")
+
+        output_path = Path(options["output"]).expanduser().resolve()
+        started = time.perf_counter()
+        written = write_synthetic_feed(
+            output_path,
+            templates,
+            options["rows"],
+            seed=options["seed"],
+            duplicate_rate=options["duplicate_rate"],
+            unknown_city_rate=options["unknown_city_rate"],
+            invalid_price_rate=options["invalid_price_rate"],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rows to {output_path} in {elapsed:.1f}s"))
@@ -1,13 +1,39 @@
 import csv
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from datetime import date
 from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
 from pathlib import Path
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 
-from planner.models import CityCoordinate, FuelStation
-from planner.services.city_locator import CityLocator
+from planner.models import CityCoordinate, FuelStation, price_micros
+from planner.services.geocoding import get_city_locator
+from planner.services.price_history import STATION_RACK, record_price_changes
+from planner.services.price_regions import publish_region_changes, region_cell
+from planner.services.price_summary import rebuild_price_summaries, refresh_price_summaries
+
+DEFAULT_CHUNK_SIZE = 2000
+PRICE_QUANTUM = Decimal("0.000001")
+DEDUPE_POLICIES = ("min-price", "latest", "per-rack")
+IMPORT_PHASES = ("parse", "coordinates", "build", "write", "retire", "summary")
+UPSERT_FIELDS = [
+    "truckstop_name",
+    "address",
+    "city",
+    "state",
+    "rack_id",
+    "retail_price",
+    "retail_price_micros",
+    "latitude",
+    "longitude",
+]
 
 
 class Command(BaseCommand):
@@ -35,70 +61,223 @@ class Command(BaseCommand):
             default=None,
             help="Optional row cap for local testing",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows read, geocoded and inserted per batch",
+        )
+        parser.add_argument(
+            "--commit-per-chunk",
+            action="store_true",
+            help="Commit after every chunk instead of wrapping the whole import in one transaction",
+        )
+        parser.add_argument(
+            "--dedupe",
+            choices=DEDUPE_POLICIES,
+            default="min-price",
+            help=(
+                "How repeated OPIS truckstop IDs collapse: keep the lowest price, the latest feed row, "
+                "or one row per rack"
+            ),
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Upsert by station key: insert new stations, update changed ones, leave the rest",
+        )
+        parser.add_argument(
+            "--retire-missing",
+            action="store_true",
+            help="With --incremental, delete stations whose key is absent from the feed",
+        )
+        parser.add_argument(
+            "--effective-date",
+            type=date.fromisoformat,
+            default=None,
+            help="Date (YYYY-MM-DD) the feed's prices took effect, for the price history; defaults to today",
+        )
+        parser.add_argument(
+            "--geocode-processes",
+            type=int,
+            default=1,
+            help="Worker processes for resolving new city/state pairs (used for chunks with 10k+ new pairs)",
+        )
 
     def handle(self, *args, **options):
         csv_path = Path(options["csv"]).expanduser().resolve()
         if not csv_path.exists():
             raise CommandError(f"CSV file not found: {csv_path}")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        incremental = options["incremental"]
+        if incremental and options["clear"]:
+            raise CommandError("--incremental and --clear are mutually exclusive")
+        if options["retire_missing"] and not incremental:
+            raise CommandError("--retire-missing requires --incremental")
+        if options["retire_missing"] and options["limit"]:
+            raise CommandError("--retire-missing cannot be combined with --limit; it would retire every unread row")
 
-        rows, unique_cities = self._load_rows(csv_path=csv_path, limit=options["limit"])
-        if not rows:
+        rows = self._iter_rows(csv_path=csv_path, limit=options["limit"])
+        first_row = next(rows, None)
+        if first_row is None:
             raise CommandError("No rows found in CSV")
+        rows = chain([first_row], rows)
 
-        self.stdout.write(self.style.NOTICE(f"Loaded {len(rows)} rows from CSV"))
-        self.stdout.write(self.style.NOTICE(f"Unique city/state pairs: {len(unique_cities)}"))
-
-        with transaction.atomic():
-            if options["clear"]:
-                deleted = FuelStation.objects.all().delete()[0]
-                self.stdout.write(self.style.WARNING(f"Deleted {deleted} FuelStation rows"))
-            elif FuelStation.objects.exists():
-                raise CommandError("FuelStation table is not empty. Use --clear to avoid duplicate imports.")
-
-            if options["clear_city_cache"]:
-                deleted = CityCoordinate.objects.all().delete()[0]
-                self.stdout.write(self.style.WARNING(f"Deleted {deleted} CityCoordinate rows"))
-
-            self._ensure_city_coordinates(unique_cities)
-            coordinate_map = {
-                (coord.city.lower(), coord.state): coord
-                for coord in CityCoordinate.objects.filter(
-                    city__in=[city for city, _ in unique_cities],
-                    state__in=[state for _, state in unique_cities],
-                )
-            }
+        self._geocode_processes = options["geocode_processes"]
+        self._dedupe = options["dedupe"]
+        self._effective_date = options["effective_date"] or timezone.localdate()
+        self._changed_regions: set[str] = set()
+        self._changed_states: set[str] = set()
+        # Wall-clock seconds per import phase; printed with --verbosity 2 and read by `benchmark_import`.
+        self.phase_seconds: dict[str, float] = defaultdict(float)
+        coordinate_cache: dict[tuple[str, str], tuple[float, float] | None] = {}
+        processed = 0
+        skipped = 0
+        resolved_cities = 0
+        counts = {
+            "inserted": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "merged": 0,
+            "duplicates_removed": 0,
+            "price_changes": 0,
+        }
+        seen_keys: set[tuple[str, ...]] = set()
+        # Every station the feed lists, including rows skipped for bad data, so a bad row never retires its station.
+        listed_keys: set[tuple[str, ...]] = set()
+
+        # Per-chunk commits keep locks and rollback state small, at the cost of a partially
+        # imported table if the run fails midway.
+        outer_transaction = nullcontext() if options["commit_per_chunk"] else transaction.atomic()
+        with outer_transaction:
+            with transaction.atomic():
+                if options["clear"]:
+                    self._publish_regions(
+                        region_cell(latitude, longitude)
+                        for latitude, longitude in FuelStation.objects.values_list("latitude", "longitude").distinct()
+                    )
+                    deleted = FuelStation.objects.all().delete()[0]
+                    self.stdout.write(self.style.WARNING(f"Deleted {deleted} FuelStation rows"))
+                elif not incremental and FuelStation.objects.exists():
+                    raise CommandError("FuelStation table is not empty. Use --clear to avoid duplicate imports.")
+
+                if options["clear_city_cache"]:
+                    deleted = CityCoordinate.objects.all().delete()[0]
+                    self.stdout.write(self.style.WARNING(f"Deleted {deleted} CityCoordinate rows"))
+
+            chunks = self._timed_iter(self._iter_chunks(rows, options["chunk_size"]), "parse")
+            for chunk_number, chunk in enumerate(chunks, start=1):
+                if options["retire_missing"]:
+                    listed_keys.update(
+                        self._key(row["OPIS Truckstop ID"].strip(), row["Rack ID"].strip())
+                        for row in chunk
+                        if row["OPIS Truckstop ID"].strip()
+                    )
+                with transaction.atomic():
+                    with self._timed("coordinates"):
+                        resolved_cities += self._resolve_chunk_coordinates(chunk, coordinate_cache)
+                    with self._timed("build"):
+                        stations, chunk_skipped = self._build_station_rows(chunk, coordinate_cache)
+                    with self._timed("write"):
+                        self._upsert_stations(stations, seen_keys, counts)
+                processed += len(stations)
+                skipped += chunk_skipped
+                self.stdout.write(f"Chunk {chunk_number}: {processed} rows processed, {skipped} skipped")
 
-            stations, skipped = self._build_station_rows(rows, coordinate_map)
-            FuelStation.objects.bulk_create(stations, batch_size=1000)
+            retired = 0
+            if options["retire_missing"]:
+                with transaction.atomic(), self._timed("retire"):
+                    retired = self._retire_missing(listed_keys)
 
+            with self._timed("summary"):
+                if incremental:
+                    # Only regions whose stations changed; their cells are exactly the ones just published.
+                    summaries = refresh_price_summaries(self._changed_states, self._changed_regions)
+                else:
+                    summaries = rebuild_price_summaries()
+
+        self.stdout.write(f"{'Refreshed' if incremental else 'Rebuilt'} {summaries} regional price summaries")
+        if resolved_cities:
+            self.stdout.write(self.style.SUCCESS(f"Stored {resolved_cities} city coordinate cache rows"))
+        if counts["merged"]:
+            self.stdout.write(
+                self.style.NOTICE(f"Merged {counts['merged']} repeated station rows ({self._dedupe} policy)")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Inserted {counts['inserted']}, updated {counts['updated']}, "
+                f"unchanged {counts['unchanged']}, retired {retired} fuel stations "
+                f"({counts['duplicates_removed']} duplicate rows removed). "
+                f"Skipped {skipped} rows with invalid data."
+            )
+        )
         self.stdout.write(
-            self.style.SUCCESS(f"Imported {len(stations)} fuel stations. Skipped {skipped} rows with invalid data.")
+            f"Logged {counts['price_changes']} price changes effective {self._effective_date.isoformat()}; "
+            f"invalidated cached candidates in {len(self._changed_regions)} price regions"
         )
+        if options["verbosity"] > 1:
+            self.stdout.write(
+                "Phase timings: " + ", ".join(f"{phase} {self.phase_seconds[phase]:.2f}s" for phase in IMPORT_PHASES)
+            )
 
-    def _load_rows(
-        self,
-        csv_path: Path,
-        limit: int | None,
-    ) -> tuple[list[dict[str, str]], set[tuple[str, str]]]:
-        rows: list[dict[str, str]] = []
-        unique_cities: set[tuple[str, str]] = set()
+    @contextmanager
+    def _timed(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[phase] += time.perf_counter() - started
 
+    def _timed_iter(self, items: Iterable, phase: str) -> Iterator:
+        """Yield from `items`, charging the time spent producing each item to `phase`."""
+        iterator = iter(items)
+        while True:
+            with self._timed(phase):
+                item = next(iterator, None)
+            if item is None:
+                return
+            yield item
+
+    def _iter_rows(self, csv_path: Path, limit: int | None) -> Iterator[dict[str, str]]:
         with csv_path.open(encoding="utf-8-sig", newline="") as infile:
-            reader = csv.DictReader(infile)
-            for row in reader:
-                rows.append(row)
-                city = row["City"].strip()
-                state = row["State"].strip().upper()
-                unique_cities.add((city, state))
-                if limit and len(rows) >= limit:
-                    break
+            rows = csv.DictReader(infile)
+            yield from islice(rows, limit) if limit else rows
+
+    @staticmethod
+    def _iter_chunks(rows: Iterable[dict[str, str]], size: int) -> Iterator[list[dict[str, str]]]:
+        iterator = iter(rows)
+        while chunk := list(islice(iterator, size)):
+            yield chunk
 
-        return rows, unique_cities
+    def _resolve_chunk_coordinates(
+        self,
+        chunk: list[dict[str, str]],
+        coordinate_cache: dict[tuple[str, str], tuple[float, float] | None],
+    ) -> int:
+        """Fill `coordinate_cache` for the chunk's unseen city/state pairs; returns rows newly stored."""
+        unseen = {
+            (row["City"].strip(), row["State"].strip().upper())
+            for row in chunk
+            if (row["City"].strip().lower(), row["State"].strip().upper()) not in coordinate_cache
+        }
+        if not unseen:
+            return 0
+
+        stored = self._ensure_city_coordinates(unseen)
+        for city, state in unseen:
+            coordinate_cache[(city.lower(), state)] = None
+        for coord in CityCoordinate.objects.filter(
+            city__in=[city for city, _ in unseen],
+            state__in=[state for _, state in unseen],
+        ):
+            coordinate_cache[(coord.city.lower(), coord.state)] = (coord.latitude, coord.longitude)
+        return stored
 
     def _build_station_rows(
         self,
         rows: list[dict[str, str]],
-        coordinate_map: dict[tuple[str, str], CityCoordinate],
+        coordinate_cache: dict[tuple[str, str], tuple[float, float] | None],
     ) -> tuple[list[FuelStation], int]:
         stations: list[FuelStation] = []
         skipped_rows = 0
@@ -108,14 +287,13 @@ class Command(BaseCommand):
             state = row["State"].strip().upper()
 
             try:
-                retail_price = Decimal(row["Retail Price"].strip())
+                # Quantize to the column's precision so incremental runs compare like with like.
+                retail_price = Decimal(row["Retail Price"].strip()).quantize(PRICE_QUANTUM)
             except (InvalidOperation, AttributeError):
                 skipped_rows += 1
                 continue
 
-            coord = coordinate_map.get((city.lower(), state))
-            latitude = coord.latitude if coord else None
-            longitude = coord.longitude if coord else None
+            latitude, longitude = coordinate_cache.get((city.lower(), state)) or (None, None)
 
             stations.append(
                 FuelStation(
@@ -126,6 +304,7 @@ class Command(BaseCommand):
                     state=state,
                     rack_id=row["Rack ID"].strip(),
                     retail_price=retail_price,
+                    retail_price_micros=price_micros(retail_price),
                     latitude=latitude,
                     longitude=longitude,
                 )
@@ -133,7 +312,121 @@ class Command(BaseCommand):
 
         return stations, skipped_rows
 
-    def _ensure_city_coordinates(self, unique_cities: set[tuple[str, str]]):
+    def _key(self, opis_id: str, rack_id: str) -> tuple[str, ...]:
+        if self._dedupe == "per-rack":
+            return (opis_id, rack_id)
+        return (opis_id,)
+
+    def _station_key(self, station: FuelStation) -> tuple[str, ...]:
+        return self._key(station.opis_truckstop_id, station.rack_id)
+
+    def _history_rack(self, station: FuelStation) -> str:
+        return station.rack_id if self._dedupe == "per-rack" else STATION_RACK
+
+    def _prefers(self, candidate: FuelStation, current: FuelStation) -> bool:
+        """Whether a repeated feed row replaces the one already kept for its key."""
+        if self._dedupe == "min-price":
+            return candidate.retail_price < current.retail_price
+        return True
+
+    def _upsert_stations(
+        self,
+        stations: list[FuelStation],
+        seen_keys: set[tuple[str, ...]],
+        counts: dict[str, int],
+    ):
+        incoming: dict[tuple[str, ...], FuelStation] = {}
+        for station in stations:
+            key = self._station_key(station)
+            kept = incoming.get(key)
+            if kept is not None:
+                counts["merged"] += 1
+                if not self._prefers(station, kept):
+                    continue
+            incoming[key] = station
+
+        existing: dict[tuple[str, ...], FuelStation] = {}
+        duplicate_ids: list[int] = []
+        changed_regions: set[str | None] = set()
+        opis_ids = {key[0] for key in incoming}
+        for station in FuelStation.objects.filter(opis_truckstop_id__in=opis_ids).order_by("id"):
+            key = self._station_key(station)
+            if key not in incoming:
+                continue
+            if key in existing:
+                duplicate_ids.append(station.id)
+                changed_regions.add(region_cell(station.latitude, station.longitude))
+                self._changed_states.add(station.state)
+            else:
+                existing[key] = station
+
+        now = timezone.now()
+        inserts: list[FuelStation] = []
+        updates: list[FuelStation] = []
+        for key, station in incoming.items():
+            current = existing.get(key)
+            if current is None:
+                inserts.append(station)
+                changed_regions.add(region_cell(station.latitude, station.longitude))
+                self._changed_states.add(station.state)
+                continue
+            if key in seen_keys:
+                # Repeat of a row written earlier in this run, possibly in another chunk.
+                counts["merged"] += 1
+                if not self._prefers(station, current):
+                    continue
+            if any(getattr(current, field) != getattr(station, field) for field in UPSERT_FIELDS):
+                # Both cells change if the station's coordinates moved.
+                changed_regions.add(region_cell(current.latitude, current.longitude))
+                changed_regions.add(region_cell(station.latitude, station.longitude))
+                self._changed_states.update((current.state, station.state))
+                for field in UPSERT_FIELDS:
+                    setattr(current, field, getattr(station, field))
+                current.updated_at = now
+                updates.append(current)
+            elif key not in seen_keys:
+                counts["unchanged"] += 1
+        seen_keys.update(incoming)
+
+        # Delete and update before inserting so the (OPIS ID, rack) constraint never sees a transient clash.
+        if duplicate_ids:
+            FuelStation.objects.filter(id__in=duplicate_ids).delete()
+        FuelStation.objects.bulk_update(updates, [*UPSERT_FIELDS, "updated_at"], batch_size=1000)
+        FuelStation.objects.bulk_create(inserts, batch_size=1000)
+        counts["price_changes"] += record_price_changes(
+            (
+                # History is keyed like the station, so a change of kept rack does not orphan earlier prices.
+                (station.opis_truckstop_id, self._history_rack(station), station.retail_price)
+                for station in [*inserts, *updates]
+            ),
+            self._effective_date,
+        )
+        self._publish_regions(changed_regions)
+        counts["inserted"] += len(inserts)
+        counts["updated"] += len(updates)
+        counts["duplicates_removed"] += len(duplicate_ids)
+
+    def _publish_regions(self, regions: Iterable[str | None]):
+        """Bump the version of every touched price region so only route artifacts crossing them rebuild."""
+        changed = {region for region in regions if region}
+        publish_region_changes(changed)
+        self._changed_regions.update(changed)
+
+    def _retire_missing(self, listed_keys: set[tuple[str, ...]]) -> int:
+        stale_ids: list[int] = []
+        stale_regions: set[str | None] = set()
+        rows = FuelStation.objects.values_list("id", "opis_truckstop_id", "rack_id", "state", "latitude", "longitude")
+        for station_id, opis_id, rack_id, state, latitude, longitude in rows.iterator():
+            if self._key(opis_id, rack_id) not in listed_keys:
+                stale_ids.append(station_id)
+                stale_regions.add(region_cell(latitude, longitude))
+                self._changed_states.add(state)
+        self._publish_regions(stale_regions)
+        for start in range(0, len(stale_ids), 1000):
+            FuelStation.objects.filter(id__in=stale_ids[start : start + 1000]).delete()
+        return len(stale_ids)
+
+    def _ensure_city_coordinates(self, unique_cities: set[tuple[str, str]]) -> int:
         existing = {
             (row["city"].lower(), row["state"])
             for row in CityCoordinate.objects.filter(
@@ -144,27 +437,20 @@ class Command(BaseCommand):
 
         missing = [(city, state) for city, state in unique_cities if (city.lower(), state) not in existing]
         if not missing:
-            self.stdout.write(self.style.NOTICE("City coordinate cache already complete."))
-            return
-
-        self.stdout.write(self.style.NOTICE(f"Resolving coordinates for {len(missing)} city/state pairs with pgeocode"))
+            return 0
 
-        locator = CityLocator()
-        inserts: list[CityCoordinate] = []
-
-        for city, state in missing:
-            coord = locator.lookup(city=city, state=state)
-            if coord is None:
-                continue
-            inserts.append(
-                CityCoordinate(
-                    city=city,
-                    state=state,
-                    latitude=coord.latitude,
-                    longitude=coord.longitude,
-                    source="pgeocode",
-                )
+        coordinates = get_city_locator().lookup_many(missing, processes=self._geocode_processes)
+        inserts = [
+            CityCoordinate(
+                city=city,
+                state=state,
+                latitude=coord.latitude,
+                longitude=coord.longitude,
+                source="pgeocode",
             )
+            for (city, state), coord in zip(missing, coordinates, strict=True)
+            if coord is not None
+        ]
 
         CityCoordinate.objects.bulk_create(inserts, ignore_conflicts=True, batch_size=1000)
-        self.stdout.write(self.style.SUCCESS(f"Stored {len(inserts)} city coordinate cache rows"))
+        return len(inserts)
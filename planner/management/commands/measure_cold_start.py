@@ -0,0 +1,73 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so module imports and lazily built structures start cold.
+PROBE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+timings = {"django_setup_ms": (time.perf_counter() - started) * 1000.0}
+
+mark = time.perf_counter()
+import planner.api.urls
+from planner.services.geocoding import geocode_location
+timings["planner_import_ms"] = (time.perf_counter() - mark) * 1000.0
+
+if sys.argv[2] == "warm":
+    from planner.services.warmup import warm_up
+    timings.update(warm_up())
+
+mark = time.perf_counter()
+geocode_location(sys.argv[1])
+timings["first_geocode_ms"] = (time.perf_counter() - mark) * 1000.0
+mark = time.perf_counter()
+geocode_location(sys.argv[1] + " ")
+timings["second_geocode_ms"] = (time.perf_counter() - mark) * 1000.0
+timings["total_ms"] = (time.perf_counter() - started) * 1000.0
+print(json.dumps(timings))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold-start time: imports, warm-up phases and the first local geocode"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to start")
+        parser.add_argument("--query", default="Dallas, TX", help="Location geocoded after startup")
+        parser.add_argument(
+            "--no-warmup",
+            action="store_true",
+            help="Skip warm_up() so the first geocode pays for the lazy initialisation",
+        )
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1")
+
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "spotter_api.settings")}
+        mode = "cold" if options["no_warmup"] else "warm"
+        samples: list[dict[str, float]] = []
+        for _ in range(options["runs"]):
+            completed = subprocess.run(
+                [sys.executable, "-c", PROBE_SCRIPT, options["query"], mode],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if completed.returncode != 0:
+                raise CommandError(f"Cold-start probe failed:\n{completed.stderr.strip()}")
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(self.style.NOTICE(f"Median of {len(samples)} fresh interpreters ({mode} start):"))
+        for phase in samples[0]:
+            median = statistics.median(sample[phase] for sample in samples)
+            self.stdout.write(f"  {phase:<24} {median:9.1f}")
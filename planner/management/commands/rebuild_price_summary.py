@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from planner.services.price_summary import rebuild_price_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-state and per-grid-cell RegionalPriceSummary rows from FuelStation"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_price_summaries()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} regional price summaries in {elapsed:.2f}s"))
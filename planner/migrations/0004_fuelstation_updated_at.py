@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0003_geocode_result'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fuelstation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:55
+
+from django.db import migrations, models
+
+
+def remove_duplicate_station_racks(apps, schema_editor):
+    # Keep the cheapest row (then the oldest) for every (OPIS ID, rack) pair before adding the constraint.
+    FuelStation = apps.get_model('planner', 'FuelStation')
+    kept = set()
+    duplicate_ids = []
+    rows = FuelStation.objects.order_by('opis_truckstop_id', 'rack_id', 'retail_price', 'id')
+    for station_id, opis_id, rack_id in rows.values_list('id', 'opis_truckstop_id', 'rack_id').iterator():
+        if (opis_id, rack_id) in kept:
+            duplicate_ids.append(station_id)
+        else:
+            kept.add((opis_id, rack_id))
+    for start in range(0, len(duplicate_ids), 500):
+        FuelStation.objects.filter(id__in=duplicate_ids[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0004_fuelstation_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_station_racks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fuelstation',
+            constraint=models.UniqueConstraint(fields=('opis_truckstop_id', 'rack_id'), name='unique_station_rack'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:40
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def seed_price_history(apps, schema_editor):
+    # Start the log from the current prices, effective on the day each station was last updated.
+    FuelStation = apps.get_model('planner', 'FuelStation')
+    FuelPriceHistory = apps.get_model('planner', 'FuelPriceHistory')
+    rows = FuelStation.objects.values_list('opis_truckstop_id', 'rack_id', 'retail_price', 'updated_at')
+    FuelPriceHistory.objects.bulk_create(
+        (
+            FuelPriceHistory(
+                opis_truckstop_id=opis_id,
+                rack_id=rack_id,
+                effective_date=updated_at.date(),
+                price_tenths_cent=int((Decimal(price) * 1000).quantize(Decimal('1'), rounding=ROUND_HALF_UP)),
+            )
+            for opis_id, rack_id, price, updated_at in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0005_fuelstation_unique_rack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuelPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opis_truckstop_id', models.CharField(max_length=64)),
+                ('rack_id', models.CharField(max_length=64)),
+                ('effective_date', models.DateField()),
+                ('price_tenths_cent', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('opis_truckstop_id', 'rack_id', 'effective_date'), name='unique_station_price_date')],
+            },
+        ),
+        migrations.RunPython(seed_price_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0007_region_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionalPriceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('state', 'State'), ('cell', 'Grid cell')], max_length=8)),
+                ('region', models.CharField(max_length=32)),
+                ('min_price', models.DecimalField(decimal_places=6, max_digits=8)),
+                ('median_price', models.DecimalField(decimal_places=6, max_digits=8)),
+                ('avg_price', models.DecimalField(decimal_places=6, max_digits=8)),
+                ('station_count', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'region'), name='unique_price_summary_region')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:40
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def fill_retail_price_micros(apps, schema_editor):
+    FuelStation = apps.get_model('planner', 'FuelStation')
+    stations = []
+    for station in FuelStation.objects.only('id', 'retail_price').iterator():
+        station.retail_price_micros = int(
+            Decimal(station.retail_price).scaleb(6).to_integral_value(rounding=ROUND_HALF_UP)
+        )
+        stations.append(station)
+    FuelStation.objects.bulk_update(stations, ['retail_price_micros'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0008_regional_price_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fuelstation',
+            name='retail_price_micros',
+            field=models.BigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_retail_price_micros, migrations.RunPython.noop),
+    ]
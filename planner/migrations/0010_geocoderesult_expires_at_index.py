@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0009_fuelstation_retail_price_micros'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='geocoderesult',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
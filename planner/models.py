@@ -1,6 +1,13 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
 
 
+def price_micros(price: Decimal | str) -> int:
+    """Exact integer millionths of a dollar for a price with at most six decimal places."""
+    return int(Decimal(price).scaleb(6).to_integral_value(rounding=ROUND_HALF_UP))
+
+
 class CityCoordinate(models.Model):
     city = models.CharField(max_length=128)
     state = models.CharField(max_length=8)
@@ -25,6 +32,24 @@ class CityCoordinate(models.Model):
         return f"{self.city}, {self.state}"
 
 
+class GeocodeResult(models.Model):
+    """Persisted remote geocode; rows without coordinates are negative entries that expire."""
+
+    query_key = models.CharField(max_length=96, unique=True)
+    query = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    display_name = models.CharField(max_length=512, blank=True)
+    source = models.CharField(max_length=32)
+    confidence = models.FloatField(default=1.0)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.query
+
+
 class FuelStation(models.Model):
     opis_truckstop_id = models.CharField(max_length=64)
     truckstop_name = models.CharField(max_length=255)
@@ -33,11 +58,21 @@ class FuelStation(models.Model):
     state = models.CharField(max_length=8)
     rack_id = models.CharField(max_length=64)
     retail_price = models.DecimalField(max_digits=8, decimal_places=6)
+    # Denormalized copy of `retail_price` read by the planner, so candidate queries skip Decimal parsing.
+    # `save()` keeps it in sync; bulk writers must set it themselves.
+    retail_price_micros = models.BigIntegerField(editable=False)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     imported_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["opis_truckstop_id", "rack_id"],
+                name="unique_station_rack",
+            ),
+        ]
         indexes = [
             models.Index(fields=["state", "city"]),
             models.Index(fields=["retail_price"]),
@@ -46,3 +81,83 @@ class FuelStation(models.Model):
 
     def __str__(self):
         return f"{self.truckstop_name} ({self.city}, {self.state})"
+
+    def save(self, *args, **kwargs):
+        self.retail_price_micros = price_micros(self.retail_price)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "retail_price" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "retail_price_micros"}
+        super().save(*args, **kwargs)
+
+
+class FuelPriceHistory(models.Model):
+    """Append-only price log keyed like `FuelStation`, one row per price change."""
+
+    opis_truckstop_id = models.CharField(max_length=64)
+    rack_id = models.CharField(max_length=64)
+    effective_date = models.DateField()
+    # Integer tenths of a cent ($3.459 -> 3459) keep rows small and comparisons exact.
+    price_tenths_cent = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["opis_truckstop_id", "rack_id", "effective_date"],
+                name="unique_station_price_date",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.opis_truckstop_id}/{self.rack_id} @ {self.effective_date}"
+
+
+class RegionalPriceSummary(models.Model):
+    """Price aggregates per state or grid cell, rebuilt by the import command."""
+
+    LEVEL_STATE = "state"
+    LEVEL_CELL = "cell"
+    LEVEL_CHOICES = [(LEVEL_STATE, "State"), (LEVEL_CELL, "Grid cell")]
+
+    level = models.CharField(max_length=8, choices=LEVEL_CHOICES)
+    region = models.CharField(max_length=32)
+    min_price = models.DecimalField(max_digits=8, decimal_places=6)
+    median_price = models.DecimalField(max_digits=8, decimal_places=6)
+    avg_price = models.DecimalField(max_digits=8, decimal_places=6)
+    station_count = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["level", "region"],
+                name="unique_price_summary_region",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.region}"
+
+
+class RegionVersion(models.Model):
+    """Invalidation tag for one price region; the version changes whenever stations in it change."""
+
+    region = models.CharField(max_length=32, unique=True)
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.region} @ {self.version}"
+
+
+class CachedRoute(models.Model):
+    cache_key = models.CharField(max_length=96, unique=True)
+    provider = models.CharField(max_length=32)
+    distance_miles = models.FloatField()
+    duration_minutes = models.FloatField()
+    geometry = models.BinaryField()
+    size_bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.provider} route ({self.distance_miles:.1f} mi)"
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from django.conf import settings
+from requests import RequestException
+
+from planner.domain.optimizer import FuelPlanningError
+from planner.services.concurrency import cap_workers, map_concurrently
+from planner.services.geocoding import GeocodedPoint, GeocodingError, geocode_many
+from planner.services.rate_limit import RateLimitExceeded
+from planner.services.route_artifacts import get_route_artifacts
+from planner.services.routing import RoutingError, fetch_route_alternatives
+from planner.services.trip_planner import build_trip_plan
+
+PLAN_ERRORS = (GeocodingError, RoutingError, FuelPlanningError, RateLimitExceeded, RequestException)
+
+
+@dataclass(frozen=True)
+class BatchStats:
+    items: int
+    unique_items: int
+    unique_locations: int
+    unique_routes: int
+
+
+@dataclass(frozen=True)
+class _RouteJob:
+    origin: GeocodedPoint
+    destination: GeocodedPoint
+    max_alternatives: int
+    as_of_dates: tuple[date | None, ...]
+
+
+def _item_key(item: dict[str, Any]) -> tuple:
+    return tuple(sorted(item.items()))
+
+
+def _geocode_failure(error: GeocodingError) -> Exception:
+    """The rate-limit or network error behind a batch geocoding failure, so it maps to the single endpoint's status."""
+    if isinstance(error.__cause__, (RateLimitExceeded, RequestException)):
+        return error.__cause__
+    return error
+
+
+def _warm_route(job: _RouteJob) -> None:
+    """Fetch a lane's routes and their station artifacts once, so every item on the lane hits the caches."""
+    try:
+        routes = fetch_route_alternatives(
+            start_lat=job.origin.latitude,
+            start_lon=job.origin.longitude,
+            end_lat=job.destination.latitude,
+            end_lon=job.destination.longitude,
+            max_alternatives=job.max_alternatives,
+        )
+    except PLAN_ERRORS:
+        # Planning the item repeats the call and reports the error in its own result.
+        return
+    corridor_miles = float(settings.ROUTE_CORRIDOR_MILES)
+    for route in routes:
+        for as_of in job.as_of_dates:
+            get_route_artifacts(route, corridor_miles, as_of=as_of)
+
+
+def _plan_or_error(item: dict[str, Any]) -> dict[str, Any] | Exception:
+    # The batch pool is the parallelism; planning alternatives or legs on nested pools would multiply threads.
+    with cap_workers(1):
+        try:
+            return build_trip_plan(**item)
+        except PLAN_ERRORS as exc:
+            return exc
+
+
+def build_trip_plans(items: list[dict[str, Any]]) -> tuple[list[dict[str, Any] | Exception], BatchStats]:
+    """Plan many trips, sharing geocodes, routes and station artifacts across the batch.
+
+    `items` hold `build_trip_plan` keyword arguments. Identical items are planned once. Returns one
+    plan or planning exception per item, in input order, plus counts of the deduplicated work.
+    Each item plans its route alternatives inline, so a batch runs at most
+    `TRIP_PLAN_BATCH_MAX_WORKERS` planning threads.
+    """
+    unique_items = list({_item_key(item): item for item in items}.values())
+    locations = list(
+        dict.fromkeys(location for item in unique_items for location in (item["start_location"], item["end_location"]))
+    )
+    points = dict(zip(locations, geocode_many(locations), strict=True))
+
+    # One warm-up job per lane (origin, destination, alternatives), covering every as-of date asked for on it.
+    lanes: dict[tuple, tuple[GeocodedPoint, GeocodedPoint, int, set[date | None]]] = {}
+    for item in unique_items:
+        origin, destination = points[item["start_location"]], points[item["end_location"]]
+        if not isinstance(origin, GeocodedPoint) or not isinstance(destination, GeocodedPoint):
+            continue
+        alternatives = item.get("route_alternatives", 0)
+        lane = (origin.latitude, origin.longitude, destination.latitude, destination.longitude, alternatives)
+        lanes.setdefault(lane, (origin, destination, alternatives, set()))[3].add(item.get("as_of"))
+    jobs = [
+        _RouteJob(origin, destination, alternatives, as_of_dates=tuple(dates))
+        for origin, destination, alternatives, dates in lanes.values()
+    ]
+
+    max_workers = int(settings.TRIP_PLAN_BATCH_MAX_WORKERS)
+    map_concurrently(_warm_route, jobs, max_workers=max_workers)
+
+    def plan(item: dict[str, Any]) -> dict[str, Any] | Exception:
+        for location in (item["start_location"], item["end_location"]):
+            if isinstance(points[location], GeocodingError):
+                return _geocode_failure(points[location])
+        return _plan_or_error(item)
+
+    outcomes = dict(
+        zip((_item_key(item) for item in unique_items), map_concurrently(plan, unique_items, max_workers), strict=True)
+    )
+    stats = BatchStats(
+        items=len(items),
+        unique_items=len(unique_items),
+        unique_locations=len(locations),
+        unique_routes=len(jobs),
+    )
+    return [outcomes[_item_key(item)] for item in items], stats
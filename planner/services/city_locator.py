@@ -1,10 +1,26 @@
+import heapq
+import mmap
 import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-
-import pgeocode
+from functools import cached_property
+from pathlib import Path
 
 CITY_NORMALIZE_RE = re.compile(r"[^a-z0-9 ]+")
 WHITESPACE_RE = re.compile(r"\s+")
+CITY_PREFIX_ALIASES = (("st ", "saint "), ("ft ", "fort "), ("mt ", "mount "))
+FUZZY_MIN_CONFIDENCE = 0.75
+FUZZY_CANDIDATE_LIMIT = 8
+LOOKUP_MANY_PARALLEL_MIN = 10_000
+
+CITY_INDEX_MAGIC = b"SPCI0001"
+# magic, city count, state count, city text bytes, state text bytes
+CITY_INDEX_HEADER = struct.Struct("<8sIIII")
 
 
 @dataclass(frozen=True)
@@ -13,57 +29,428 @@ class Coordinate:
     longitude: float
 
 
+@dataclass(frozen=True)
+class CityMatch:
+    latitude: float
+    longitude: float
+    name: str
+    state: str
+    confidence: float
+
+
+@dataclass(frozen=True)
+class CitySuggestion:
+    name: str
+    state: str
+    latitude: float
+    longitude: float
+    postal_codes: int
+
+
+class CityIndexError(Exception):
+    pass
+
+
+def normalize_city(value: str) -> str:
+    cleaned = CITY_NORMALIZE_RE.sub(" ", value.lower())
+    cleaned = WHITESPACE_RE.sub(" ", cleaned).strip()
+    return cleaned
+
+
+def _city_key(state: str, normalized_city: str) -> str:
+    return f"{state}\t{normalized_city}"
+
+
+def _trigrams(value: str) -> set[str]:
+    padded = f"  {value} "
+    return {padded[idx : idx + 3] for idx in range(len(padded) - 2)}
+
+
+def _edit_distance(left: str, right: str) -> int:
+    previous = list(range(len(right) + 1))
+    for row, left_char in enumerate(left, start=1):
+        current = [row]
+        for column, right_char in enumerate(right, start=1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (left_char != right_char),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def _similarity(left: str, right: str) -> float:
+    longest = max(len(left), len(right))
+    if longest == 0:
+        return 1.0
+    return 1.0 - _edit_distance(left, right) / longest
+
+
+@dataclass(frozen=True)
+class _PlaceTable:
+    keys: list[str]
+    names: list[str]
+    latitudes: Sequence[float]
+    longitudes: Sequence[float]
+    counts: Sequence[int]
+    states: list[str]
+    state_latitudes: Sequence[float]
+    state_longitudes: Sequence[float]
+
+
+def _aggregate_places(places: Iterable[tuple[str, str, float, float]]) -> _PlaceTable:
+    """Collapse `(state, place name, lat, lon)` postal rows into sorted per-city centroids."""
+    cities: dict[str, list] = {}
+    states: dict[str, list[float]] = {}
+    for raw_state, place_name, latitude, longitude in places:
+        state = str(raw_state).upper().strip()
+        city = normalize_city(str(place_name))
+        if not state or not city:
+            continue
+
+        entry = cities.setdefault(_city_key(state, city), [0.0, 0.0, 0, str(place_name).strip()])
+        entry[0] += latitude
+        entry[1] += longitude
+        entry[2] += 1
+        state_entry = states.setdefault(state, [0.0, 0.0, 0])
+        state_entry[0] += latitude
+        state_entry[1] += longitude
+        state_entry[2] += 1
+
+    keys = sorted(cities)
+    state_codes = sorted(states)
+    return _PlaceTable(
+        keys=keys,
+        names=[cities[key][3] for key in keys],
+        latitudes=array("d", (cities[key][0] / cities[key][2] for key in keys)),
+        longitudes=array("d", (cities[key][1] / cities[key][2] for key in keys)),
+        counts=array("I", (cities[key][2] for key in keys)),
+        states=state_codes,
+        state_latitudes=array("d", (states[state][0] / states[state][2] for state in state_codes)),
+        state_longitudes=array("d", (states[state][1] / states[state][2] for state in state_codes)),
+    )
+
+
+def _pgeocode_places() -> Iterator[tuple[str, str, float, float]]:
+    # pgeocode pulls in pandas; only index rebuilds and the no-index fallback pay for it.
+    import pgeocode
+
+    nominatim = pgeocode.Nominatim("us")
+    raw = nominatim._data[["place_name", "state_code", "latitude", "longitude"]].dropna()
+    for row in raw.itertuples(index=False):
+        yield str(row.state_code), str(row.place_name), float(row.latitude), float(row.longitude)
+
+
+def write_city_index(path: Path, places: Iterable[tuple[str, str, float, float]]) -> int:
+    """Compile postal rows into the binary index read by `CityLocator`; returns the city count.
+
+    Layout after the header: city latitudes, city longitudes, state latitudes and state
+    longitudes as little-endian float64, city postal counts as uint32, then the
+    newline-separated `state<TAB>city<TAB>display name` and state-code text blocks.
+    """
+    table = _aggregate_places(places)
+    city_text = "\n".join(f"{key}\t{name}" for key, name in zip(table.keys, table.names, strict=True)).encode("utf-8")
+    state_text = "\n".join(table.states).encode("utf-8")
+
+    sections = [
+        array("d", table.latitudes),
+        array("d", table.longitudes),
+        array("d", table.state_latitudes),
+        array("d", table.state_longitudes),
+        array("I", table.counts),
+    ]
+    payload = bytearray(
+        CITY_INDEX_HEADER.pack(CITY_INDEX_MAGIC, len(table.keys), len(table.states), len(city_text), len(state_text))
+    )
+    for section in sections:
+        if sys.byteorder == "big":
+            section.byteswap()
+        payload.extend(section.tobytes())
+    payload.extend(city_text)
+    payload.extend(state_text)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(bytes(payload))
+    tmp_path.replace(path)
+    return len(table.keys)
+
+
+def compile_city_index(path: Path) -> int:
+    return write_city_index(path, _pgeocode_places())
+
+
+def _read_city_index(path: Path) -> _PlaceTable:
+    with path.open("rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < CITY_INDEX_HEADER.size:
+        raise CityIndexError(f"Truncated city index: {path}")
+    magic, city_count, state_count, city_text_size, state_text_size = CITY_INDEX_HEADER.unpack_from(mapped)
+    if magic != CITY_INDEX_MAGIC:
+        raise CityIndexError(f"Unrecognized city index file: {path}")
+
+    view = memoryview(mapped)
+    offset = CITY_INDEX_HEADER.size
+    sections: list[Sequence] = []
+    for typecode, count in (("d", city_count), ("d", city_count), ("d", state_count), ("d", state_count)):
+        size = 8 * count
+        sections.append(_numeric_section(view[offset : offset + size], typecode))
+        offset += size
+    sections.append(_numeric_section(view[offset : offset + 4 * city_count], "I"))
+    offset += 4 * city_count
+
+    city_lines = bytes(view[offset : offset + city_text_size]).decode("utf-8").split("\n") if city_count else []
+    offset += city_text_size
+    states = bytes(view[offset : offset + state_text_size]).decode("utf-8").split("\n") if state_count else []
+    if len(city_lines) != city_count or len(states) != state_count:
+        raise CityIndexError(f"Corrupt city index: {path}")
+
+    keys: list[str] = []
+    names: list[str] = []
+    for line in city_lines:
+        state, city, name = line.split("\t", 2)
+        keys.append(_city_key(state, city))
+        names.append(name)
+
+    return _PlaceTable(
+        keys=keys,
+        names=names,
+        latitudes=sections[0],
+        longitudes=sections[1],
+        counts=sections[4],
+        states=states,
+        state_latitudes=sections[2],
+        state_longitudes=sections[3],
+    )
+
+
+def _numeric_section(buffer: memoryview, typecode: str) -> Sequence:
+    if sys.byteorder == "little":
+        # Zero-copy view over the mapped file; pages fault in only when a lookup touches them.
+        return buffer.cast(typecode)
+    section = array(typecode)
+    section.frombytes(buffer)
+    section.byteswap()
+    return section
+
+
 class CityLocator:
-    def __init__(self):
-        nominatim = pgeocode.Nominatim("us")
-        raw = nominatim._data[["place_name", "state_code", "latitude", "longitude"]].dropna()
-
-        self._city_index: dict[tuple[str, str], list[Coordinate]] = {}
-        self._state_fallback: dict[str, Coordinate] = {}
-        state_accumulator: dict[str, list[Coordinate]] = {}
-
-        for row in raw.itertuples(index=False):
-            state = str(row.state_code).upper().strip()
-            city = self._normalize_city(str(row.place_name))
-            if not state or not city:
-                continue
+    """Resolve `(city, state)` to precomputed postal centroids.
 
-            coord = Coordinate(latitude=float(row.latitude), longitude=float(row.longitude))
-            self._city_index.setdefault((state, city), []).append(coord)
-            state_accumulator.setdefault(state, []).append(coord)
+    Loads the compiled index at `index_path` when it exists (see `build_city_index`), otherwise
+    aggregates pgeocode's postal table in process.
+    """
 
-        for state, coords in state_accumulator.items():
-            mean_lat = sum(coord.latitude for coord in coords) / len(coords)
-            mean_lon = sum(coord.longitude for coord in coords) / len(coords)
-            self._state_fallback[state] = Coordinate(latitude=mean_lat, longitude=mean_lon)
+    def __init__(self, index_path: str | Path | None = None):
+        path = Path(index_path) if index_path else None
+        if path is not None and path.exists():
+            table = _read_city_index(path)
+            self._index_path = path
+        else:
+            table = _aggregate_places(_pgeocode_places())
+            self._index_path = None
+
+        self._city_keys = table.keys
+        self._city_names = table.names
+        self._city_latitudes = table.latitudes
+        self._city_longitudes = table.longitudes
+        self._city_counts = table.counts
+        self._state_fallback = {
+            state: Coordinate(latitude=table.state_latitudes[idx], longitude=table.state_longitudes[idx])
+            for idx, state in enumerate(table.states)
+        }
 
     @staticmethod
     def _normalize_city(value: str) -> str:
-        cleaned = CITY_NORMALIZE_RE.sub(" ", value.lower())
-        cleaned = WHITESPACE_RE.sub(" ", cleaned).strip()
-        return cleaned
+        return normalize_city(value)
 
     @staticmethod
     def _city_variants(normalized_city: str) -> list[str]:
         variants = [normalized_city]
-        if normalized_city.startswith("st "):
-            variants.append("saint " + normalized_city[3:])
-        if normalized_city.startswith("saint "):
-            variants.append("st " + normalized_city[6:])
+        for short, long in CITY_PREFIX_ALIASES:
+            if normalized_city.startswith(short):
+                variants.append(long + normalized_city[len(short) :])
+            elif normalized_city.startswith(long):
+                variants.append(short + normalized_city[len(long) :])
         if normalized_city.endswith(" city"):
             variants.append(normalized_city.removesuffix(" city"))
         # Keep order deterministic while deduplicating.
         return list(dict.fromkeys(variant for variant in variants if variant))
 
-    def lookup(self, city: str, state: str) -> Coordinate | None:
+    @cached_property
+    def _trigram_postings(self) -> dict[str, array]:
+        # Built on first fuzzy lookup; postings stay sorted because keys are visited in order.
+        postings: dict[str, array] = {}
+        for idx, key in enumerate(self._city_keys):
+            for gram in _trigrams(key.split("\t", 1)[1]):
+                postings.setdefault(gram, array("I")).append(idx)
+        return postings
+
+    def _state_range(self, state: str) -> tuple[int, int]:
+        # Keys sort as "ST<TAB>city", so one state's cities are contiguous.
+        return bisect_left(self._city_keys, f"{state}\t"), bisect_left(self._city_keys, f"{state}\x0b")
+
+    def _find(self, state: str, normalized_city: str) -> int | None:
+        key = _city_key(state, normalized_city)
+        idx = bisect_left(self._city_keys, key)
+        if idx < len(self._city_keys) and self._city_keys[idx] == key:
+            return idx
+        return None
+
+    def _fuzzy_find(self, state: str, normalized_city: str) -> tuple[int, float] | None:
+        low, high = self._state_range(state)
+        if low == high:
+            return None
+
+        query_grams = _trigrams(normalized_city)
+        shared: dict[int, int] = {}
+        for gram in query_grams:
+            posting = self._trigram_postings.get(gram)
+            if posting is None:
+                continue
+            for idx in posting[bisect_left(posting, low) : bisect_left(posting, high)]:
+                shared[idx] = shared.get(idx, 0) + 1
+        if not shared:
+            return None
+
+        # Shortlist by trigram Dice overlap, then confirm with edit distance.
+        shortlist = sorted(
+            shared,
+            key=lambda idx: 2 * shared[idx] / (len(query_grams) + len(self._city_keys[idx]) - 2),
+            reverse=True,
+        )[:FUZZY_CANDIDATE_LIMIT]
+        return max(
+            ((idx, _similarity(normalized_city, self._city_keys[idx].split("\t", 1)[1])) for idx in shortlist),
+            key=lambda item: (item[1], self._city_counts[item[0]]),
+        )
+
+    def _city_match(self, idx: int, state: str, confidence: float) -> CityMatch:
+        return CityMatch(
+            latitude=self._city_latitudes[idx],
+            longitude=self._city_longitudes[idx],
+            name=self._city_names[idx],
+            state=state,
+            confidence=confidence,
+        )
+
+    def match(self, city: str, state: str, min_confidence: float = FUZZY_MIN_CONFIDENCE) -> CityMatch | None:
+        """Resolve a city exactly, or fuzzily within its state; never falls back to the state centroid."""
         normalized_state = state.strip().upper()
-        normalized_city = self._normalize_city(city)
+        variants = self._city_variants(self._normalize_city(city))
+
+        for variant in variants:
+            idx = self._find(normalized_state, variant)
+            if idx is not None:
+                return self._city_match(idx, normalized_state, 1.0)
+
+        best: tuple[int, float] | None = None
+        for variant in variants:
+            found = self._fuzzy_find(normalized_state, variant)
+            if found is not None and (best is None or found[1] > best[1]):
+                best = found
+        if best is None or best[1] < min_confidence:
+            return None
+        return self._city_match(best[0], normalized_state, round(best[1], 3))
+
+    @cached_property
+    def _prefix_index(self) -> tuple[list[str], array]:
+        # City names sorted across all states, with positions back into the state-major arrays.
+        entries = sorted((key.split("\t", 1)[1], idx) for idx, key in enumerate(self._city_keys))
+        return [name for name, _ in entries], array("I", (idx for _, idx in entries))
+
+    def suggest(self, prefix: str, state: str = "", limit: int = 8) -> list[CitySuggestion]:
+        """Cities whose normalized name starts with `prefix`, most postal codes first."""
+        normalized_prefix = self._normalize_city(prefix)
+        if not normalized_prefix or limit <= 0:
+            return []
+
+        names, positions = self._prefix_index
+        normalized_state = state.strip().upper()
+        candidates: set[int] = set()
+        for variant in self._city_variants(normalized_prefix):
+            low = bisect_left(names, variant)
+            high = bisect_left(names, variant + "\uffff")
+            candidates.update(positions[low:high])
+        if normalized_state:
+            candidates = {idx for idx in candidates if self._city_keys[idx].startswith(normalized_state)}
+
+        ranked = heapq.nsmallest(limit, candidates, key=lambda idx: (-self._city_counts[idx], self._city_keys[idx]))
+        return [
+            CitySuggestion(
+                name=self._city_names[idx],
+                state=self._city_keys[idx].split("\t", 1)[0],
+                latitude=self._city_latitudes[idx],
+                longitude=self._city_longitudes[idx],
+                postal_codes=self._city_counts[idx],
+            )
+            for idx in ranked
+        ]
+
+    def warm(self):
+        """Build the lazily created fuzzy and prefix indexes now rather than on first use."""
+        _ = (self._trigram_postings, self._prefix_index)
+
+    def state_centroid(self, state: str) -> Coordinate | None:
+        return self._state_fallback.get(state.strip().upper())
+
+    def lookup(self, city: str, state: str) -> Coordinate | None:
+        match = self.match(city=city, state=state)
+        if match is not None:
+            return Coordinate(latitude=match.latitude, longitude=match.longitude)
+        return self.state_centroid(state)
+
+    def lookup_many(self, pairs: Iterable[tuple[str, str]], processes: int = 1) -> list[Coordinate | None]:
+        """`lookup` for many `(city, state)` pairs, in input order.
+
+        Distinct pairs are normalized once, sorted and merge-joined against the sorted key array;
+        only the leftovers go through alias, fuzzy and state-centroid resolution. With
+        `processes > 1` and a compiled index, large inputs are split across worker processes
+        that memory-map the same file.
+        """
+        pairs = list(pairs)
+        if processes > 1 and self._index_path is not None and len(pairs) >= LOOKUP_MANY_PARALLEL_MIN:
+            chunk_size = -(-len(pairs) // processes)
+            chunks = [pairs[start : start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+            with ProcessPoolExecutor(
+                max_workers=len(chunks),
+                initializer=_init_lookup_worker,
+                initargs=(str(self._index_path),),
+            ) as pool:
+                return [coordinate for part in pool.map(_lookup_many_in_worker, chunks) for coordinate in part]
+
+        unique_pairs = list(dict.fromkeys(pairs))
+        keyed = sorted(
+            (_city_key(state.strip().upper(), self._normalize_city(city)), (city, state))
+            for city, state in unique_pairs
+        )
+
+        resolved: dict[tuple[str, str], Coordinate | None] = {}
+        position = 0
+        for key, pair in keyed:
+            # Query keys ascend, so each search starts where the previous one stopped.
+            position = bisect_left(self._city_keys, key, position)
+            if position < len(self._city_keys) and self._city_keys[position] == key:
+                resolved[pair] = Coordinate(
+                    latitude=self._city_latitudes[position],
+                    longitude=self._city_longitudes[position],
+                )
+
+        for pair in unique_pairs:
+            if pair not in resolved:
+                resolved[pair] = self.lookup(city=pair[0], state=pair[1])
+        return [resolved[pair] for pair in pairs]
+
+
+_worker_locator: CityLocator | None = None
+
+
+def _init_lookup_worker(index_path: str):
+    global _worker_locator
+    _worker_locator = CityLocator(index_path)
 
-        for variant in self._city_variants(normalized_city):
-            values = self._city_index.get((normalized_state, variant))
-            if values:
-                mean_lat = sum(coord.latitude for coord in values) / len(values)
-                mean_lon = sum(coord.longitude for coord in values) / len(values)
-                return Coordinate(latitude=mean_lat, longitude=mean_lon)
 
-        return self._state_fallback.get(normalized_state)
+def _lookup_many_in_worker(pairs: list[tuple[str, str]]) -> list[Coordinate | None]:
+    return _worker_locator.lookup_many(pairs)
@@ -0,0 +1,70 @@
+import contextvars
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any
+
+from django.db import connections
+
+# Upper bound on any pool started in the current context; lets an outer pool keep nested ones from multiplying.
+_worker_cap: contextvars.ContextVar[int | None] = contextvars.ContextVar("worker_cap", default=None)
+
+
+@contextmanager
+def cap_workers(max_workers: int):
+    """Limit pools started by `map_concurrently`/`iter_concurrently` in this context to `max_workers`."""
+    token = _worker_cap.set(max_workers)
+    try:
+        yield
+    finally:
+        _worker_cap.reset(token)
+
+
+def _capped(max_workers: int) -> int:
+    cap = _worker_cap.get()
+    return max_workers if cap is None else min(max_workers, cap)
+
+
+def _run_and_release_connections(func: Callable[[Any], Any], item: Any) -> Any:
+    try:
+        return func(item)
+    finally:
+        # Worker threads get their own DB connections; close them so they do not leak.
+        connections.close_all()
+
+
+def map_concurrently(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int) -> list[Any]:
+    """Apply `func` to each item on a bounded thread pool, preserving input order.
+
+    Each task runs in a copy of the caller's context, so context variables stay visible to
+    workers. The first exception raised by `func` propagates to the caller. With a single item
+    or `max_workers <= 1` (after any `cap_workers` limit) the work runs inline on the calling thread.
+    """
+    items = list(items)
+    max_workers = _capped(max_workers)
+    if len(items) <= 1 or max_workers <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _run_and_release_connections, func, item) for item in items
+        ]
+        return [future.result() for future in futures]
+
+
+def iter_concurrently(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int) -> Iterator[tuple[int, Any]]:
+    """Like `map_concurrently`, but yield `(index, result)` pairs as soon as each task finishes."""
+    items = list(items)
+    max_workers = _capped(max_workers)
+    if len(items) <= 1 or max_workers <= 1:
+        for index, item in enumerate(items):
+            yield index, func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, _run_and_release_connections, func, item): index
+            for index, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
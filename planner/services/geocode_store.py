@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from planner.domain.types import GeocodedPoint
+from planner.models import GeocodeResult
+
+# Stored in caches and returned by `load_geocode` for queries the remote geocoder could not resolve.
+GEOCODE_MISS = "geocode-miss"
+NEGATIVE_SOURCE = "miss"
+
+
+def load_geocode(query_key: str) -> GeocodedPoint | str | None:
+    """Return the stored point, `GEOCODE_MISS` for a live negative entry, or None if unknown."""
+    if not settings.GEOCODE_STORE_ENABLED:
+        return None
+
+    entry = (
+        GeocodeResult.objects.filter(query_key=query_key)
+        .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+        .first()
+    )
+    if entry is None:
+        return None
+    if entry.latitude is None or entry.longitude is None:
+        return GEOCODE_MISS
+
+    return GeocodedPoint(
+        latitude=entry.latitude,
+        longitude=entry.longitude,
+        display_name=entry.display_name,
+        source=entry.source,
+        confidence=entry.confidence,
+    )
+
+
+def save_geocode(query_key: str, query: str, point: GeocodedPoint):
+    if not settings.GEOCODE_STORE_ENABLED:
+        return
+
+    GeocodeResult.objects.update_or_create(
+        query_key=query_key,
+        defaults={
+            "query": query[:255],
+            "latitude": point.latitude,
+            "longitude": point.longitude,
+            "display_name": point.display_name[:512],
+            "source": point.source,
+            "confidence": point.confidence,
+            "expires_at": None,
+        },
+    )
+
+
+def save_geocode_miss(query_key: str, query: str):
+    """Remember an unresolvable query until the negative TTL passes, purging misses that already expired."""
+    if not settings.GEOCODE_STORE_ENABLED:
+        return
+
+    now = timezone.now()
+    GeocodeResult.objects.filter(source=NEGATIVE_SOURCE, expires_at__lte=now).delete()
+    GeocodeResult.objects.update_or_create(
+        query_key=query_key,
+        defaults={
+            "query": query[:255],
+            "latitude": None,
+            "longitude": None,
+            "display_name": "",
+            "source": NEGATIVE_SOURCE,
+            "confidence": 0.0,
+            "expires_at": now + timedelta(seconds=int(settings.GEOCODE_NEGATIVE_TTL_SECONDS)),
+        },
+    )
@@ -1,32 +1,46 @@
 import hashlib
 import re
-from dataclasses import dataclass
-from functools import lru_cache
+import threading
+from collections.abc import Iterator
+from functools import partial
 
 import requests
 from django.conf import settings
 from django.core.cache import cache
 
-from planner.services.city_locator import CityLocator
+from planner.domain.types import GeocodedPoint
+from planner.services.city_locator import CityLocator, CitySuggestion
+from planner.services.concurrency import iter_concurrently
+from planner.services.geocode_store import GEOCODE_MISS, load_geocode, save_geocode, save_geocode_miss
+from planner.services.rate_limit import RateLimitExceeded, acquire_rate_slot
+from planner.services.single_flight import single_flight
 
-CITY_STATE_RE = re.compile(r"^\s*(?P<city>[^,]+?)\s*,\s*(?P<state>[A-Za-z]{2})\s*$")
-
-
-@dataclass(frozen=True)
-class GeocodedPoint:
-    latitude: float
-    longitude: float
-    display_name: str
-    source: str
+# "City, ST", "City ST", "City, ST 12345" and "City ST 12345-6789", optionally followed by ", USA".
+CITY_STATE_RE = re.compile(
+    r"^\s*(?P<city>[^,]+?)\s*(?:,\s*|\s+)(?P<state>[A-Za-z]{2})"
+    r"(?:\s*,?\s*(?P<postal>\d{5})(?:-\d{4})?)?(?:\s*,\s*(?:USA|US|United States))?\s*$",
+    re.IGNORECASE,
+)
+STATE_CENTROID_CONFIDENCE = 0.1
+GEOCODE_CACHE_TIMEOUT_SECONDS = 24 * 60 * 60
 
 
 class GeocodingError(Exception):
     pass
 
 
-@lru_cache(maxsize=1)
-def _get_city_locator() -> CityLocator:
-    return CityLocator()
+_city_locator: CityLocator | None = None
+_city_locator_lock = threading.Lock()
+
+
+def get_city_locator() -> CityLocator:
+    """Process-wide locator, built at most once even when the first requests arrive concurrently."""
+    global _city_locator
+    if _city_locator is None:
+        with _city_locator_lock:
+            if _city_locator is None:
+                _city_locator = CityLocator(settings.CITY_INDEX_PATH)
+    return _city_locator
 
 
 def _cache_key(query: str) -> str:
@@ -47,19 +61,45 @@ def _local_lookup(query: str) -> GeocodedPoint | None:
         return None
 
     city, state = parsed
-    local_match = _get_city_locator().lookup(city=city, state=state)
+    local_match = get_city_locator().match(city=city, state=state, min_confidence=settings.GEOCODE_FUZZY_MIN_CONFIDENCE)
     if local_match is None:
         return None
 
     return GeocodedPoint(
         latitude=local_match.latitude,
         longitude=local_match.longitude,
-        display_name=f"{city}, {state}",
-        source="pgeocode-local",
+        display_name=f"{local_match.name}, {local_match.state}",
+        source="pgeocode-local" if local_match.confidence == 1.0 else "pgeocode-fuzzy",
+        confidence=local_match.confidence,
+    )
+
+
+def _state_centroid_lookup(query: str) -> GeocodedPoint | None:
+    parsed = _parse_city_state(query)
+    if parsed is None:
+        return None
+
+    _, state = parsed
+    centroid = get_city_locator().state_centroid(state)
+    if centroid is None:
+        return None
+
+    return GeocodedPoint(
+        latitude=centroid.latitude,
+        longitude=centroid.longitude,
+        display_name=state,
+        source="state-centroid",
+        confidence=STATE_CENTROID_CONFIDENCE,
     )
 
 
 def _remote_lookup(query: str) -> GeocodedPoint | None:
+    # Nominatim's usage policy allows roughly one request per second per application.
+    acquire_rate_slot(
+        "nominatim",
+        rate_per_second=settings.NOMINATIM_MAX_REQUESTS_PER_SECOND,
+        max_wait_seconds=settings.NOMINATIM_MAX_QUEUE_SECONDS,
+    )
     response = requests.get(
         f"{settings.NOMINATIM_API_BASE_URL}/search",
         params={
@@ -87,24 +127,110 @@ def _remote_lookup(query: str) -> GeocodedPoint | None:
     )
 
 
-def geocode_location(query: str) -> GeocodedPoint:
-    normalized_query = query.strip()
-    if not normalized_query:
-        raise GeocodingError("Location input cannot be empty")
+def _remote_lookup_and_cache(query: str, cache_key: str) -> GeocodedPoint | str:
+    remote = _remote_lookup(query)
+    if remote is None:
+        save_geocode_miss(cache_key, query)
+        cache.set(cache_key, GEOCODE_MISS, timeout=int(settings.GEOCODE_NEGATIVE_TTL_SECONDS))
+        return GEOCODE_MISS
 
-    cache_key = _cache_key(normalized_query)
+    save_geocode(cache_key, query, remote)
+    cache.set(cache_key, remote, timeout=GEOCODE_CACHE_TIMEOUT_SECONDS)
+    return remote
+
+
+def _resolve_miss(query: str) -> GeocodedPoint:
+    # Last resort, labelled as such so callers can tell a state centroid from a city match.
+    fallback = _state_centroid_lookup(query)
+    if fallback:
+        return fallback
+    raise GeocodingError(f"Unable to geocode location: {query}")
+
+
+def _lookup_without_remote(normalized_query: str, cache_key: str) -> GeocodedPoint | str | None:
     cached = cache.get(cache_key)
     if cached:
         return cached
 
     local = _local_lookup(normalized_query)
     if local:
-        cache.set(cache_key, local, timeout=24 * 60 * 60)
+        cache.set(cache_key, local, timeout=GEOCODE_CACHE_TIMEOUT_SECONDS)
         return local
 
-    remote = _remote_lookup(normalized_query)
-    if remote:
-        cache.set(cache_key, remote, timeout=24 * 60 * 60)
-        return remote
+    stored = load_geocode(cache_key)
+    if stored == GEOCODE_MISS:
+        cache.set(cache_key, GEOCODE_MISS, timeout=int(settings.GEOCODE_NEGATIVE_TTL_SECONDS))
+    elif stored:
+        cache.set(cache_key, stored, timeout=GEOCODE_CACHE_TIMEOUT_SECONDS)
+    return stored
 
-    raise GeocodingError(f"Unable to geocode location: {normalized_query}")
+
+def geocode_location(query: str) -> GeocodedPoint:
+    normalized_query = query.strip()
+    if not normalized_query:
+        raise GeocodingError("Location input cannot be empty")
+
+    cache_key = _cache_key(normalized_query)
+    resolved = _lookup_without_remote(normalized_query, cache_key)
+    if resolved is None:
+        resolved = single_flight(cache_key, partial(_remote_lookup_and_cache, normalized_query, cache_key))
+    if resolved == GEOCODE_MISS:
+        return _resolve_miss(normalized_query)
+    return resolved
+
+
+def _geocode_or_error(query: str) -> GeocodedPoint | GeocodingError:
+    try:
+        return geocode_location(query)
+    except GeocodingError as exc:
+        return exc
+    except (RateLimitExceeded, requests.RequestException) as exc:
+        error = GeocodingError(f"Unable to geocode location right now: {exc}")
+        # Keep the transient cause so callers can answer with 503/502 instead of a bad-request error.
+        error.__cause__ = exc
+        return error
+
+
+def iter_geocode_many(queries: list[str]) -> Iterator[tuple[int, GeocodedPoint | GeocodingError]]:
+    """Yield `(index, point or error)` for each query, cached and local hits first.
+
+    Queries needing Nominatim are deduplicated and resolved on a small thread pool; they still
+    go through the shared rate limiter, so results stream out at the remote rate.
+    """
+    pending: dict[str, list[int]] = {}
+    for index, query in enumerate(queries):
+        normalized_query = query.strip()
+        if not normalized_query:
+            yield index, GeocodingError("Location input cannot be empty")
+            continue
+
+        resolved = _lookup_without_remote(normalized_query, _cache_key(normalized_query))
+        if resolved is None:
+            pending.setdefault(normalized_query.lower(), []).append(index)
+        elif resolved == GEOCODE_MISS:
+            yield index, _geocode_or_error(normalized_query)
+        else:
+            yield index, resolved
+
+    remote_queries = [queries[indexes[0]].strip() for indexes in pending.values()]
+    remote_indexes = list(pending.values())
+    for position, result in iter_concurrently(
+        _geocode_or_error,
+        remote_queries,
+        max_workers=settings.GEOCODE_BATCH_MAX_WORKERS,
+    ):
+        for index in remote_indexes[position]:
+            yield index, result
+
+
+def geocode_many(queries: list[str]) -> list[GeocodedPoint | GeocodingError]:
+    results: list[GeocodedPoint | GeocodingError | None] = [None] * len(queries)
+    for index, result in iter_geocode_many(queries):
+        results[index] = result
+    return results
+
+
+def suggest_locations(query: str, limit: int = 8) -> list[CitySuggestion]:
+    """Typeahead over local place names; `"dal"` and `"dallas, t"` both narrow as the user types."""
+    city, _, state = query.partition(",")
+    return get_city_locator().suggest(city, state=state.strip()[:2], limit=limit)
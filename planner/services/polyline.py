@@ -0,0 +1,60 @@
+def decode_polyline(encoded: str, precision: int = 6) -> list[list[float]]:
+    """Decode a Google encoded polyline into GeoJSON-ordered `[lon, lat]` pairs."""
+    data = encoded.encode("ascii")
+    factor = float(10**precision)
+    length = len(data)
+    coordinates: list[list[float]] = []
+
+    index = 0
+    lat = 0
+    lon = 0
+    while index < length:
+        shift = 0
+        value = 0
+        while True:
+            byte = data[index] - 63
+            index += 1
+            value |= (byte & 0x1F) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        lat += ~(value >> 1) if value & 1 else value >> 1
+
+        shift = 0
+        value = 0
+        while True:
+            byte = data[index] - 63
+            index += 1
+            value |= (byte & 0x1F) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        lon += ~(value >> 1) if value & 1 else value >> 1
+
+        coordinates.append([lon / factor, lat / factor])
+
+    return coordinates
+
+
+def _encode_value(value: int, chunks: list[str]):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode_polyline(coordinates: list[list[float]], precision: int = 6) -> str:
+    """Encode GeoJSON-ordered `[lon, lat]` pairs as a Google encoded polyline."""
+    factor = 10**precision
+    chunks: list[str] = []
+    prev_lat = 0
+    prev_lon = 0
+    for lon, lat in coordinates:
+        scaled_lat = round(lat * factor)
+        scaled_lon = round(lon * factor)
+        _encode_value(scaled_lat - prev_lat, chunks)
+        _encode_value(scaled_lon - prev_lon, chunks)
+        prev_lat = scaled_lat
+        prev_lon = scaled_lon
+    return "".join(chunks)
@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Avg, OuterRef, Q, Subquery
+
+from planner.models import FuelPriceHistory
+
+TENTHS_CENT_PER_DOLLAR = 1000
+# Rack logged for stations the importer keys by OPIS ID alone (every dedupe policy except per-rack), so their
+# history survives the kept rack changing between feeds.
+STATION_RACK = ""
+
+
+def to_tenths_cent(price: Decimal) -> int:
+    return int((price * TENTHS_CENT_PER_DOLLAR).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_tenths_cent(value: int) -> float:
+    return value / TENTHS_CENT_PER_DOLLAR
+
+
+def price_as_of_subquery(as_of: date) -> Subquery:
+    """Correlated subquery for the station's latest logged price on or before `as_of`.
+
+    Matches rows logged for the station's rack or, for stations deduplicated across racks, for the
+    whole OPIS ID; the exact rack wins a same-day tie. The (OPIS ID, rack, effective date) unique
+    index keeps each lookup to a couple of index seeks.
+    """
+    return Subquery(
+        FuelPriceHistory.objects.filter(
+            Q(rack_id=OuterRef("rack_id")) | Q(rack_id=STATION_RACK),
+            opis_truckstop_id=OuterRef("opis_truckstop_id"),
+            effective_date__lte=as_of,
+        )
+        .order_by("-effective_date", "-rack_id")
+        .values("price_tenths_cent")[:1]
+    )
+
+
+def average_price_as_of(as_of: date) -> float | None:
+    """Average of every logged station's latest price on or before `as_of`, including since-retired stations."""
+    latest_date = (
+        FuelPriceHistory.objects.filter(
+            opis_truckstop_id=OuterRef("opis_truckstop_id"),
+            rack_id=OuterRef("rack_id"),
+            effective_date__lte=as_of,
+        )
+        .order_by("-effective_date")
+        .values("effective_date")[:1]
+    )
+    average = FuelPriceHistory.objects.filter(effective_date=Subquery(latest_date)).aggregate(
+        average=Avg("price_tenths_cent")
+    )["average"]
+    return from_tenths_cent(average) if average is not None else None
+
+
+def record_price_changes(prices: Iterable[tuple[str, str, Decimal]], effective_date: date) -> int:
+    """Append a history row for each `(opis_id, rack_id, price)` that differs from its latest logged price.
+
+    `rack_id` is `STATION_RACK` for stations keyed by OPIS ID alone. Re-importing the same day
+    overwrites that day's row. Returns the number of rows written.
+    """
+    incoming = {(opis_id, rack_id): to_tenths_cent(price) for opis_id, rack_id, price in prices}
+    if not incoming:
+        return 0
+
+    latest: dict[tuple[str, str], int] = {}
+    rows = (
+        FuelPriceHistory.objects.filter(
+            opis_truckstop_id__in={opis_id for opis_id, _ in incoming},
+            effective_date__lte=effective_date,
+        )
+        .order_by("effective_date")
+        .values_list("opis_truckstop_id", "rack_id", "price_tenths_cent")
+    )
+    for opis_id, rack_id, price in rows.iterator():
+        latest[(opis_id, rack_id)] = price
+
+    changes = [
+        FuelPriceHistory(
+            opis_truckstop_id=opis_id,
+            rack_id=rack_id,
+            effective_date=effective_date,
+            price_tenths_cent=price,
+        )
+        for (opis_id, rack_id), price in incoming.items()
+        if latest.get((opis_id, rack_id)) != price
+    ]
+    FuelPriceHistory.objects.bulk_create(
+        changes,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["opis_truckstop_id", "rack_id", "effective_date"],
+        update_fields=["price_tenths_cent"],
+    )
+    return len(changes)
@@ -0,0 +1,65 @@
+import math
+import uuid
+from collections.abc import Iterable
+
+from planner.models import RegionVersion
+
+# Fixed, not a setting: cached entries are keyed by cell ids, so resizing cells would orphan their versions.
+REGION_CELL_DEGREES = 1.0
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def region_cell(latitude: float | None, longitude: float | None) -> str | None:
+    if latitude is None or longitude is None:
+        return None
+    return f"cell:{math.floor(latitude / REGION_CELL_DEGREES)}:{math.floor(longitude / REGION_CELL_DEGREES)}"
+
+
+def cell_bounds(cell: str) -> dict[str, float]:
+    """South-west and north-east corners of a `cell:<lat>:<lon>` region id."""
+    _, lat_index, lon_index = cell.split(":")
+    south = int(lat_index) * REGION_CELL_DEGREES
+    west = int(lon_index) * REGION_CELL_DEGREES
+    return {"south": south, "west": west, "north": south + REGION_CELL_DEGREES, "east": west + REGION_CELL_DEGREES}
+
+
+def corridor_cells(points: Iterable[tuple[float, float]], corridor_miles: float) -> set[str]:
+    """Cells that any station within `corridor_miles` of one of the `(lat, lon)` points can fall in."""
+    lat_pad = corridor_miles / MILES_PER_DEGREE_LAT
+    cells: set[str] = set()
+    for latitude, longitude in points:
+        # Use the poleward edge of the band so the longitude pad is never too narrow.
+        edge_lat = min(abs(latitude) + lat_pad, 89.0)
+        lon_pad = corridor_miles / (MILES_PER_DEGREE_LAT * math.cos(math.radians(edge_lat)))
+        for lat_index in range(
+            math.floor((latitude - lat_pad) / REGION_CELL_DEGREES),
+            math.floor((latitude + lat_pad) / REGION_CELL_DEGREES) + 1,
+        ):
+            for lon_index in range(
+                math.floor((longitude - lon_pad) / REGION_CELL_DEGREES),
+                math.floor((longitude + lon_pad) / REGION_CELL_DEGREES) + 1,
+            ):
+                cells.add(f"cell:{lat_index}:{lon_index}")
+    return cells
+
+
+def region_versions(regions: Iterable[str]) -> dict[str, str]:
+    """Current version per region; regions that never changed are absent."""
+    return dict(RegionVersion.objects.filter(region__in=set(regions)).values_list("region", "version"))
+
+
+def publish_region_changes(regions: Iterable[str | None]) -> int:
+    """Give each region a fresh version so cache entries tagged with it stop matching.
+
+    Runs inside the caller's transaction, so new versions become visible together with the
+    station rows that caused them. Returns the number of regions bumped.
+    """
+    changed = sorted({region for region in regions if region})
+    RegionVersion.objects.bulk_create(
+        [RegionVersion(region=region, version=uuid.uuid4().hex) for region in changed],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["region"],
+        update_fields=["version", "updated_at"],
+    )
+    return len(changed)
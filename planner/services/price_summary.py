@@ -0,0 +1,119 @@
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from decimal import Decimal
+from itertools import groupby, islice
+from operator import itemgetter
+from statistics import median
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Floor
+
+from planner.models import FuelStation, RegionalPriceSummary
+from planner.services.price_regions import REGION_CELL_DEGREES, cell_bounds, region_cell
+
+PRICE_QUANTUM = Decimal("0.000001")
+REFRESH_BATCH_SIZE = 200
+
+
+def _summary(level: str, region: str, prices: list[Decimal]) -> RegionalPriceSummary:
+    prices.sort()
+    return RegionalPriceSummary(
+        level=level,
+        region=region,
+        min_price=prices[0],
+        median_price=Decimal(median(prices)).quantize(PRICE_QUANTUM),
+        avg_price=(sum(prices) / len(prices)).quantize(PRICE_QUANTUM),
+        station_count=len(prices),
+    )
+
+
+def _stream_summaries(level: str, rows: Iterable[tuple[str, Decimal]]) -> Iterator[RegionalPriceSummary]:
+    """One summary per region from `(region, price)` rows ordered by region, holding one region's prices at a time."""
+    for region, group in groupby(rows, key=itemgetter(0)):
+        yield _summary(level, region, [price for _, price in group])
+
+
+def rebuild_price_summaries() -> int:
+    """Recompute every per-state and per-cell aggregate from `FuelStation`; returns rows written.
+
+    The database sorts stations by region and price, and the rows stream through, so memory is
+    bounded by the largest region rather than the table.
+    """
+    states = (
+        FuelStation.objects.order_by("state", "retail_price")
+        .values_list("state", "retail_price")
+        .iterator(chunk_size=5000)
+    )
+    cell_rows = (
+        FuelStation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .annotate(
+            cell_lat=Floor(F("latitude") / REGION_CELL_DEGREES),
+            cell_lon=Floor(F("longitude") / REGION_CELL_DEGREES),
+        )
+        .order_by("cell_lat", "cell_lon", "retail_price")
+        .values_list("cell_lat", "cell_lon", "retail_price")
+        .iterator(chunk_size=5000)
+    )
+    cells = ((f"cell:{int(cell_lat)}:{int(cell_lon)}", price) for cell_lat, cell_lon, price in cell_rows)
+
+    written = 0
+    with transaction.atomic():
+        RegionalPriceSummary.objects.all().delete()
+        for level, rows in ((RegionalPriceSummary.LEVEL_STATE, states), (RegionalPriceSummary.LEVEL_CELL, cells)):
+            summaries = _stream_summaries(level, rows)
+            while batch := list(islice(summaries, 1000)):
+                RegionalPriceSummary.objects.bulk_create(batch)
+                written += len(batch)
+    return written
+
+
+def refresh_price_summaries(states: Iterable[str], cells: Iterable[str]) -> int:
+    """Recompute only the given state and cell summaries, e.g. after an incremental import or admin edit.
+
+    Regions left without stations lose their row. Returns rows written.
+    """
+    states = sorted({state for state in states if state})
+    cells = sorted({cell for cell in cells if cell})
+    if not states and not cells:
+        return 0
+
+    by_region: dict[tuple[str, str], list[Decimal]] = defaultdict(list)
+    for start in range(0, len(states), REFRESH_BATCH_SIZE):
+        rows = FuelStation.objects.filter(state__in=states[start : start + REFRESH_BATCH_SIZE])
+        for state, price in rows.values_list("state", "retail_price").iterator(chunk_size=5000):
+            by_region[(RegionalPriceSummary.LEVEL_STATE, state)].append(price)
+    for start in range(0, len(cells), REFRESH_BATCH_SIZE):
+        batch = set(cells[start : start + REFRESH_BATCH_SIZE])
+        in_batch = Q()
+        for bounds in map(cell_bounds, batch):
+            in_batch |= Q(
+                latitude__gte=bounds["south"],
+                latitude__lt=bounds["north"],
+                longitude__gte=bounds["west"],
+                longitude__lt=bounds["east"],
+            )
+        rows = FuelStation.objects.filter(in_batch).values_list("latitude", "longitude", "retail_price")
+        for latitude, longitude, price in rows.iterator(chunk_size=5000):
+            cell = region_cell(latitude, longitude)
+            if cell in batch:
+                by_region[(RegionalPriceSummary.LEVEL_CELL, cell)].append(price)
+
+    summaries = [_summary(level, region, prices) for (level, region), prices in sorted(by_region.items())]
+    with transaction.atomic():
+        RegionalPriceSummary.objects.filter(
+            Q(level=RegionalPriceSummary.LEVEL_STATE, region__in=states)
+            | Q(level=RegionalPriceSummary.LEVEL_CELL, region__in=cells)
+        ).delete()
+        RegionalPriceSummary.objects.bulk_create(summaries, batch_size=1000)
+    return len(summaries)
+
+
+def national_average_price() -> float | None:
+    """Station-weighted average over the state summaries, or None before the first rebuild."""
+    rows = RegionalPriceSummary.objects.filter(level=RegionalPriceSummary.LEVEL_STATE).values_list(
+        "avg_price", "station_count"
+    )
+    weighted = sum(avg_price * count for avg_price, count in rows)
+    stations = sum(count for _, count in rows)
+    return float(weighted / stations) if stations else None
@@ -0,0 +1,36 @@
+import math
+import time
+
+from django.core.cache import cache
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def _slot_key(name: str, slot: int) -> str:
+    return f"rate-limit::{name}::{slot}"
+
+
+def acquire_rate_slot(name: str, rate_per_second: float, max_wait_seconds: float) -> float:
+    """Reserve the next free send slot for `name` and sleep until it opens; returns seconds waited.
+
+    Time is cut into `1 / rate_per_second` slots and each slot can be claimed once through an
+    atomic `cache.add`, so threads and workers sharing the cache backend queue behind each other
+    in claim order and each slot carries at most one request. Raises `RateLimitExceeded` if no
+    slot is free within `max_wait_seconds`.
+    """
+    interval = 1.0 / rate_per_second
+    now = time.time()
+    first_slot = math.floor(now / interval)
+    last_slot = math.floor((now + max_wait_seconds) / interval)
+    key_timeout = math.ceil(max_wait_seconds + interval) + 1
+
+    for slot in range(first_slot, last_slot + 1):
+        if cache.add(_slot_key(name, slot), 1, timeout=key_timeout):
+            delay = max(0.0, slot * interval - time.time())
+            if delay:
+                time.sleep(delay)
+            return delay
+
+    raise RateLimitExceeded(f"No {name} request slot free within {max_wait_seconds:g}s")
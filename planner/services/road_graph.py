@@ -0,0 +1,333 @@
+import heapq
+import math
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+from planner.services.distance import haversine_miles
+
+GRAPH_FILE_MAGIC = b"SPRG0001"
+GRAPH_HEADER = struct.Struct("<8sII")
+GRID_CELL_DEGREES = 0.1
+WITNESS_SETTLED_LIMIT = 200
+MAX_SNAP_RING = 20
+
+
+class RoadGraphError(Exception):
+    pass
+
+
+def _witness_costs(
+    out_edges: list[dict[int, tuple[float, float, int]]],
+    contracted: list[bool],
+    source: int,
+    excluded: int,
+    targets: set[int],
+    max_cost: float,
+) -> dict[int, float]:
+    """Bounded Dijkstra from `source` that ignores `excluded` and already contracted nodes."""
+    distances = {source: 0.0}
+    heap = [(0.0, source)]
+    remaining = set(targets)
+    settled = 0
+    while heap and remaining and settled < WITNESS_SETTLED_LIMIT:
+        cost, node = heapq.heappop(heap)
+        if cost > distances.get(node, math.inf):
+            continue
+        if cost > max_cost:
+            break
+        settled += 1
+        remaining.discard(node)
+        for neighbor, (weight, _, _) in out_edges[node].items():
+            if neighbor == excluded or contracted[neighbor]:
+                continue
+            next_cost = cost + weight
+            if next_cost < distances.get(neighbor, math.inf):
+                distances[neighbor] = next_cost
+                heapq.heappush(heap, (next_cost, neighbor))
+    return distances
+
+
+def _contract_node(
+    node: int,
+    out_edges: list[dict[int, tuple[float, float, int]]],
+    in_edges: list[dict[int, tuple[float, float, int]]],
+    contracted: list[bool],
+    apply: bool,
+) -> int:
+    """Count (and optionally insert) the shortcuts needed to bypass `node`."""
+    shortcuts = 0
+    outgoing = [(target, edge) for target, edge in out_edges[node].items() if not contracted[target]]
+    for source, (in_weight, in_distance, _) in list(in_edges[node].items()):
+        if contracted[source]:
+            continue
+        targets = {target for target, _ in outgoing if target != source}
+        if not targets:
+            continue
+        max_cost = in_weight + max(edge[0] for target, edge in outgoing if target in targets)
+        witnesses = _witness_costs(out_edges, contracted, source, node, targets, max_cost)
+        for target, (out_weight, out_distance, _) in outgoing:
+            if target == source:
+                continue
+            via_cost = in_weight + out_weight
+            if witnesses.get(target, math.inf) <= via_cost:
+                continue
+            shortcuts += 1
+            if apply:
+                existing = out_edges[source].get(target)
+                if existing is None or via_cost < existing[0]:
+                    shortcut = (via_cost, in_distance + out_distance, node)
+                    out_edges[source][target] = shortcut
+                    in_edges[target][source] = shortcut
+    return shortcuts
+
+
+def _node_priority(
+    node: int,
+    out_edges: list[dict[int, tuple[float, float, int]]],
+    in_edges: list[dict[int, tuple[float, float, int]]],
+    contracted: list[bool],
+    contracted_neighbors: list[int],
+) -> int:
+    removed = sum(1 for target in out_edges[node] if not contracted[target])
+    removed += sum(1 for source in in_edges[node] if not contracted[source])
+    added = _contract_node(node, out_edges, in_edges, contracted, apply=False)
+    return added - removed + contracted_neighbors[node]
+
+
+class RoadGraph:
+    """Directed road graph with a contraction hierarchy for fast shortest-duration queries.
+
+    Edges are `(source, target, duration_seconds, distance_meters, middle)` where `middle` is
+    the contracted node a shortcut bypasses, or -1 for an original road segment.
+    """
+
+    def __init__(
+        self,
+        latitudes: list[float],
+        longitudes: list[float],
+        ranks: list[int],
+        edges: list[tuple[int, int, float, float, int]],
+    ):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.ranks = ranks
+        self.edges = edges
+
+        node_count = len(latitudes)
+        self._upward_forward: list[list[tuple[int, float]]] = [[] for _ in range(node_count)]
+        self._upward_backward: list[list[tuple[int, float]]] = [[] for _ in range(node_count)]
+        self._edge_data: dict[tuple[int, int], tuple[float, float, int]] = {}
+        for source, target, duration, distance, middle in edges:
+            self._edge_data[(source, target)] = (duration, distance, middle)
+            if ranks[target] > ranks[source]:
+                self._upward_forward[source].append((target, duration))
+            else:
+                self._upward_backward[target].append((source, duration))
+
+        self._grid: dict[tuple[int, int], list[int]] = {}
+        for node in range(node_count):
+            self._grid.setdefault(self._grid_cell(latitudes[node], longitudes[node]), []).append(node)
+
+    @classmethod
+    def build(
+        cls,
+        latitudes: list[float],
+        longitudes: list[float],
+        edges: list[tuple[int, int, float, float]],
+    ) -> "RoadGraph":
+        """Contract a plain directed graph of `(source, target, duration_seconds, distance_meters)` edges."""
+        node_count = len(latitudes)
+        out_edges: list[dict[int, tuple[float, float, int]]] = [{} for _ in range(node_count)]
+        in_edges: list[dict[int, tuple[float, float, int]]] = [{} for _ in range(node_count)]
+        for source, target, duration, distance in edges:
+            if source == target:
+                continue
+            existing = out_edges[source].get(target)
+            if existing is None or duration < existing[0]:
+                out_edges[source][target] = (duration, distance, -1)
+                in_edges[target][source] = (duration, distance, -1)
+
+        contracted = [False] * node_count
+        contracted_neighbors = [0] * node_count
+        heap = [
+            (_node_priority(node, out_edges, in_edges, contracted, contracted_neighbors), node)
+            for node in range(node_count)
+        ]
+        heapq.heapify(heap)
+
+        ranks = [0] * node_count
+        next_rank = 0
+        while heap:
+            _, node = heapq.heappop(heap)
+            if contracted[node]:
+                continue
+            # Lazy update: re-queue the node if its priority went stale since it was pushed.
+            priority = _node_priority(node, out_edges, in_edges, contracted, contracted_neighbors)
+            if heap and priority > heap[0][0]:
+                heapq.heappush(heap, (priority, node))
+                continue
+
+            _contract_node(node, out_edges, in_edges, contracted, apply=True)
+            contracted[node] = True
+            ranks[node] = next_rank
+            next_rank += 1
+            for neighbor in set(out_edges[node]) | set(in_edges[node]):
+                contracted_neighbors[neighbor] += 1
+
+        all_edges = [
+            (source, target, duration, distance, middle)
+            for source in range(node_count)
+            for target, (duration, distance, middle) in out_edges[source].items()
+        ]
+        return cls(latitudes=latitudes, longitudes=longitudes, ranks=ranks, edges=all_edges)
+
+    @staticmethod
+    def _grid_cell(latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / GRID_CELL_DEGREES), math.floor(longitude / GRID_CELL_DEGREES)
+
+    def nearest_node(self, latitude: float, longitude: float) -> int:
+        cell_lat, cell_lon = self._grid_cell(latitude, longitude)
+        best_node = -1
+        best_distance = math.inf
+        first_hit_ring = -1
+        for ring in range(MAX_SNAP_RING + 1):
+            for d_lat in range(-ring, ring + 1):
+                for d_lon in range(-ring, ring + 1):
+                    if max(abs(d_lat), abs(d_lon)) != ring:
+                        continue
+                    for node in self._grid.get((cell_lat + d_lat, cell_lon + d_lon), []):
+                        distance = haversine_miles(latitude, longitude, self.latitudes[node], self.longitudes[node])
+                        if distance < best_distance:
+                            best_distance = distance
+                            best_node = node
+            # A hit inside ring r can only be beaten by a node at most one ring further out.
+            if best_node >= 0 and first_hit_ring < 0:
+                first_hit_ring = ring
+            if first_hit_ring >= 0 and ring > first_hit_ring:
+                break
+        if best_node < 0:
+            raise RoadGraphError("No road graph node near the requested coordinate")
+        return best_node
+
+    def _unpack(self, source: int, target: int, path: list[int]):
+        _, _, middle = self._edge_data[(source, target)]
+        if middle < 0:
+            path.append(target)
+            return
+        self._unpack(source, middle, path)
+        self._unpack(middle, target, path)
+
+    def shortest_path(self, source: int, target: int) -> tuple[float, float, list[int]]:
+        """Return `(duration_seconds, distance_meters, node_path)` via bidirectional upward search."""
+        if source == target:
+            return 0.0, 0.0, [source]
+
+        forward = {source: 0.0}
+        backward = {target: 0.0}
+        forward_parent: dict[int, int] = {}
+        backward_parent: dict[int, int] = {}
+        forward_heap = [(0.0, source)]
+        backward_heap = [(0.0, target)]
+        best_cost = math.inf
+        meeting_node = -1
+
+        while forward_heap or backward_heap:
+            for heap, costs, other_costs, parents, adjacency in (
+                (forward_heap, forward, backward, forward_parent, self._upward_forward),
+                (backward_heap, backward, forward, backward_parent, self._upward_backward),
+            ):
+                if not heap:
+                    continue
+                cost, node = heapq.heappop(heap)
+                if cost > costs.get(node, math.inf):
+                    continue
+                if cost >= best_cost:
+                    heap.clear()
+                    continue
+                if node in other_costs and cost + other_costs[node] < best_cost:
+                    best_cost = cost + other_costs[node]
+                    meeting_node = node
+                for neighbor, weight in adjacency[node]:
+                    next_cost = cost + weight
+                    if next_cost < costs.get(neighbor, math.inf):
+                        costs[neighbor] = next_cost
+                        parents[neighbor] = node
+                        heapq.heappush(heap, (next_cost, neighbor))
+
+        if meeting_node < 0:
+            raise RoadGraphError("No path between the requested coordinates in the road graph")
+
+        upward_chain = [meeting_node]
+        while upward_chain[-1] != source:
+            upward_chain.append(forward_parent[upward_chain[-1]])
+        upward_chain.reverse()
+        downward_chain = [meeting_node]
+        while downward_chain[-1] != target:
+            downward_chain.append(backward_parent[downward_chain[-1]])
+
+        path = [source]
+        chain = upward_chain + downward_chain[1:]
+        distance = 0.0
+        for hop_source, hop_target in zip(chain, chain[1:], strict=False):
+            distance += self._edge_data[(hop_source, hop_target)][1]
+            self._unpack(hop_source, hop_target, path)
+        return best_cost, distance, path
+
+    def save(self, path: Path):
+        sections = [
+            array("d", self.latitudes),
+            array("d", self.longitudes),
+            array("i", self.ranks),
+            array("i", [edge[0] for edge in self.edges]),
+            array("i", [edge[1] for edge in self.edges]),
+            array("d", [edge[2] for edge in self.edges]),
+            array("d", [edge[3] for edge in self.edges]),
+            array("i", [edge[4] for edge in self.edges]),
+        ]
+        payload = bytearray()
+        for section in sections:
+            if sys.byteorder == "big":
+                section.byteswap()
+            payload.extend(section.tobytes())
+
+        header = GRAPH_HEADER.pack(GRAPH_FILE_MAGIC, len(self.latitudes), len(self.edges))
+        path.write_bytes(header + zlib.compress(bytes(payload)))
+
+    @classmethod
+    def load(cls, path: Path) -> "RoadGraph":
+        raw = path.read_bytes()
+        magic, node_count, edge_count = GRAPH_HEADER.unpack_from(raw)
+        if magic != GRAPH_FILE_MAGIC:
+            raise RoadGraphError(f"Unrecognized road graph file: {path}")
+        payload = memoryview(zlib.decompress(raw[GRAPH_HEADER.size :]))
+
+        offset = 0
+        sections = []
+        for typecode, count in (
+            ("d", node_count),
+            ("d", node_count),
+            ("i", node_count),
+            ("i", edge_count),
+            ("i", edge_count),
+            ("d", edge_count),
+            ("d", edge_count),
+            ("i", edge_count),
+        ):
+            section = array(typecode)
+            size = section.itemsize * count
+            section.frombytes(payload[offset : offset + size])
+            if sys.byteorder == "big":
+                section.byteswap()
+            sections.append(section)
+            offset += size
+
+        latitudes, longitudes, ranks, sources, targets, durations, distances, middles = sections
+        return cls(
+            latitudes=latitudes.tolist(),
+            longitudes=longitudes.tolist(),
+            ranks=ranks.tolist(),
+            edges=list(zip(sources, targets, durations, distances, middles, strict=True)),
+        )
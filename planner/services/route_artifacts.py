@@ -0,0 +1,72 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import date
+
+from django.core.cache import cache
+
+from planner.domain.types import RouteResult, StationCandidate
+from planner.services.distance import cumulative_route_distances
+from planner.services.price_regions import corridor_cells, region_versions
+from planner.services.station_locator import (
+    bbox_from_route,
+    build_sample_indexes,
+    fetch_route_station_candidates,
+)
+
+ARTIFACT_CACHE_TIMEOUT_SECONDS = 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class RouteArtifacts:
+    cumulative_miles: list[float]
+    bbox: tuple[float, float, float, float]
+    sample_indexes: list[int]
+    candidates: list[StationCandidate]
+
+
+def _region_tag(route: RouteResult, corridor_miles: float) -> str:
+    """Versions of the price regions the route corridor touches, in a stable order."""
+    points = [(route.geometry[index][1], route.geometry[index][0]) for index in build_sample_indexes(route.geometry)]
+    versions = region_versions(corridor_cells(points, corridor_miles))
+    return ",".join(f"{region}={versions[region]}" for region in sorted(versions))
+
+
+def _cache_key(route_cache_key: str, corridor_miles: float, region_tag: str, as_of: date | None) -> str:
+    as_of_part = as_of.isoformat() if as_of else "current"
+    payload = f"{route_cache_key}:{corridor_miles:.3f}:{region_tag}:{as_of_part}".encode("utf-8")
+    return f"route-artifacts::{hashlib.sha256(payload).hexdigest()}"
+
+
+def build_route_artifacts(route: RouteResult, corridor_miles: float, as_of: date | None = None) -> RouteArtifacts:
+    cumulative_miles = cumulative_route_distances(route.geometry)
+    bbox = bbox_from_route(route.geometry, corridor_miles)
+    sample_indexes = build_sample_indexes(route.geometry)
+    candidates = fetch_route_station_candidates(
+        route_geometry=route.geometry,
+        route_cumulative_miles=cumulative_miles,
+        corridor_miles=corridor_miles,
+        bbox=bbox,
+        sample_indexes=sample_indexes,
+        as_of=as_of,
+    )
+    return RouteArtifacts(
+        cumulative_miles=cumulative_miles,
+        bbox=bbox,
+        sample_indexes=sample_indexes,
+        candidates=candidates,
+    )
+
+
+def get_route_artifacts(route: RouteResult, corridor_miles: float, as_of: date | None = None) -> RouteArtifacts:
+    """Return request-independent per-route data, reusing it until a price region along the corridor changes."""
+    if not route.cache_key:
+        return build_route_artifacts(route, corridor_miles, as_of=as_of)
+
+    key = _cache_key(route.cache_key, corridor_miles, _region_tag(route, corridor_miles), as_of)
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    artifacts = build_route_artifacts(route, corridor_miles, as_of=as_of)
+    cache.set(key, artifacts, timeout=ARTIFACT_CACHE_TIMEOUT_SECONDS)
+    return artifacts
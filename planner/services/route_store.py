@@ -0,0 +1,131 @@
+import sys
+import threading
+import zlib
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from planner.domain.types import RouteResult
+from planner.models import CachedRoute
+
+COORDINATE_SCALE = 1_000_000
+TOUCH_INTERVAL = timedelta(minutes=1)
+EVICTION_BATCH_SIZE = 500
+
+# Saves since this process last checked the byte budget; the check sums the whole table, so it is amortised.
+_pending_saves = 0
+_pending_saves_lock = threading.Lock()
+
+
+def encode_geometry(geometry: list[list[float]]) -> bytes:
+    """Pack `[lon, lat]` pairs as zlib-compressed, delta-encoded int32 microdegrees."""
+    packed = array("i")
+    prev_lon = 0
+    prev_lat = 0
+    for lon, lat in geometry:
+        scaled_lon = round(lon * COORDINATE_SCALE)
+        scaled_lat = round(lat * COORDINATE_SCALE)
+        packed.append(scaled_lon - prev_lon)
+        packed.append(scaled_lat - prev_lat)
+        prev_lon = scaled_lon
+        prev_lat = scaled_lat
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return zlib.compress(packed.tobytes())
+
+
+def decode_geometry(blob: bytes) -> list[list[float]]:
+    packed = array("i")
+    packed.frombytes(zlib.decompress(blob))
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    geometry: list[list[float]] = []
+    lon = 0
+    lat = 0
+    for idx in range(0, len(packed), 2):
+        lon += packed[idx]
+        lat += packed[idx + 1]
+        geometry.append([lon / COORDINATE_SCALE, lat / COORDINATE_SCALE])
+    return geometry
+
+
+def load_route(cache_key: str) -> RouteResult | None:
+    if not settings.ROUTE_STORE_ENABLED:
+        return None
+
+    entry = CachedRoute.objects.filter(cache_key=cache_key).first()
+    if entry is None:
+        return None
+
+    now = timezone.now()
+    if now - entry.last_accessed_at > TOUCH_INTERVAL:
+        CachedRoute.objects.filter(pk=entry.pk).update(last_accessed_at=now)
+
+    return RouteResult(
+        distance_miles=entry.distance_miles,
+        duration_minutes=entry.duration_minutes,
+        geometry=decode_geometry(bytes(entry.geometry)),
+        provider=entry.provider,
+        cache_key=cache_key,
+    )
+
+
+def save_route(cache_key: str, route: RouteResult):
+    if not settings.ROUTE_STORE_ENABLED:
+        return
+
+    blob = encode_geometry(route.geometry)
+    # One INSERT ... ON CONFLICT statement: unlike a select-then-write transaction it never has to upgrade
+    # a read lock, so concurrent saves (batch planning, parallel legs) queue on SQLite's busy timeout.
+    CachedRoute.objects.bulk_create(
+        [
+            CachedRoute(
+                cache_key=cache_key,
+                provider=route.provider,
+                distance_miles=route.distance_miles,
+                duration_minutes=route.duration_minutes,
+                geometry=blob,
+                size_bytes=len(blob),
+                last_accessed_at=timezone.now(),
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["cache_key"],
+        update_fields=["provider", "distance_miles", "duration_minutes", "geometry", "size_bytes", "last_accessed_at"],
+    )
+    if _eviction_due():
+        _evict_to_budget(int(settings.ROUTE_STORE_MAX_BYTES))
+
+
+def _eviction_due() -> bool:
+    """True on every `ROUTE_STORE_EVICT_EVERY`-th save in this process."""
+    global _pending_saves
+    with _pending_saves_lock:
+        _pending_saves += 1
+        if _pending_saves < int(settings.ROUTE_STORE_EVICT_EVERY):
+            return False
+        _pending_saves = 0
+        return True
+
+
+def _evict_to_budget(max_bytes: int):
+    total_bytes = CachedRoute.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+    if total_bytes <= max_bytes:
+        return
+
+    # Drop least recently used entries until the store fits the byte budget again.
+    excess = total_bytes - max_bytes
+    stale_ids: list[int] = []
+    for entry_id, size_bytes in CachedRoute.objects.order_by("last_accessed_at", "id").values_list("id", "size_bytes"):
+        stale_ids.append(entry_id)
+        excess -= size_bytes
+        if excess <= 0:
+            break
+
+    for start in range(0, len(stale_ids), EVICTION_BATCH_SIZE):
+        CachedRoute.objects.filter(id__in=stale_ids[start : start + EVICTION_BATCH_SIZE]).delete()
@@ -1,25 +1,57 @@
 import hashlib
-from dataclasses import dataclass
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any
 
 import requests
 from django.conf import settings
 from django.core.cache import cache
 
-MILES_PER_METER = 0.000621371
-
+from planner.domain.types import RouteResult
+from planner.services.concurrency import map_concurrently
+from planner.services.polyline import decode_polyline
+from planner.services.road_graph import RoadGraph, RoadGraphError
+from planner.services.route_store import load_route, save_route
+from planner.services.single_flight import single_flight
 
-@dataclass(frozen=True)
-class RouteResult:
-    distance_miles: float
-    duration_minutes: float
-    geometry: list[list[float]]
-    provider: str
+MILES_PER_METER = 0.000621371
+MAPBOX_MAX_COORDINATES = 25
+PERSISTED_PROVIDERS = {"mapbox", "osrm"}
 
 
 class RoutingError(Exception):
     pass
 
 
+class UpstreamCallCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def increment(self):
+        with self._lock:
+            self.calls += 1
+
+
+_upstream_call_counter: ContextVar[UpstreamCallCounter | None] = ContextVar("upstream_call_counter", default=None)
+
+
+@contextmanager
+def count_upstream_route_calls() -> Iterator[UpstreamCallCounter]:
+    """Count routing requests that miss every cache layer while the block runs."""
+    counter = UpstreamCallCounter()
+    token = _upstream_call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _upstream_call_counter.reset(token)
+
+
 def _cache_key(provider: str, points: list[tuple[float, float]], profile: str = "") -> str:
     serialized = ";".join(f"{round(lat, 5)}:{round(lon, 5)}" for lat, lon in points)
     payload = f"{provider}:{profile}::{serialized}".encode("utf-8")
@@ -49,13 +81,36 @@ def _dedupe_consecutive_points(points: list[tuple[float, float]]) -> list[tuple[
     return deduped
 
 
-def _fetch_mapbox_route(points: list[tuple[float, float]]) -> RouteResult:
+def _route_geometry(route: dict) -> list[list[float]]:
+    geometry = route["geometry"]
+    if isinstance(geometry, str):
+        return decode_polyline(geometry, precision=6)
+    return geometry["coordinates"]
+
+
+def _parse_routes(payload: dict, provider: str, label: str) -> list[RouteResult]:
+    if payload.get("code") != "Ok" or not payload.get("routes"):
+        message = payload.get("message", "route not available")
+        raise RoutingError(f"{label} directions failed: {message}")
+
+    return [
+        RouteResult(
+            distance_miles=float(route["distance"]) * MILES_PER_METER,
+            duration_minutes=float(route["duration"]) / 60.0,
+            geometry=_route_geometry(route),
+            provider=provider,
+        )
+        for route in payload["routes"]
+    ]
+
+
+def _fetch_mapbox_routes(points: list[tuple[float, float]], alternatives: int = 0) -> list[RouteResult]:
     token = settings.MAPBOX_ACCESS_TOKEN
     if not token:
         raise RoutingError("MAPBOX_ACCESS_TOKEN is required when MAP_PROVIDER=mapbox")
 
-    if len(points) > 25:
-        raise RoutingError("Mapbox supports up to 25 coordinates per route request")
+    if len(points) > MAPBOX_MAX_COORDINATES:
+        raise RoutingError(f"Mapbox supports up to {MAPBOX_MAX_COORDINATES} coordinates per route request")
 
     profile = settings.MAPBOX_DIRECTIONS_PROFILE
     coordinate_string = ";".join(f"{lon},{lat}" for lat, lon in points)
@@ -64,94 +119,323 @@ def _fetch_mapbox_route(points: list[tuple[float, float]]) -> RouteResult:
     payload = _request_json(
         url,
         params={
-            "alternatives": "false",
+            "alternatives": "true" if alternatives > 0 else "false",
             "overview": "full",
-            "geometries": "geojson",
+            "geometries": "polyline6",
             "steps": "false",
             "access_token": token,
         },
     )
-
-    if payload.get("code") != "Ok" or not payload.get("routes"):
-        message = payload.get("message", "route not available")
-        raise RoutingError(f"Mapbox directions failed: {message}")
-
-    route = payload["routes"][0]
-    return RouteResult(
-        distance_miles=float(route["distance"]) * MILES_PER_METER,
-        duration_minutes=float(route["duration"]) / 60.0,
-        geometry=route["geometry"]["coordinates"],
-        provider="mapbox",
-    )
+    return _parse_routes(payload, provider="mapbox", label="Mapbox")[: alternatives + 1]
 
 
-def _fetch_osrm_route(points: list[tuple[float, float]]) -> RouteResult:
+def _fetch_osrm_routes(points: list[tuple[float, float]], alternatives: int = 0) -> list[RouteResult]:
     coordinate_string = ";".join(f"{lon},{lat}" for lat, lon in points)
     url = f"{settings.OSRM_API_BASE_URL}/route/v1/driving/{coordinate_string}"
 
     payload = _request_json(
         url,
         params={
+            "alternatives": str(alternatives) if alternatives > 0 else "false",
             "overview": "full",
-            "geometries": "geojson",
+            "geometries": "polyline6",
             "steps": "false",
         },
     )
+    return _parse_routes(payload, provider="osrm", label="OSRM")[: alternatives + 1]
+
+
+@lru_cache(maxsize=1)
+def _get_road_graph(path: str) -> RoadGraph:
+    return RoadGraph.load(Path(path))
+
+
+def preload_road_graph() -> bool:
+    """Load the local road graph ahead of the first request; returns False when it is not in use."""
+    graph_path = Path(settings.LOCAL_ROAD_GRAPH_PATH)
+    if _resolve_provider() != "local" or not graph_path.exists():
+        return False
+    _get_road_graph(str(graph_path))
+    return True
+
+
+def _fetch_local_route(points: list[tuple[float, float]]) -> RouteResult:
+    graph_path = Path(settings.LOCAL_ROAD_GRAPH_PATH)
+    if not graph_path.exists():
+        raise RoutingError(f"Local road graph not found at {graph_path}; run build_road_graph first")
+
+    graph = _get_road_graph(str(graph_path))
+    try:
+        nodes = [graph.nearest_node(lat, lon) for lat, lon in points]
+        duration_seconds = 0.0
+        distance_meters = 0.0
+        path = [nodes[0]]
+        for source, target in zip(nodes, nodes[1:], strict=False):
+            leg_duration, leg_distance, leg_path = graph.shortest_path(source, target)
+            duration_seconds += leg_duration
+            distance_meters += leg_distance
+            path.extend(leg_path[1:])
+    except RoadGraphError as exc:
+        raise RoutingError(f"Local routing failed: {exc}") from exc
 
-    if payload.get("code") != "Ok" or not payload.get("routes"):
-        message = payload.get("message", "route not available")
-        raise RoutingError(f"OSRM directions failed: {message}")
-
-    route = payload["routes"][0]
     return RouteResult(
-        distance_miles=float(route["distance"]) * MILES_PER_METER,
-        duration_minutes=float(route["duration"]) / 60.0,
-        geometry=route["geometry"]["coordinates"],
-        provider="osrm",
+        distance_miles=distance_meters * MILES_PER_METER,
+        duration_minutes=duration_seconds / 60.0,
+        geometry=[[graph.longitudes[node], graph.latitudes[node]] for node in path],
+        provider="local",
     )
 
 
 def _resolve_provider() -> str:
     value = settings.MAP_PROVIDER
-    if value in {"mapbox", "osrm", "auto"}:
+    if value in {"mapbox", "osrm", "local", "auto"}:
         return value
     return "auto"
 
 
-def fetch_route_through_points(points: list[tuple[float, float]]) -> RouteResult:
-    normalized_points = _dedupe_consecutive_points(points)
-    if len(normalized_points) < 2:
-        raise RoutingError("At least two coordinates are required to build a route")
+def _provider_profile(candidate: str) -> str:
+    if candidate == "mapbox":
+        return settings.MAPBOX_DIRECTIONS_PROFILE
+    if candidate == "local":
+        return str(settings.LOCAL_ROAD_GRAPH_PATH)
+    return ""
+
+
+def _fetch_provider_routes(
+    candidate: str,
+    points: list[tuple[float, float]],
+    alternatives: int = 0,
+) -> list[RouteResult]:
+    counter = _upstream_call_counter.get()
+    if counter is not None:
+        counter.increment()
+    if candidate == "mapbox":
+        return _fetch_mapbox_routes(points, alternatives=alternatives)
+    if candidate == "local":
+        # The local graph answers a single shortest path; alternatives are not computed offline.
+        return [_fetch_local_route(points)]
+    return _fetch_osrm_routes(points, alternatives=alternatives)
+
+
+def _fetch_and_cache_route(candidate: str, points: list[tuple[float, float]], key: str) -> RouteResult:
+    # Local routing answers in milliseconds, so only paid/remote providers use the persistent store.
+    persisted = candidate in PERSISTED_PROVIDERS
+    result = load_route(key) if persisted else None
+    if result is None:
+        result = replace(_fetch_provider_routes(candidate, points)[0], cache_key=key)
+        if persisted:
+            save_route(key, result)
+
+    cache.set(key, result, timeout=24 * 60 * 60)
+    return result
+
+
+def _chunk_waypoints(
+    points: list[tuple[float, float]],
+    max_points: int,
+) -> list[list[tuple[float, float]]]:
+    # Consecutive chunks share their boundary waypoint so the legs join end to end.
+    chunks: list[list[tuple[float, float]]] = []
+    start = 0
+    while start < len(points) - 1:
+        end = min(start + max_points, len(points))
+        chunks.append(points[start:end])
+        start = end - 1
+    return chunks
+
+
+def _stitch_routes(legs: list[RouteResult]) -> RouteResult:
+    geometry: list[list[float]] = []
+    for leg in legs:
+        leg_geometry = leg.geometry
+        if geometry and leg_geometry and geometry[-1] == leg_geometry[0]:
+            leg_geometry = leg_geometry[1:]
+        geometry.extend(leg_geometry)
+
+    cache_key = ""
+    if all(leg.cache_key for leg in legs):
+        leg_keys = ";".join(leg.cache_key for leg in legs)
+        cache_key = f"route::{hashlib.sha256(leg_keys.encode('utf-8')).hexdigest()}"
+
+    providers = list(dict.fromkeys(leg.provider for leg in legs))
+    return RouteResult(
+        distance_miles=sum(leg.distance_miles for leg in legs),
+        duration_minutes=sum(leg.duration_minutes for leg in legs),
+        geometry=geometry,
+        provider="+".join(providers),
+        cache_key=cache_key,
+    )
 
+
+def _fetch_and_cache_alternatives(
+    candidate: str,
+    points: list[tuple[float, float]],
+    key: str,
+    alternatives: int,
+) -> list[RouteResult]:
+    routes = [
+        replace(route, cache_key=f"{key}#{index}")
+        for index, route in enumerate(_fetch_provider_routes(candidate, points, alternatives=alternatives))
+    ]
+    cache.set(key, routes, timeout=24 * 60 * 60)
+    return routes
+
+
+def _fetch_with_provider_fallback(
+    points: list[tuple[float, float]],
+    fetch: Callable[..., Any],
+    profile_suffix: str = "",
+) -> Any:
     provider = _resolve_provider()
     candidate_providers = ["mapbox", "osrm"] if provider == "auto" else [provider]
 
     errors: list[str] = []
     for candidate in candidate_providers:
-        profile = settings.MAPBOX_DIRECTIONS_PROFILE if candidate == "mapbox" else ""
-        key = _cache_key(candidate, normalized_points, profile)
+        key = _cache_key(candidate, points, _provider_profile(candidate) + profile_suffix)
         cached = cache.get(key)
         if cached:
             return cached
 
         try:
-            if candidate == "mapbox":
-                result = _fetch_mapbox_route(normalized_points)
-            else:
-                result = _fetch_osrm_route(normalized_points)
+            return single_flight(key, partial(fetch, candidate, points, key))
         except RoutingError as exc:
             errors.append(f"{candidate}: {exc}")
             if provider != "auto":
                 raise
             continue
 
-        cache.set(key, result, timeout=24 * 60 * 60)
-        return result
-
     detail = "; ".join(errors) if errors else "No routing providers available"
     raise RoutingError(f"Unable to build route: {detail}")
 
 
+def fetch_route_through_points(points: list[tuple[float, float]]) -> RouteResult:
+    normalized_points = _dedupe_consecutive_points(points)
+    if len(normalized_points) < 2:
+        raise RoutingError("At least two coordinates are required to build a route")
+
+    max_points = max(2, min(int(settings.ROUTE_MAX_WAYPOINTS_PER_REQUEST), MAPBOX_MAX_COORDINATES))
+    if len(normalized_points) > max_points:
+        # Each chunk is fetched and cached as its own route, so plans sharing legs reuse them.
+        legs = map_concurrently(
+            fetch_route_through_points,
+            _chunk_waypoints(normalized_points, max_points),
+            max_workers=int(settings.ROUTE_LEG_MAX_WORKERS),
+        )
+        return _stitch_routes(legs)
+
+    return _fetch_with_provider_fallback(normalized_points, _fetch_and_cache_route)
+
+
+def fetch_route_alternatives(
+    start_lat: float,
+    start_lon: float,
+    end_lat: float,
+    end_lon: float,
+    max_alternatives: int,
+) -> list[RouteResult]:
+    """Fetch the primary route plus up to `max_alternatives` alternatives in one upstream call."""
+    if max_alternatives <= 0:
+        return [fetch_route(start_lat, start_lon, end_lat, end_lon)]
+
+    points = _dedupe_consecutive_points([(start_lat, start_lon), (end_lat, end_lon)])
+    if len(points) < 2:
+        raise RoutingError("At least two coordinates are required to build a route")
+
+    return _fetch_with_provider_fallback(
+        points,
+        partial(_fetch_and_cache_alternatives, alternatives=max_alternatives),
+        profile_suffix=f"|alternatives={max_alternatives}",
+    )
+
+
+def _detour_cache_key(provider: str, anchor: tuple[float, float], station: tuple[float, float]) -> str:
+    return _cache_key(provider, [anchor, station], "detour").replace("route::", "detour::", 1)
+
+
+def _fetch_osrm_table_distances(pairs: list[tuple[tuple[float, float], tuple[float, float]]]) -> list[float | None]:
+    """Anchor -> own station distances from one `/table` request.
+
+    Distinct anchors are the sources and distinct stations the destinations; only one cell per pair
+    is read. Callers keep the pair count bounded (DETOUR_REFINEMENT_MAX_CANDIDATES), so the matrix
+    stays small.
+    """
+    anchors = list(dict.fromkeys(anchor for anchor, _ in pairs))
+    stations = list(dict.fromkeys(station for _, station in pairs))
+    coordinate_string = ";".join(f"{lon},{lat}" for lat, lon in anchors + stations)
+    url = f"{settings.OSRM_API_BASE_URL}/table/v1/driving/{coordinate_string}"
+
+    payload = _request_json(
+        url,
+        params={
+            "sources": ";".join(str(index) for index in range(len(anchors))),
+            "destinations": ";".join(str(len(anchors) + index) for index in range(len(stations))),
+            "annotations": "distance",
+        },
+    )
+    if payload.get("code") != "Ok" or "distances" not in payload:
+        message = payload.get("message", "table not available")
+        raise RoutingError(f"OSRM table failed: {message}")
+
+    distances = payload["distances"]
+    anchor_rows = {anchor: row for row, anchor in enumerate(anchors)}
+    station_columns = {station: column for column, station in enumerate(stations)}
+    results: list[float | None] = []
+    for anchor, station in pairs:
+        meters = distances[anchor_rows[anchor]][station_columns[station]]
+        results.append(float(meters) * MILES_PER_METER if meters is not None else None)
+    return results
+
+
+def _local_detour_distances(pairs: list[tuple[tuple[float, float], tuple[float, float]]]) -> list[float | None]:
+    graph_path = Path(settings.LOCAL_ROAD_GRAPH_PATH)
+    if not graph_path.exists():
+        raise RoutingError(f"Local road graph not found at {graph_path}; run build_road_graph first")
+
+    graph = _get_road_graph(str(graph_path))
+    distances: list[float | None] = []
+    for anchor, station in pairs:
+        try:
+            _, distance_meters, _ = graph.shortest_path(
+                graph.nearest_node(*anchor),
+                graph.nearest_node(*station),
+            )
+        except RoadGraphError:
+            distances.append(None)
+            continue
+        distances.append(distance_meters * MILES_PER_METER)
+    return distances
+
+
+def fetch_detour_distances(
+    pairs: list[tuple[tuple[float, float], tuple[float, float]]],
+) -> list[float | None]:
+    """Driving miles from each route anchor to its station, resolved with at most one matrix call.
+
+    Pairs are `((anchor_lat, anchor_lon), (station_lat, station_lon))`. Previously resolved pairs
+    come from the cache; the rest are deduplicated and go to the local road graph or a single OSRM
+    `/table` request.
+    """
+    provider = "local" if _resolve_provider() == "local" else "osrm"
+    keys = [_detour_cache_key(provider, anchor, station) for anchor, station in pairs]
+    cached = cache.get_many(keys)
+
+    missing = {key: pair for key, pair in zip(keys, pairs, strict=True) if key not in cached}
+    if missing:
+        missing_pairs = list(missing.values())
+        if provider == "local":
+            fetched = _local_detour_distances(missing_pairs)
+        else:
+            fetched = _fetch_osrm_table_distances(missing_pairs)
+        resolved = dict(zip(missing, fetched, strict=True))
+        cache.set_many(
+            {key: value for key, value in resolved.items() if value is not None},
+            timeout=24 * 60 * 60,
+        )
+        cached.update(resolved)
+
+    return [cached.get(key) for key in keys]
+
+
 def fetch_route(
     start_lat: float,
     start_lon: float,
@@ -0,0 +1,90 @@
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+
+SHARED_LOCK_POLL_SECONDS = 0.05
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+_registry_lock = threading.Lock()
+_in_flight: dict[str, _InFlightCall] = {}
+
+
+def _lock_key(key: str) -> str:
+    return f"single-flight::{key}"
+
+
+def _run_with_shared_lock(key: str, fetch: Callable[[], Any]) -> Any:
+    """Serialize `fetch` across processes through an `add`-based lock in the cache backend.
+
+    `fetch` is expected to store its result under `key`, so processes that lose the lock
+    race pick the value up from the shared cache instead of calling upstream themselves.
+    """
+    lock_key = _lock_key(key)
+    lock_timeout = int(settings.SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+
+    while not cache.add(lock_key, token, timeout=lock_timeout):
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        if time.monotonic() >= deadline:
+            # The holder died or is too slow; fetch rather than fail the request.
+            return fetch()
+        time.sleep(SHARED_LOCK_POLL_SECONDS)
+
+    try:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        return fetch()
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def single_flight(key: str, fetch: Callable[[], Any]) -> Any:
+    """Run `fetch` once per `key` among concurrent callers and share its outcome.
+
+    The first caller for a key becomes the leader; callers that arrive while it is running
+    block until it finishes and receive the same result or exception.
+    """
+    with _registry_lock:
+        call = _in_flight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InFlightCall()
+            _in_flight[key] = call
+
+    if not is_leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if settings.SINGLE_FLIGHT_SHARED_LOCK:
+            call.result = _run_with_shared_lock(key, fetch)
+        else:
+            call.result = fetch()
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _registry_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+
+    return call.result
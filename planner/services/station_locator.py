@@ -1,19 +1,23 @@
 import math
+from datetime import date
 
 from django.db.models import Avg
 
 from planner.domain.types import StationCandidate
 from planner.models import FuelStation
 from planner.services.distance import haversine_miles
+from planner.services.price_history import average_price_as_of, from_tenths_cent, price_as_of_subquery
+from planner.services.price_summary import national_average_price
 
 MAX_ROUTE_SAMPLE_POINTS = 350
 STATION_BUCKET_MILES = 35.0
 MAX_STATIONS_PER_BUCKET = 3
 START_PRICE_WINDOW_MILES = 40.0
 DEFAULT_START_PRICE = 3.5
+MICROS_PER_DOLLAR = 1_000_000
 
 
-def _bbox_from_route(
+def bbox_from_route(
     route_geometry: list[list[float]],
     corridor_miles: float,
 ) -> tuple[float, float, float, float]:
@@ -37,7 +41,7 @@ def _bbox_from_route(
     )
 
 
-def _build_sample_indexes(
+def build_sample_indexes(
     route_geometry: list[list[float]],
     max_samples: int = MAX_ROUTE_SAMPLE_POINTS,
 ) -> list[int]:
@@ -94,8 +98,16 @@ def fetch_route_station_candidates(
     route_geometry: list[list[float]],
     route_cumulative_miles: list[float],
     corridor_miles: float,
+    bbox: tuple[float, float, float, float] | None = None,
+    sample_indexes: list[int] | None = None,
+    as_of: date | None = None,
 ) -> list[StationCandidate]:
-    min_lat, max_lat, min_lon, max_lon = _bbox_from_route(route_geometry, corridor_miles)
+    """Return pruned stations near the route, priced from the history log when `as_of` is given."""
+    if bbox is None:
+        bbox = bbox_from_route(route_geometry, corridor_miles)
+    if sample_indexes is None:
+        sample_indexes = build_sample_indexes(route_geometry)
+    min_lat, max_lat, min_lon, max_lon = bbox
 
     rows = FuelStation.objects.filter(
         latitude__isnull=False,
@@ -104,19 +116,24 @@ def fetch_route_station_candidates(
         latitude__lte=max_lat,
         longitude__gte=min_lon,
         longitude__lte=max_lon,
-    ).values(
+    )
+    if as_of is not None:
+        # Stations with no logged price by `as_of` were not in the feed yet and are left out. The history log
+        # has no coordinates, so stations retired since then are missing and moved ones use today's position.
+        rows = rows.annotate(historical_price=price_as_of_subquery(as_of)).filter(historical_price__isnull=False)
+    rows = rows.values(
         "id",
         "opis_truckstop_id",
         "truckstop_name",
         "address",
         "city",
         "state",
-        "retail_price",
+        "retail_price_micros",
         "latitude",
         "longitude",
+        *(["historical_price"] if as_of is not None else []),
     )
 
-    sample_indexes = _build_sample_indexes(route_geometry)
     candidates: list[StationCandidate] = []
 
     for row in rows.iterator():
@@ -138,7 +155,11 @@ def fetch_route_station_candidates(
                 address=str(row["address"]),
                 city=str(row["city"]),
                 state=str(row["state"]),
-                price_per_gallon=float(row["retail_price"]),
+                price_per_gallon=(
+                    from_tenths_cent(row["historical_price"])
+                    if as_of is not None
+                    else row["retail_price_micros"] / MICROS_PER_DOLLAR
+                ),
                 latitude=float(row["latitude"]),
                 longitude=float(row["longitude"]),
                 along_distance_miles=along_distance,
@@ -149,10 +170,17 @@ def fetch_route_station_candidates(
     return _prune_candidates(candidates)
 
 
-def estimate_start_price(candidates: list[StationCandidate]) -> float:
+def estimate_start_price(candidates: list[StationCandidate], as_of: date | None = None) -> float:
     near_start = [candidate for candidate in candidates if candidate.along_distance_miles <= START_PRICE_WINDOW_MILES]
     if near_start:
         return min(candidate.price_per_gallon for candidate in near_start)
 
-    average_price = FuelStation.objects.aggregate(avg_price=Avg("retail_price"))["avg_price"]
+    if as_of is not None:
+        average_price = average_price_as_of(as_of)
+        return average_price if average_price is not None else DEFAULT_START_PRICE
+
+    # The materialized state summaries avoid a full-table average on every plan.
+    average_price = national_average_price()
+    if average_price is None:
+        average_price = FuelStation.objects.aggregate(avg_price=Avg("retail_price"))["avg_price"]
     return float(average_price) if average_price is not None else DEFAULT_START_PRICE
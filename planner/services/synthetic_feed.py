@@ -0,0 +1,93 @@
+import csv
+import random
+from collections.abc import Iterator
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+FEED_HEADER = ["OPIS Truckstop ID", "Truckstop Name", "Address", "City", "State", "Rack ID", "Retail Price"]
+# Rates seen in the bundled OPIS sample: about 17% of rows repeat a truckstop ID, mostly on the same rack.
+DEFAULT_DUPLICATE_RATE = 0.17
+DEFAULT_NEW_RACK_RATE = 0.1
+DEFAULT_UNKNOWN_CITY_RATE = 0.02
+DEFAULT_INVALID_PRICE_RATE = 0.0005
+DUPLICATE_POOL_SIZE = 50_000
+FIRST_SYNTHETIC_ID = 1_000_000
+MIN_PRICE = 1.5
+
+
+def load_feed_templates(csv_path: Path) -> list[tuple[str, str, str, str, str, float]]:
+    """`(name, address, city, state, rack_id, price)` rows from a real feed to draw synthetic stations from."""
+    templates = []
+    with csv_path.open(encoding="utf-8-sig", newline="") as infile:
+        for row in csv.DictReader(infile):
+            try:
+                price = float(Decimal(row["Retail Price"].strip()))
+            except (InvalidOperation, AttributeError):
+                continue
+            templates.append(
+                (
+                    row["Truckstop Name"].strip(),
+                    row["Address"].strip(),
+                    row["City"].strip(),
+                    row["State"].strip().upper(),
+                    row["Rack ID"].strip(),
+                    price,
+                )
+            )
+    return templates
+
+
+def iter_synthetic_rows(
+    templates: list[tuple[str, str, str, str, str, float]],
+    rows: int,
+    seed: int = 0,
+    duplicate_rate: float = DEFAULT_DUPLICATE_RATE,
+    unknown_city_rate: float = DEFAULT_UNKNOWN_CITY_RATE,
+    invalid_price_rate: float = DEFAULT_INVALID_PRICE_RATE,
+) -> Iterator[list[str]]:
+    """Yield OPIS-format rows modelled on `templates`, with repeated stations, unknown cities and bad prices.
+
+    Memory stays bounded: repeats are drawn from a fixed-size pool of recently emitted stations.
+    """
+    rng = random.Random(seed)
+    pool: list[tuple[str, str, str, str, str, str, float]] = []
+    next_id = FIRST_SYNTHETIC_ID
+
+    for _ in range(rows):
+        if pool and rng.random() < duplicate_rate:
+            opis_id, name, address, city, state, rack_id, base_price = rng.choice(pool)
+            if rng.random() < DEFAULT_NEW_RACK_RATE:
+                rack_id = str(rng.randint(100, 999))
+        else:
+            name, address, city, state, rack_id, base_price = rng.choice(templates)
+            opis_id = str(next_id)
+            next_id += 1
+            name = f"{name.split('#')[0].strip()} #{opis_id}"
+            if rng.random() < unknown_city_rate:
+                city = f"Synthetic Junction {rng.randint(1, 9999)}"
+            station = (opis_id, name, address, city, state, rack_id, base_price)
+            if len(pool) < DUPLICATE_POOL_SIZE:
+                pool.append(station)
+            else:
+                pool[rng.randrange(DUPLICATE_POOL_SIZE)] = station
+
+        if rng.random() < invalid_price_rate:
+            price = "n/a"
+        else:
+            price = f"{max(MIN_PRICE, base_price + rng.gauss(0.0, 0.12)):.8f}"
+        yield [opis_id, name, address, city, state, rack_id, price]
+
+
+def write_synthetic_feed(
+    path: Path, templates: list[tuple[str, str, str, str, str, float]], rows: int, **options
+) -> int:
+    """Stream a synthetic feed to `path`; returns the number of data rows written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with path.open("w", encoding="utf-8", newline="") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(FEED_HEADER)
+        for row in iter_synthetic_rows(templates, rows, **options):
+            writer.writerow(row)
+            written += 1
+    return written
@@ -1,19 +1,32 @@
+from bisect import bisect_left
+from dataclasses import dataclass, replace
+from datetime import date
+from functools import partial
 from typing import Any
 
 from django.conf import settings
+from requests import RequestException
 
-from planner.domain.optimizer import optimize_fuel_plan
-from planner.domain.types import FuelNode, StopAction
-from planner.services.distance import cumulative_route_distances
-from planner.services.geocoding import geocode_location
-from planner.services.routing import fetch_route, fetch_route_through_points
-from planner.services.station_locator import (
-    estimate_start_price,
-    fetch_route_station_candidates,
+from planner.domain.optimizer import FuelPlanningError, optimize_fuel_plan
+from planner.domain.types import FuelNode, RouteResult, StationCandidate, StopAction
+from planner.services.concurrency import map_concurrently
+from planner.services.geocoding import CITY_STATE_RE, geocode_location
+from planner.services.route_artifacts import RouteArtifacts, get_route_artifacts
+from planner.services.routing import (
+    RoutingError,
+    count_upstream_route_calls,
+    fetch_detour_distances,
+    fetch_route_alternatives,
+    fetch_route_through_points,
 )
+from planner.services.station_locator import estimate_start_price
 
 
 def _extract_city_state(location_query: str) -> tuple[str, str]:
+    # Same "City, ST" / "City ST" / ZIP forms the geocoder accepts; other inputs split on commas.
+    match = CITY_STATE_RE.match(location_query)
+    if match:
+        return match.group("city").strip(), match.group("state").upper()
     parts = [part.strip() for part in location_query.split(",") if part.strip()]
     if len(parts) >= 2:
         return parts[0], parts[1]
@@ -71,46 +84,144 @@ def _serialize_stop_action(
     }
 
 
-def build_trip_plan(
-    start_location: str,
-    end_location: str,
-    mpg: float = 10.0,
-    max_range_miles: float = 500.0,
-    route_mode: str = "direct",
-    max_stop_detour_miles: float | None = None,
-    min_stop_gallons: float | None = None,
-    stop_penalty_usd: float | None = None,
-) -> dict[str, Any]:
-    if min_stop_gallons is None:
-        min_stop_gallons = float(settings.DEFAULT_MIN_STOP_GALLONS)
-    if stop_penalty_usd is None:
-        stop_penalty_usd = float(settings.DEFAULT_STOP_PENALTY_USD)
-    if max_stop_detour_miles is None:
-        max_stop_detour_miles = settings.DEFAULT_MAX_STOP_DETOUR_MILES
+@dataclass(frozen=True)
+class _RoutePlan:
+    route: RouteResult
+    artifacts: RouteArtifacts
+    candidate_count_before_detour_filter: int
+    candidate_count_after_detour_filter: int
+    total_cost: float
+    total_gallons: float
+    actions: list[StopAction]
+    detour_refinement: dict[str, Any] | None = None
 
-    origin = geocode_location(start_location)
-    destination = geocode_location(end_location)
-    origin_city, origin_state = _extract_city_state(start_location)
 
-    route = fetch_route(
-        start_lat=origin.latitude,
-        start_lon=origin.longitude,
-        end_lat=destination.latitude,
-        end_lon=destination.longitude,
-    )
+def _route_anchor_index(route: RouteResult, artifacts: RouteArtifacts, candidate: StationCandidate) -> int:
+    # along_distance_miles is copied from cumulative_miles at the projected vertex, so bisect finds it exactly.
+    return min(bisect_left(artifacts.cumulative_miles, candidate.along_distance_miles), len(route.geometry) - 1)
 
-    corridor_miles = float(settings.ROUTE_CORRIDOR_MILES)
-    route_cumulative_miles = cumulative_route_distances(route.geometry)
-    candidates = fetch_route_station_candidates(
-        route_geometry=route.geometry,
-        route_cumulative_miles=route_cumulative_miles,
-        corridor_miles=corridor_miles,
-    )
+
+def _route_anchor(route: RouteResult, artifacts: RouteArtifacts, candidate: StationCandidate) -> tuple[float, float]:
+    lon, lat = route.geometry[_route_anchor_index(route, artifacts, candidate)]
+    return lat, lon
+
+
+DetourPair = tuple[tuple[float, float], tuple[float, float]]
+
+
+def _detour_pairs(
+    route: RouteResult,
+    artifacts: RouteArtifacts,
+    candidates: list[StationCandidate],
+    effective_max_detour: float,
+) -> tuple[list[int], list[DetourPair]]:
+    """Indexes of the candidates worth refining, closest first, and their `(anchor, station)` pairs."""
+    eligible = sorted(
+        (
+            index
+            for index, candidate in enumerate(candidates)
+            if candidate.distance_to_route_miles <= effective_max_detour + 1e-6
+        ),
+        key=lambda index: candidates[index].distance_to_route_miles,
+    )[: int(settings.DETOUR_REFINEMENT_MAX_CANDIDATES)]
+    pairs = [
+        (_route_anchor(route, artifacts, candidates[index]), (candidates[index].latitude, candidates[index].longitude))
+        for index in eligible
+    ]
+    return eligible, pairs
+
+
+def _prefetch_detours(
+    routes: list[RouteResult],
+    corridor_miles: float,
+    effective_max_detour: float,
+    as_of: date | None,
+) -> dict[DetourPair, float | None] | Exception:
+    """Resolve the detour pairs of every alternative in one deduplicated lookup.
+
+    Alternatives share most of their road, and so most of their stations and anchors. The closest
+    DETOUR_REFINEMENT_MAX_CANDIDATES pairs across all routes are resolved, keeping the plan to one
+    matrix call. Returns the distance per pair, or the lookup error for each route to report.
+    """
+    offsets: dict[DetourPair, float] = {}
+    for route in routes:
+        artifacts = get_route_artifacts(route, corridor_miles, as_of=as_of)
+        eligible, pairs = _detour_pairs(route, artifacts, artifacts.candidates, effective_max_detour)
+        for index, pair in zip(eligible, pairs, strict=True):
+            offset = artifacts.candidates[index].distance_to_route_miles
+            offsets[pair] = min(offset, offsets.get(pair, offset))
+    pairs = sorted(offsets, key=offsets.__getitem__)[: int(settings.DETOUR_REFINEMENT_MAX_CANDIDATES)]
+    try:
+        return dict(zip(pairs, fetch_detour_distances(pairs), strict=True))
+    except (RoutingError, RequestException) as exc:
+        return exc
+
+
+def _refine_candidate_detours(
+    route: RouteResult,
+    artifacts: RouteArtifacts,
+    candidates: list[StationCandidate],
+    effective_max_detour: float,
+    prefetched: dict[DetourPair, float | None] | Exception | None = None,
+) -> tuple[list[StationCandidate], dict[str, Any]]:
+    """Replace straight-line offsets with driving distances from the route for stops that could qualify.
+
+    Driving distance is never shorter than the straight line, so only candidates already inside the
+    detour cap are refined, closest first, up to DETOUR_REFINEMENT_MAX_CANDIDATES. `prefetched`
+    holds distances already resolved for all alternatives by `_prefetch_detours`; pairs it left out
+    keep their straight-line offset.
+    """
+    eligible, pairs = _detour_pairs(route, artifacts, candidates, effective_max_detour)
+    if not eligible:
+        return candidates, {"status": "skipped", "refined_candidates": 0}
+
+    try:
+        if isinstance(prefetched, Exception):
+            raise prefetched
+        if prefetched is not None:
+            distances = [prefetched.get(pair) for pair in pairs]
+        else:
+            distances = fetch_detour_distances(pairs)
+    except (RoutingError, RequestException) as exc:
+        return candidates, {"status": "failed", "detail": str(exc), "refined_candidates": 0}
+
+    refined = list(candidates)
+    refined_count = 0
+    for index, distance in zip(eligible, distances, strict=True):
+        if distance is None:
+            continue
+        refined[index] = replace(
+            candidates[index],
+            distance_to_route_miles=max(distance, candidates[index].distance_to_route_miles),
+        )
+        refined_count += 1
+    return refined, {"status": "ok", "refined_candidates": refined_count}
+
+
+def _plan_route(
+    route: RouteResult,
+    corridor_miles: float,
+    effective_max_detour: float,
+    mpg: float,
+    max_range_miles: float,
+    min_stop_gallons: float,
+    stop_penalty_usd: float,
+    refine_detours: bool = False,
+    as_of: date | None = None,
+    prefetched_detours: dict[DetourPair, float | None] | Exception | None = None,
+) -> _RoutePlan:
+    artifacts = get_route_artifacts(route, corridor_miles, as_of=as_of)
+    candidates = artifacts.candidates
     candidate_count_before_detour_filter = len(candidates)
-    if max_stop_detour_miles is None:
-        effective_max_detour = corridor_miles
-    else:
-        effective_max_detour = min(max_stop_detour_miles, corridor_miles)
+    detour_refinement = None
+    if refine_detours:
+        candidates, detour_refinement = _refine_candidate_detours(
+            route=route,
+            artifacts=artifacts,
+            candidates=candidates,
+            effective_max_detour=effective_max_detour,
+            prefetched=prefetched_detours,
+        )
     candidates = [
         candidate for candidate in candidates if candidate.distance_to_route_miles <= effective_max_detour + 1e-6
     ]
@@ -120,7 +231,7 @@ def build_trip_plan(
         FuelNode(
             key="start",
             distance_miles=0.0,
-            price_per_gallon=estimate_start_price(candidates),
+            price_per_gallon=estimate_start_price(candidates, as_of=as_of),
             purchasable=True,
             station=None,
         )
@@ -156,29 +267,196 @@ def build_trip_plan(
         min_stop_gallons=min_stop_gallons,
         stop_penalty_usd=stop_penalty_usd,
     )
+    return _RoutePlan(
+        route=route,
+        artifacts=artifacts,
+        candidate_count_before_detour_filter=candidate_count_before_detour_filter,
+        candidate_count_after_detour_filter=len(candidates),
+        total_cost=total_cost,
+        total_gallons=total_gallons,
+        actions=actions,
+        detour_refinement=detour_refinement,
+    )
+
+
+def _splice_detour_legs(route: RouteResult, anchor_indexes: list[int], legs: list[RouteResult]) -> RouteResult:
+    """Insert route -> station -> route legs into the direct geometry at their anchor vertices."""
+    geometry: list[list[float]] = []
+    previous_index = 0
+    for anchor_index, leg in sorted(zip(anchor_indexes, legs, strict=True), key=lambda item: item[0]):
+        geometry.extend(route.geometry[previous_index : anchor_index + 1])
+        # The leg starts at the anchor just appended (snapped to the road by the router), so skip its first vertex.
+        geometry.extend(leg.geometry[1:])
+        previous_index = anchor_index + 1
+    geometry.extend(route.geometry[previous_index:])
+
+    return RouteResult(
+        distance_miles=route.distance_miles + sum(leg.distance_miles for leg in legs),
+        duration_minutes=route.duration_minutes + sum(leg.duration_minutes for leg in legs),
+        geometry=geometry,
+        provider=route.provider,
+    )
+
+
+def _build_via_stops_route(plan: _RoutePlan) -> RouteResult:
+    """Render the route through the chosen stops from the direct geometry plus short detour legs.
+
+    Each leg is a cached route anchor -> station -> anchor request, so popular stations are reused
+    across trips.
+    """
+    stations = [action.node.station for action in plan.actions if action.node.station is not None]
+    if not stations:
+        return plan.route
+
+    anchor_indexes = [_route_anchor_index(plan.route, plan.artifacts, station) for station in stations]
+    leg_points = []
+    for anchor_index, station in zip(anchor_indexes, stations, strict=True):
+        anchor_lon, anchor_lat = plan.route.geometry[anchor_index]
+        leg_points.append([(anchor_lat, anchor_lon), (station.latitude, station.longitude), (anchor_lat, anchor_lon)])
+
+    legs = map_concurrently(fetch_route_through_points, leg_points, max_workers=int(settings.PLANNER_MAX_WORKERS))
+    return _splice_detour_legs(plan.route, anchor_indexes, legs)
+
+
+def _time_cost(route: RouteResult, time_value_usd_per_hour: float) -> float:
+    return route.duration_minutes / 60.0 * time_value_usd_per_hour
+
+
+def _try_plan_route(route: RouteResult, **plan_kwargs: Any) -> _RoutePlan | FuelPlanningError:
+    try:
+        return _plan_route(route, **plan_kwargs)
+    except FuelPlanningError as exc:
+        return exc
+
+
+def _summarize_alternatives(
+    outcomes: list[_RoutePlan | FuelPlanningError],
+    routes: list[RouteResult],
+    selected_index: int,
+    time_value_usd_per_hour: float,
+) -> list[dict[str, Any]]:
+    summaries: list[dict[str, Any]] = []
+    for index, (route, outcome) in enumerate(zip(routes, outcomes, strict=True)):
+        summary: dict[str, Any] = {
+            "index": index,
+            "selected": index == selected_index,
+            "distance_miles": round(route.distance_miles, 3),
+            "duration_minutes": round(route.duration_minutes, 2),
+            "time_cost_usd": round(_time_cost(route, time_value_usd_per_hour), 2),
+        }
+        if isinstance(outcome, FuelPlanningError):
+            summary["error"] = str(outcome)
+        else:
+            summary["estimated_total_cost_usd"] = round(outcome.total_cost, 2)
+            summary["fuel_stop_count"] = sum(1 for action in outcome.actions if action.node.station is not None)
+        summaries.append(summary)
+    return summaries
+
+
+def build_trip_plan(
+    start_location: str,
+    end_location: str,
+    mpg: float = 10.0,
+    max_range_miles: float = 500.0,
+    route_mode: str = "direct",
+    max_stop_detour_miles: float | None = None,
+    min_stop_gallons: float | None = None,
+    stop_penalty_usd: float | None = None,
+    route_alternatives: int = 0,
+    time_value_usd_per_hour: float | None = None,
+    refine_detours: bool | None = None,
+    as_of: date | None = None,
+) -> dict[str, Any]:
+    if min_stop_gallons is None:
+        min_stop_gallons = float(settings.DEFAULT_MIN_STOP_GALLONS)
+    if stop_penalty_usd is None:
+        stop_penalty_usd = float(settings.DEFAULT_STOP_PENALTY_USD)
+    if max_stop_detour_miles is None:
+        max_stop_detour_miles = settings.DEFAULT_MAX_STOP_DETOUR_MILES
+    if time_value_usd_per_hour is None:
+        time_value_usd_per_hour = float(settings.DEFAULT_TIME_VALUE_USD_PER_HOUR)
+    if refine_detours is None:
+        refine_detours = bool(settings.DEFAULT_REFINE_DETOURS)
+
+    origin = geocode_location(start_location)
+    destination = geocode_location(end_location)
+    origin_city, origin_state = _extract_city_state(start_location)
+
+    # `route_api_calls` reports only routing requests that missed every cache, direct route and legs alike.
+    with count_upstream_route_calls() as direct_calls:
+        routes = fetch_route_alternatives(
+            start_lat=origin.latitude,
+            start_lon=origin.longitude,
+            end_lat=destination.latitude,
+            end_lon=destination.longitude,
+            max_alternatives=route_alternatives,
+        )
+
+    corridor_miles = float(settings.ROUTE_CORRIDOR_MILES)
+    if max_stop_detour_miles is None:
+        effective_max_detour = corridor_miles
+    else:
+        effective_max_detour = min(max_stop_detour_miles, corridor_miles)
+
+    plan_kwargs = {
+        "corridor_miles": corridor_miles,
+        "effective_max_detour": effective_max_detour,
+        "mpg": mpg,
+        "max_range_miles": max_range_miles,
+        "min_stop_gallons": min_stop_gallons,
+        "stop_penalty_usd": stop_penalty_usd,
+        "refine_detours": refine_detours,
+        "as_of": as_of,
+    }
+    if refine_detours and len(routes) > 1:
+        plan_kwargs["prefetched_detours"] = _prefetch_detours(routes, corridor_miles, effective_max_detour, as_of)
+    # Alternatives share the cached station artifacts per route and are planned side by side.
+    outcomes = map_concurrently(
+        partial(_try_plan_route, **plan_kwargs),
+        routes,
+        max_workers=int(settings.PLANNER_MAX_WORKERS),
+    )
+
+    feasible = [
+        (index, outcome) for index, outcome in enumerate(outcomes) if not isinstance(outcome, FuelPlanningError)
+    ]
+    if not feasible:
+        raise outcomes[0]
+    selected_index, selected_plan = min(
+        feasible,
+        key=lambda item: item[1].total_cost + _time_cost(item[1].route, time_value_usd_per_hour),
+    )
+
+    route = selected_plan.route
+    total_cost = selected_plan.total_cost
+    total_gallons = selected_plan.total_gallons
+    actions = selected_plan.actions
 
     rendered_route = route
-    route_api_calls = 1
-    if route_mode == "via_stops":
-        waypoint_points: list[tuple[float, float]] = [(origin.latitude, origin.longitude)]
-        for action in actions:
-            station = action.node.station
-            if station is None:
-                continue
-            waypoint_points.append((station.latitude, station.longitude))
-        waypoint_points.append((destination.latitude, destination.longitude))
-
-        if len(waypoint_points) > 2:
-            rendered_route = fetch_route_through_points(waypoint_points)
-            route_api_calls = 2
+    with count_upstream_route_calls() as render_calls:
+        if route_mode == "via_stops":
+            try:
+                rendered_route = _build_via_stops_route(selected_plan)
+            except RoutingError:
+                # Fall back to one full waypoint route if a detour leg cannot be built.
+                waypoint_points: list[tuple[float, float]] = [(origin.latitude, origin.longitude)]
+                for action in actions:
+                    station = action.node.station
+                    if station is None:
+                        continue
+                    waypoint_points.append((station.latitude, station.longitude))
+                waypoint_points.append((destination.latitude, destination.longitude))
+                rendered_route = fetch_route_through_points(waypoint_points)
+    route_api_calls = direct_calls.calls + render_calls.calls
 
-    return {
+    plan = {
         "origin": {
             "query": start_location,
             "resolved": origin.display_name,
             "latitude": origin.latitude,
             "longitude": origin.longitude,
             "source": origin.source,
+            "confidence": origin.confidence,
         },
         "destination": {
             "query": end_location,
@@ -186,6 +464,7 @@ def build_trip_plan(
             "latitude": destination.latitude,
             "longitude": destination.longitude,
             "source": destination.source,
+            "confidence": destination.confidence,
         },
         "route": {
             "distance_miles": round(rendered_route.distance_miles, 3),
@@ -216,8 +495,8 @@ def build_trip_plan(
             "route_api_calls": route_api_calls,
             "route_provider": rendered_route.provider,
             "route_mode": route_mode,
-            "candidate_stations_considered": candidate_count_before_detour_filter,
-            "candidate_stations_after_detour_filter": len(candidates),
+            "candidate_stations_considered": selected_plan.candidate_count_before_detour_filter,
+            "candidate_stations_after_detour_filter": selected_plan.candidate_count_after_detour_filter,
             "route_station_corridor_miles": corridor_miles,
             "max_stop_detour_miles": effective_max_detour,
             "min_stop_gallons": min_stop_gallons,
@@ -226,8 +505,23 @@ def build_trip_plan(
                 "Trip starts with an empty tank and purchases fuel at the best next stop strategy.",
                 "Fuel station coordinates are approximated from city/state postal geography.",
                 "Direct mode fetches one origin-to-destination route and optimizes stops near it.",
-                "Via_stops mode fetches an additional waypoint route for map geometry through selected stops.",
+                "Via_stops mode splices cached route-to-station detour legs into the direct route geometry.",
                 "Optimizer can prune low-value stops using minimum gallons and per-stop penalty settings.",
             ],
         },
     }
+
+    if as_of is not None:
+        plan["meta"]["prices_as_of"] = as_of.isoformat()
+    if selected_plan.detour_refinement is not None:
+        plan["meta"]["detour_refinement"] = selected_plan.detour_refinement
+    if route_alternatives > 0:
+        plan["meta"]["time_value_usd_per_hour"] = time_value_usd_per_hour
+        plan["meta"]["route_alternatives"] = _summarize_alternatives(
+            outcomes=outcomes,
+            routes=routes,
+            selected_index=selected_index,
+            time_value_usd_per_hour=time_value_usd_per_hour,
+        )
+
+    return plan
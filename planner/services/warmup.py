@@ -0,0 +1,41 @@
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from planner.services.geocoding import get_city_locator
+from planner.services.routing import preload_road_graph
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> dict[str, float]:
+    """Build process-wide lookup structures once and return per-phase timings in milliseconds.
+
+    Meant to run in the WSGI master before workers fork (e.g. gunicorn `--preload`), so the
+    city index, its search indexes and the local road graph are shared copy-on-write. It does
+    not touch the database: connections must not cross a fork. Without a compiled city index the
+    locator is skipped, since building it would download the pgeocode dataset at boot.
+    """
+    timings: dict[str, float] = {}
+
+    if Path(settings.CITY_INDEX_PATH).exists():
+        started = time.perf_counter()
+        locator = get_city_locator()
+        timings["city_locator_ms"] = (time.perf_counter() - started) * 1000.0
+
+        started = time.perf_counter()
+        locator.warm()
+        timings["city_search_indexes_ms"] = (time.perf_counter() - started) * 1000.0
+    else:
+        logger.warning(
+            "No city index at %s; skipping city locator warm-up (run `manage.py build_city_index`)",
+            settings.CITY_INDEX_PATH,
+        )
+
+    started = time.perf_counter()
+    if preload_road_graph():
+        timings["road_graph_ms"] = (time.perf_counter() - started) * 1000.0
+
+    return timings
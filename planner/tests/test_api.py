@@ -1,8 +1,18 @@
+import json
+from datetime import date
+from decimal import Decimal
 from unittest.mock import patch
 
 from django.conf import settings
 from django.test import TestCase
 
+from planner.models import FuelStation
+from planner.services.batch_planner import BatchStats
+from planner.services.city_locator import CitySuggestion
+from planner.services.geocoding import GeocodedPoint, GeocodingError
+from planner.services.price_summary import rebuild_price_summaries
+from planner.services.rate_limit import RateLimitExceeded
+
 
 class TripPlanApiTests(TestCase):
     @patch("planner.api.views.build_trip_plan")
@@ -51,6 +61,10 @@ class TripPlanApiTests(TestCase):
             max_stop_detour_miles=settings.DEFAULT_MAX_STOP_DETOUR_MILES,
             min_stop_gallons=settings.DEFAULT_MIN_STOP_GALLONS,
             stop_penalty_usd=settings.DEFAULT_STOP_PENALTY_USD,
+            route_alternatives=0,
+            time_value_usd_per_hour=settings.DEFAULT_TIME_VALUE_USD_PER_HOUR,
+            refine_detours=settings.DEFAULT_REFINE_DETOURS,
+            as_of=None,
         )
 
     @patch("planner.api.views.build_trip_plan")
@@ -98,6 +112,10 @@ class TripPlanApiTests(TestCase):
             max_stop_detour_miles=settings.DEFAULT_MAX_STOP_DETOUR_MILES,
             min_stop_gallons=settings.DEFAULT_MIN_STOP_GALLONS,
             stop_penalty_usd=settings.DEFAULT_STOP_PENALTY_USD,
+            route_alternatives=0,
+            time_value_usd_per_hour=settings.DEFAULT_TIME_VALUE_USD_PER_HOUR,
+            refine_detours=settings.DEFAULT_REFINE_DETOURS,
+            as_of=None,
         )
 
     @patch("planner.api.views.build_trip_plan")
@@ -133,6 +151,7 @@ class TripPlanApiTests(TestCase):
                 "max_stop_detour_miles": 12,
                 "min_stop_gallons": 2,
                 "stop_penalty_usd": 3.25,
+                "as_of": "2026-01-15",
             },
             content_type="application/json",
         )
@@ -146,6 +165,10 @@ class TripPlanApiTests(TestCase):
             max_stop_detour_miles=12.0,
             min_stop_gallons=2.0,
             stop_penalty_usd=3.25,
+            route_alternatives=0,
+            time_value_usd_per_hour=settings.DEFAULT_TIME_VALUE_USD_PER_HOUR,
+            refine_detours=settings.DEFAULT_REFINE_DETOURS,
+            as_of=date(2026, 1, 15),
         )
 
     def test_trip_plan_endpoint_validates_payload(self):
@@ -182,3 +205,150 @@ class TripPlanApiTests(TestCase):
         )
         self.assertEqual(response.status_code, 400)
         self.assertIn("max_range_miles", response.json())
+
+
+class TripPlanBatchApiTests(TestCase):
+    @patch("planner.api.views.build_trip_plans")
+    def test_batch_endpoint_returns_per_item_results_and_errors(self, mock_build_trip_plans):
+        mock_build_trip_plans.return_value = (
+            [{"route": {}}, GeocodingError("Unable to geocode"), RateLimitExceeded("queue full")],
+            BatchStats(items=3, unique_items=3, unique_locations=4, unique_routes=1),
+        )
+        item = {"start_location": "Chicago, IL", "finish_location": "Dallas, TX"}
+
+        response = self.client.post(
+            "/api/trip-plans/batch/",
+            data={"items": [item, {**item, "start_location": "Nowhere"}, {**item, "as_of": "2026-01-15"}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            [(result["index"], result["status"]) for result in body["results"]], [(0, 200), (1, 400), (2, 503)]
+        )
+        self.assertEqual(body["results"][0]["plan"], {"route": {}})
+        self.assertEqual(body["results"][1]["detail"], "Unable to geocode")
+        self.assertEqual(body["meta"]["unique_routes"], 1)
+        (items,) = mock_build_trip_plans.call_args.args
+        self.assertEqual(items[0]["end_location"], "Dallas, TX")
+        self.assertEqual(items[2]["as_of"], date(2026, 1, 15))
+
+    def test_batch_endpoint_reports_item_validation_errors(self):
+        response = self.client.post(
+            "/api/trip-plans/batch/",
+            data={"items": [{"start_location": "Chicago, IL", "finish_location": "Dallas, TX"}, {"mpg": 10}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("finish_location", response.json()["items"]["1"])
+
+
+class GeocodeBatchApiTests(TestCase):
+    @patch("planner.api.views.iter_geocode_many")
+    def test_batch_endpoint_streams_ndjson_lines(self, mock_iter_geocode_many):
+        mock_iter_geocode_many.return_value = iter(
+            [
+                (1, GeocodedPoint(latitude=32.78, longitude=-96.8, display_name="Dallas, TX", source="pgeocode-local")),
+                (0, GeocodingError("Unable to geocode location: Nowhere")),
+            ]
+        )
+
+        response = self.client.post(
+            "/api/geocode/batch/",
+            data={"locations": ["Nowhere", "Dallas, TX"]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[0]["index"], 1)
+        self.assertEqual(lines[0]["source"], "pgeocode-local")
+        self.assertEqual(lines[1], {"index": 0, "query": "Nowhere", "error": "Unable to geocode location: Nowhere"})
+        mock_iter_geocode_many.assert_called_once_with(["Nowhere", "Dallas, TX"])
+
+    def test_batch_endpoint_rejects_empty_list(self):
+        response = self.client.post("/api/geocode/batch/", data={"locations": []}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("locations", response.json())
+
+
+class LocationSuggestApiTests(TestCase):
+    @patch("planner.api.views.suggest_locations")
+    def test_suggest_endpoint_returns_canonical_labels(self, mock_suggest_locations):
+        mock_suggest_locations.return_value = [
+            CitySuggestion(name="Dallas", state="TX", latitude=32.78, longitude=-96.8, postal_codes=120),
+        ]
+
+        response = self.client.get("/api/locations/suggest/", {"q": "dal", "limit": 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["label"], "Dallas, TX")
+        self.assertIn("max-age=3600", response["Cache-Control"])
+        mock_suggest_locations.assert_called_once_with("dal", limit=5)
+
+    def test_suggest_endpoint_requires_query(self):
+        response = self.client.get("/api/locations/suggest/")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("q", response.json())
+
+
+class PriceSummaryApiTests(TestCase):
+    def setUp(self):
+        for opis_id, state, price, latitude in (
+            ("1", "OK", "3.10", 35.4),
+            ("2", "OK", "2.90", 35.6),
+            ("3", "OK", "3.30", 36.5),
+            ("4", "TX", "2.80", 32.8),
+        ):
+            FuelStation.objects.create(
+                opis_truckstop_id=opis_id,
+                truckstop_name=f"Station {opis_id}",
+                address="Highway",
+                city="City",
+                state=state,
+                rack_id="1",
+                retail_price=Decimal(price),
+                latitude=latitude,
+                longitude=-97.5,
+            )
+        rebuild_price_summaries()
+
+    def test_state_summary_lists_cheapest_regions_first(self):
+        response = self.client.get("/api/prices/summary/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age=900", response["Cache-Control"])
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"region": "TX", "min_price": 2.8, "median_price": 2.8, "avg_price": 2.8, "station_count": 1},
+                {"region": "OK", "min_price": 2.9, "median_price": 3.1, "avg_price": 3.1, "station_count": 3},
+            ],
+        )
+        self.assertEqual(
+            [item["region"] for item in self.client.get("/api/prices/summary/?state=tx").json()["results"]], ["TX"]
+        )
+
+    def test_cell_summary_includes_bounds(self):
+        results = self.client.get("/api/prices/summary/", {"level": "cell"}).json()["results"]
+
+        self.assertEqual(
+            [(item["region"], item["station_count"]) for item in results],
+            [
+                ("cell:32:-98", 1),
+                ("cell:35:-98", 2),
+                ("cell:36:-98", 1),
+            ],
+        )
+        self.assertEqual(results[1]["bounds"], {"south": 35.0, "west": -98.0, "north": 36.0, "east": -97.0})
+        self.assertEqual(results[1]["median_price"], 3.0)
+
+    def test_state_filter_requires_state_level(self):
+        response = self.client.get("/api/prices/summary/", {"level": "cell", "state": "OK"})
+
+        self.assertEqual(response.status_code, 400)
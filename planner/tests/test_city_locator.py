@@ -0,0 +1,111 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from planner.services.city_locator import CityIndexError, CityLocator, write_city_index
+
+PLACES = [
+    ("TX", "Dallas", 32.70, -96.80),
+    ("TX", "Dallas", 32.90, -96.60),
+    ("TX", "Austin", 30.27, -97.74),
+    ("MO", "Saint Louis", 38.63, -90.20),
+    ("OK", "Oklahoma City", 35.47, -97.52),
+]
+
+
+class CityLocatorIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.index_path = Path(self.tmpdir.name) / "city-index.bin"
+
+    @patch("planner.services.city_locator._pgeocode_places")
+    def test_compiled_index_serves_centroids_without_pgeocode(self, mock_places):
+        self.assertEqual(write_city_index(self.index_path, PLACES), 4)
+
+        locator = CityLocator(self.index_path)
+
+        mock_places.assert_not_called()
+        dallas = locator.lookup(city="dallas", state="tx")
+        self.assertAlmostEqual(dallas.latitude, 32.80)
+        self.assertAlmostEqual(dallas.longitude, -96.70)
+        self.assertEqual(locator.lookup(city="St. Louis", state="MO").latitude, 38.63)
+        self.assertEqual(locator.lookup(city="Oklahoma", state="OK").longitude, -97.52)
+
+        state_fallback = locator.lookup(city="Nowhere", state="TX")
+        self.assertAlmostEqual(state_fallback.latitude, (32.70 + 32.90 + 30.27) / 3)
+        self.assertIsNone(locator.lookup(city="Nowhere", state="ZZ"))
+
+    @patch("planner.services.city_locator._pgeocode_places", return_value=iter(PLACES))
+    def test_missing_index_falls_back_to_pgeocode(self, mock_places):
+        locator = CityLocator(self.index_path)
+
+        mock_places.assert_called_once()
+        self.assertEqual(locator.lookup(city="Austin", state="TX").latitude, 30.27)
+
+    def test_rejects_unrecognized_index_file(self):
+        self.index_path.write_bytes(b"not a city index at all")
+
+        with self.assertRaises(CityIndexError):
+            CityLocator(self.index_path)
+
+    @patch("planner.services.city_locator._pgeocode_places", return_value=iter(PLACES))
+    def test_build_city_index_command_writes_loadable_file(self, _mock_places):
+        call_command("build_city_index", output=str(self.index_path), stdout=StringIO())
+
+        self.assertEqual(CityLocator(self.index_path).lookup(city="Austin", state="TX").longitude, -97.74)
+
+    def test_fuzzy_match_resolves_typos_within_state(self):
+        write_city_index(self.index_path, PLACES + [("TX", "Dalhart", 36.06, -102.52)])
+        locator = CityLocator(self.index_path)
+
+        exact = locator.match(city="Dallas", state="TX")
+        self.assertEqual((exact.name, exact.confidence), ("Dallas", 1.0))
+
+        typo = locator.match(city="Dalas", state="tx")
+        self.assertEqual(typo.name, "Dallas")
+        self.assertLess(typo.confidence, 1.0)
+        self.assertAlmostEqual(typo.latitude, 32.80)
+
+        self.assertEqual(locator.match(city="Oklahma Cty", state="OK").name, "Oklahoma City")
+        self.assertIsNone(locator.match(city="Dallas", state="OK"))
+        self.assertIsNone(locator.match(city="Houston", state="TX"))
+
+    def test_suggest_ranks_prefix_matches_by_postal_code_count(self):
+        write_city_index(
+            self.index_path,
+            PLACES + [("GA", "Dallas", 33.92, -84.84), ("TX", "Dalhart", 36.06, -102.52), ("MO", "Salem", 37.6, -91.5)],
+        )
+        locator = CityLocator(self.index_path)
+
+        self.assertEqual(
+            [(item.name, item.state) for item in locator.suggest("dal")],
+            [("Dallas", "TX"), ("Dallas", "GA"), ("Dalhart", "TX")],
+        )
+        self.assertEqual(locator.suggest("Dal", limit=1)[0].postal_codes, 2)
+        self.assertEqual([item.state for item in locator.suggest("dallas", state="g")], ["GA"])
+        self.assertEqual([item.name for item in locator.suggest("st lo")], ["Saint Louis"])
+        self.assertEqual(locator.suggest("  "), [])
+
+    def test_lookup_many_matches_single_lookups_in_input_order(self):
+        write_city_index(self.index_path, PLACES)
+        locator = CityLocator(self.index_path)
+        pairs = [
+            ("Dallas", "TX"),
+            ("St. Louis", "MO"),
+            ("Austn", "TX"),
+            ("Nowhere", "TX"),
+            ("dallas", "tx"),
+            ("Nowhere", "ZZ"),
+            ("Dallas", "TX"),
+        ]
+
+        expected = [locator.lookup(city=city, state=state) for city, state in pairs]
+
+        self.assertEqual(locator.lookup_many(pairs), expected)
+        with patch("planner.services.city_locator.LOOKUP_MANY_PARALLEL_MIN", 1):
+            self.assertEqual(locator.lookup_many(pairs, processes=2), expected)
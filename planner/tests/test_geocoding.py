@@ -1,12 +1,25 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
 from unittest.mock import patch
 
 from django.core.cache import cache
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
-from planner.services.geocoding import GeocodedPoint, geocode_location
+from planner.models import GeocodeResult
+from planner.services.city_locator import CityLocator, write_city_index
+from planner.services.geocoding import (
+    GeocodedPoint,
+    GeocodingError,
+    _parse_city_state,
+    geocode_location,
+    iter_geocode_many,
+)
+from planner.services.rate_limit import RateLimitExceeded, acquire_rate_slot
 
 
-class GeocodingServiceTests(SimpleTestCase):
+class GeocodingServiceTests(TestCase):
     def setUp(self):
         cache.clear()
 
@@ -40,3 +53,139 @@ class GeocodingServiceTests(SimpleTestCase):
 
         self.assertEqual(result.source, "nominatim")
         mock_remote_lookup.assert_called_once()
+
+    @patch("planner.services.geocoding._remote_lookup")
+    @patch("planner.services.geocoding._local_lookup", return_value=None)
+    def test_remote_results_survive_process_cache_flush(self, _mock_local_lookup, mock_remote_lookup):
+        mock_remote_lookup.return_value = GeocodedPoint(
+            latitude=30.0,
+            longitude=-97.0,
+            display_name="1 Main St, Austin, TX",
+            source="nominatim",
+        )
+
+        geocode_location("1 Main St Austin")
+        cache.clear()
+        result = geocode_location("1 Main St Austin")
+
+        mock_remote_lookup.assert_called_once()
+        self.assertEqual(result.source, "nominatim")
+        self.assertEqual(GeocodeResult.objects.get().display_name, "1 Main St, Austin, TX")
+
+    @patch("planner.services.geocoding._remote_lookup", return_value=None)
+    @patch("planner.services.geocoding._local_lookup", return_value=None)
+    def test_remote_misses_are_negatively_cached_until_expiry(self, _mock_local_lookup, mock_remote_lookup):
+        for _ in range(2):
+            with self.assertRaises(GeocodingError):
+                geocode_location("asdf qwerty")
+        cache.clear()
+        with self.assertRaises(GeocodingError):
+            geocode_location("asdf qwerty")
+        self.assertEqual(mock_remote_lookup.call_count, 1)
+
+        GeocodeResult.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        cache.clear()
+        with self.assertRaises(GeocodingError):
+            geocode_location("asdf qwerty")
+        self.assertEqual(mock_remote_lookup.call_count, 2)
+
+    @patch("planner.services.geocoding._remote_lookup", return_value=None)
+    @patch("planner.services.geocoding._local_lookup", return_value=None)
+    def test_recording_a_miss_purges_expired_misses(self, _mock_local_lookup, _mock_remote_lookup):
+        with self.assertRaises(GeocodingError):
+            geocode_location("asdf qwerty")
+        GeocodeResult.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        with self.assertRaises(GeocodingError):
+            geocode_location("zxcv uiop")
+
+        self.assertEqual(list(GeocodeResult.objects.values_list("query", flat=True)), ["zxcv uiop"])
+
+
+class LocalGeocodingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index_path = Path(tmpdir) / "city-index.bin"
+            write_city_index(
+                index_path,
+                [
+                    ("TX", "Fort Worth", 32.75, -97.33),
+                    ("TX", "Dallas", 32.78, -96.80),
+                    ("MO", "Saint Louis", 38.63, -90.2),
+                ],
+            )
+            cls.locator = CityLocator(index_path)
+
+    def setUp(self):
+        cache.clear()
+        patcher = patch("planner.services.geocoding.get_city_locator", return_value=self.locator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parses_free_text_city_state_postal_inputs(self):
+        self.assertEqual(_parse_city_state("Dallas, TX"), ("Dallas", "TX"))
+        self.assertEqual(_parse_city_state("Fort Worth tx 76102"), ("Fort Worth", "TX"))
+        self.assertEqual(_parse_city_state("St Louis, MO 63101-1234, USA"), ("St Louis", "MO"))
+        self.assertIsNone(_parse_city_state("Dallas"))
+
+    @patch("planner.services.geocoding._remote_lookup")
+    def test_resolves_misspellings_and_abbreviations_locally(self, mock_remote_lookup):
+        typo = geocode_location("Dallass TX 75201")
+        abbreviation = geocode_location("Ft. Worth, TX")
+
+        mock_remote_lookup.assert_not_called()
+        self.assertEqual((typo.display_name, typo.source), ("Dallas, TX", "pgeocode-fuzzy"))
+        self.assertLess(typo.confidence, 1.0)
+        self.assertEqual((abbreviation.display_name, abbreviation.source), ("Fort Worth, TX", "pgeocode-local"))
+        self.assertEqual(abbreviation.confidence, 1.0)
+
+    @patch("planner.services.geocoding._remote_lookup", return_value=None)
+    def test_state_centroid_is_explicit_last_resort(self, mock_remote_lookup):
+        result = geocode_location("Nowhereville, TX")
+
+        mock_remote_lookup.assert_called_once()
+        self.assertEqual(result.source, "state-centroid")
+        self.assertLess(result.confidence, 0.5)
+
+    @override_settings(GEOCODE_BATCH_MAX_WORKERS=1)
+    @patch("planner.services.geocoding._remote_lookup")
+    def test_batch_streams_local_hits_before_deduplicated_remote_lookups(self, mock_remote_lookup):
+        mock_remote_lookup.return_value = GeocodedPoint(
+            latitude=30.27,
+            longitude=-97.74,
+            display_name="Austin, TX",
+            source="nominatim",
+        )
+
+        results = list(iter_geocode_many(["Austin", "Dallas, TX", " austin ", ""]))
+
+        self.assertEqual([index for index, _ in results], [1, 3, 0, 2])
+        self.assertEqual(results[0][1].source, "pgeocode-local")
+        self.assertIsInstance(results[1][1], GeocodingError)
+        self.assertEqual(results[2][1], results[3][1])
+        mock_remote_lookup.assert_called_once_with("Austin")
+
+    @patch("planner.services.geocoding._remote_lookup", side_effect=RateLimitExceeded("queue full"))
+    def test_batch_errors_keep_rate_limit_cause(self, _mock_remote_lookup):
+        [(_, result)] = list(iter_geocode_many(["Austin"]))
+
+        self.assertIsInstance(result, GeocodingError)
+        self.assertIsInstance(result.__cause__, RateLimitExceeded)
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("planner.services.rate_limit.time.sleep")
+    @patch("planner.services.rate_limit.time.time", return_value=1000.25)
+    def test_callers_queue_into_successive_slots(self, _mock_time, mock_sleep):
+        self.assertEqual(acquire_rate_slot("test", rate_per_second=1.0, max_wait_seconds=2.0), 0.0)
+        self.assertAlmostEqual(acquire_rate_slot("test", rate_per_second=1.0, max_wait_seconds=2.0), 0.75)
+        self.assertAlmostEqual(acquire_rate_slot("test", rate_per_second=1.0, max_wait_seconds=2.0), 1.75)
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [0.75, 1.75])
+
+        with self.assertRaises(RateLimitExceeded):
+            acquire_rate_slot("test", rate_per_second=1.0, max_wait_seconds=2.0)
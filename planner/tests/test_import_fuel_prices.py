@@ -0,0 +1,343 @@
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib import admin
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from planner.admin import FuelStationAdmin
+from planner.domain.types import RouteResult
+from planner.models import CityCoordinate, FuelPriceHistory, FuelStation, RegionalPriceSummary
+from planner.services.city_locator import write_city_index
+from planner.services.price_regions import region_cell, region_versions
+from planner.services.route_artifacts import build_route_artifacts, get_route_artifacts
+
+CSV_HEADER = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Rack ID,Retail Price\n"
+CSV_ROWS = [
+    '7,WOODSHED OF BIG CABIN,"I-44, EXIT 283",Big Cabin,OK,307,3.00733333\n',
+    "9,KWIK TRIP #796,I-94 EXIT 143,Tomah,WI,420,3.28733333\n",
+    "10,BROKEN PRICE,I-94 EXIT 144,Tomah,WI,420,n/a\n",
+    "11,PILOT #1,I-40 EXIT 1,Nowhere,OK,307,3.10\n",
+    "12,LOVES #2,I-44 EXIT 2,Big Cabin,OK,307,2.95\n",
+]
+
+
+class ImportFuelPricesTests(TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmp_path = Path(tmpdir.name)
+        index_path = self.tmp_path / "city-index.bin"
+        write_city_index(index_path, [("OK", "Big Cabin", 36.54, -95.22), ("WI", "Tomah", 43.98, -90.5)])
+        settings_override = self.settings(CITY_INDEX_PATH=str(index_path))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        locator_patcher = patch("planner.services.geocoding._city_locator", None)
+        locator_patcher.start()
+        self.addCleanup(locator_patcher.stop)
+
+    def _write_csv(self, rows: list[str]) -> str:
+        csv_path = self.tmp_path / "prices.csv"
+        csv_path.write_text(CSV_HEADER + "".join(rows))
+        return str(csv_path)
+
+    def test_streams_rows_in_chunks_and_resolves_coordinates_once(self):
+        output = StringIO()
+
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS), chunk_size=2, stdout=output)
+
+        self.assertEqual(FuelStation.objects.count(), 4)
+        self.assertIn("Chunk 3: 4 rows processed, 1 skipped", output.getvalue())
+        self.assertEqual(CityCoordinate.objects.count(), 3)
+        self.assertIn("Rebuilt 4 regional price summaries", output.getvalue())
+        oklahoma = RegionalPriceSummary.objects.get(level="state", region="OK")
+        self.assertEqual((str(oklahoma.min_price), oklahoma.station_count), ("2.950000", 3))
+        big_cabin = FuelStation.objects.filter(city="Big Cabin")
+        self.assertEqual({(station.latitude, station.longitude) for station in big_cabin}, {(36.54, -95.22)})
+        # Unknown cities fall back to the state centroid, as before.
+        self.assertAlmostEqual(FuelStation.objects.get(opis_truckstop_id="11").latitude, 36.54)
+
+    def test_commit_per_chunk_keeps_completed_chunks(self):
+        original_bulk_create = FuelStation.objects.bulk_create
+        calls = []
+
+        def failing_second_chunk(stations, **kwargs):
+            calls.append(len(stations))
+            if len(calls) == 2:
+                raise RuntimeError("database went away")
+            return original_bulk_create(stations, **kwargs)
+
+        with (
+            patch.object(FuelStation.objects, "bulk_create", side_effect=failing_second_chunk),
+            self.assertRaises(RuntimeError),
+        ):
+            call_command(
+                "import_fuel_prices",
+                csv=self._write_csv(CSV_ROWS),
+                chunk_size=2,
+                commit_per_chunk=True,
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(FuelStation.objects.count(), 2)
+
+    def test_rejects_empty_feed_before_clearing(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS[:1]), stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command("import_fuel_prices", csv=self._write_csv([]), clear=True, stdout=StringIO())
+
+        self.assertEqual(FuelStation.objects.count(), 1)
+
+    def test_incremental_import_touches_only_changed_rows(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS), stdout=StringIO())
+        before = {station.opis_truckstop_id: station for station in FuelStation.objects.all()}
+        refreshed = [
+            CSV_ROWS[0].replace("3.00733333", "3.10"),
+            CSV_ROWS[1],
+            "99,NEW STOP,I-35 EXIT 9,Tomah,WI,420,3.50\n",
+        ]
+        output = StringIO()
+
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv(refreshed),
+            incremental=True,
+            retire_missing=True,
+            stdout=output,
+        )
+
+        self.assertIn("Inserted 1, updated 1, unchanged 1, retired 2 fuel stations", output.getvalue())
+        after = {station.opis_truckstop_id: station for station in FuelStation.objects.all()}
+        self.assertEqual(set(after), {"7", "9", "99"})
+        self.assertEqual(str(after["7"].retail_price), "3.100000")
+        self.assertEqual(after["7"].retail_price_micros, 3_100_000)
+        self.assertEqual(after["7"].id, before["7"].id)
+        self.assertGreater(after["7"].updated_at, before["7"].updated_at)
+        self.assertEqual(after["9"].updated_at, before["9"].updated_at)
+
+    def test_retire_missing_keeps_stations_listed_with_bad_data(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS[:2]), stdout=StringIO())
+        output = StringIO()
+
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv([CSV_ROWS[0], CSV_ROWS[1].replace("3.28733333", "n/a")]),
+            incremental=True,
+            retire_missing=True,
+            stdout=output,
+        )
+
+        self.assertIn("retired 0 fuel stations", output.getvalue())
+        self.assertEqual(set(FuelStation.objects.values_list("opis_truckstop_id", flat=True)), {"7", "9"})
+
+    def test_retire_missing_rejects_limit(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS), stdout=StringIO())
+
+        with self.assertRaisesMessage(CommandError, "--limit"):
+            call_command(
+                "import_fuel_prices",
+                csv=self._write_csv(CSV_ROWS),
+                incremental=True,
+                retire_missing=True,
+                limit=1,
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(FuelStation.objects.count(), 4)
+
+    def test_incremental_refresh_invalidates_only_changed_regions(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS[:2]), stdout=StringIO())
+        big_cabin, tomah = region_cell(36.54, -95.22), region_cell(43.98, -90.5)
+        versions = region_versions([big_cabin, tomah])
+        output = StringIO()
+
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv([CSV_ROWS[0].replace("3.00733333", "2.90"), CSV_ROWS[1]]),
+            incremental=True,
+            stdout=output,
+        )
+
+        refreshed = region_versions([big_cabin, tomah])
+        self.assertNotEqual(refreshed[big_cabin], versions[big_cabin])
+        self.assertEqual(refreshed[tomah], versions[tomah])
+        self.assertIn("invalidated cached candidates in 1 price regions", output.getvalue())
+
+    def test_in_place_price_change_invalidates_cached_route_candidates(self):
+        route = RouteResult(
+            distance_miles=70.0,
+            duration_minutes=60.0,
+            geometry=[[-95.22, 36.0 + step * 0.1] for step in range(11)],
+            provider="osrm",
+            cache_key="route::big-cabin",
+        )
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS[:2]), stdout=StringIO())
+        self.assertEqual(get_route_artifacts(route, corridor_miles=20.0).candidates[0].price_per_gallon, 3.007333)
+
+        # Same row count and no new stations: only the import-published region version reveals the change.
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv([CSV_ROWS[0].replace("3.00733333", "2.90"), CSV_ROWS[1]]),
+            incremental=True,
+            stdout=StringIO(),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            candidates = get_route_artifacts(route, corridor_miles=20.0).candidates
+            get_route_artifacts(route, corridor_miles=20.0)
+
+        self.assertEqual(candidates[0].price_per_gallon, 2.9)
+        # A cache hit reads region versions only, never aggregates over the station table.
+        self.assertNotIn("fuelstation", queries.captured_queries[-1]["sql"].lower())
+
+    def test_incremental_import_refreshes_only_changed_summaries(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS[:2]), stdout=StringIO())
+        before = {(row.level, row.region): row for row in RegionalPriceSummary.objects.all()}
+        output = StringIO()
+
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv([CSV_ROWS[0].replace("3.00733333", "2.90"), CSV_ROWS[1]]),
+            incremental=True,
+            stdout=output,
+        )
+
+        after = {(row.level, row.region): row for row in RegionalPriceSummary.objects.all()}
+        self.assertIn("Refreshed 2 regional price summaries", output.getvalue())
+        self.assertEqual(set(after), set(before))
+        self.assertEqual(str(after[("state", "OK")].avg_price), "2.900000")
+        self.assertEqual(after[("state", "WI")].id, before[("state", "WI")].id)
+        self.assertEqual(after[("cell", region_cell(43.98, -90.5))].id, before[("cell", region_cell(43.98, -90.5))].id)
+
+    def test_admin_edits_refresh_affected_summaries(self):
+        call_command("import_fuel_prices", csv=self._write_csv(CSV_ROWS[:2]), stdout=StringIO())
+        station_admin = FuelStationAdmin(FuelStation, admin.site)
+        station = FuelStation.objects.get(opis_truckstop_id="7")
+        station.retail_price = Decimal("2.50")
+
+        station_admin.save_model(request=None, obj=station, form=None, change=True)
+
+        self.assertEqual(str(RegionalPriceSummary.objects.get(level="state", region="OK").avg_price), "2.500000")
+        station_admin.delete_queryset(request=None, queryset=FuelStation.objects.filter(state="OK"))
+        self.assertEqual(
+            set(RegionalPriceSummary.objects.values_list("region", flat=True)), {"WI", region_cell(43.98, -90.5)}
+        )
+
+    def test_price_history_logs_only_changes_per_effective_date(self):
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv(CSV_ROWS[:2]),
+            effective_date=date(2026, 1, 1),
+            stdout=StringIO(),
+        )
+        output = StringIO()
+
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv([CSV_ROWS[0].replace("3.00733333", "3.10"), CSV_ROWS[1]]),
+            incremental=True,
+            effective_date=date(2026, 1, 2),
+            stdout=output,
+        )
+
+        self.assertIn("Logged 1 price changes effective 2026-01-02", output.getvalue())
+        self.assertEqual(
+            list(
+                FuelPriceHistory.objects.order_by("opis_truckstop_id", "effective_date").values_list(
+                    "opis_truckstop_id", "effective_date", "price_tenths_cent"
+                )
+            ),
+            [("7", date(2026, 1, 1), 3007), ("7", date(2026, 1, 2), 3100), ("9", date(2026, 1, 1), 3287)],
+        )
+
+    def test_as_of_prices_survive_a_change_of_kept_rack(self):
+        route = RouteResult(
+            distance_miles=70.0,
+            duration_minutes=60.0,
+            geometry=[[-95.22, 36.0 + step * 0.1] for step in range(11)],
+            provider="osrm",
+        )
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv(["7,WOODSHED,I-44,Big Cabin,OK,308,3.10\n"]),
+            effective_date=date(2026, 1, 1),
+            stdout=StringIO(),
+        )
+        call_command(
+            "import_fuel_prices",
+            csv=self._write_csv(["7,WOODSHED,I-44,Big Cabin,OK,307,3.00\n"]),
+            incremental=True,
+            effective_date=date(2026, 1, 2),
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(FuelStation.objects.get().rack_id, "307")
+        january_first = build_route_artifacts(route, corridor_miles=20.0, as_of=date(2026, 1, 1)).candidates
+        january_second = build_route_artifacts(route, corridor_miles=20.0, as_of=date(2026, 1, 2)).candidates
+        self.assertEqual([candidate.price_per_gallon for candidate in january_first], [3.1])
+        self.assertEqual([candidate.price_per_gallon for candidate in january_second], [3.0])
+
+    def test_repeated_station_rows_collapse_by_policy_across_chunks(self):
+        rows = [
+            "7,WOODSHED,I-44,Big Cabin,OK,307,3.20\n",
+            "9,KWIK TRIP,I-94,Tomah,WI,420,3.28\n",
+            "7,WOODSHED,I-44,Big Cabin,OK,307,3.05\n",
+            "7,WOODSHED,I-44,Big Cabin,OK,307,3.15\n",
+            "7,WOODSHED WEST,I-44,Big Cabin,OK,308,3.10\n",
+        ]
+        expected = {
+            "min-price": {("7", "307"): "3.050000"},
+            "latest": {("7", "308"): "3.100000"},
+            "per-rack": {("7", "307"): "3.150000", ("7", "308"): "3.100000"},
+        }
+
+        for policy, expected_rows in expected.items():
+            with self.subTest(policy=policy):
+                output = StringIO()
+                call_command(
+                    "import_fuel_prices",
+                    csv=self._write_csv(rows),
+                    clear=True,
+                    chunk_size=2,
+                    dedupe=policy,
+                    stdout=output,
+                )
+
+                stations = FuelStation.objects.filter(opis_truckstop_id="7")
+                self.assertEqual(
+                    {(station.opis_truckstop_id, station.rack_id): str(station.retail_price) for station in stations},
+                    expected_rows,
+                )
+                merged = 3 if policy != "per-rack" else 2
+                self.assertIn(f"Merged {merged} repeated station rows ({policy} policy)", output.getvalue())
+
+    def test_synthetic_feed_is_reproducible_and_imports_with_phase_timings(self):
+        template_csv = self._write_csv(CSV_ROWS)
+        feeds = []
+        for name in ("a.csv", "b.csv"):
+            call_command(
+                "generate_fuel_feed",
+                output=str(self.tmp_path / name),
+                rows=300,
+                template_csv=template_csv,
+                seed=3,
+                stdout=StringIO(),
+            )
+            feeds.append((self.tmp_path / name).read_text())
+        self.assertEqual(feeds[0], feeds[1])
+        self.assertEqual(len(feeds[0].splitlines()), 301)
+        output = StringIO()
+
+        call_command("import_fuel_prices", csv=str(self.tmp_path / "a.csv"), verbosity=2, stdout=output)
+
+        station_count = FuelStation.objects.count()
+        self.assertGreater(station_count, 200)
+        self.assertLess(station_count, 300)
+        self.assertIn("Phase timings: parse", output.getvalue())
@@ -0,0 +1,124 @@
+import heapq
+import math
+import random
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from planner.services.road_graph import RoadGraph
+from planner.services.routing import fetch_route
+
+GRID_SIZE = 8
+
+
+def _grid_graph(seed: int = 7) -> tuple[list[float], list[float], list[tuple[int, int, float, float]]]:
+    rng = random.Random(seed)
+    latitudes: list[float] = []
+    longitudes: list[float] = []
+    for row in range(GRID_SIZE):
+        for column in range(GRID_SIZE):
+            latitudes.append(30.0 + row * 0.05)
+            longitudes.append(-97.0 + column * 0.05)
+
+    edges: list[tuple[int, int, float, float]] = []
+    for row in range(GRID_SIZE):
+        for column in range(GRID_SIZE):
+            for d_row, d_column in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                next_row = row + d_row
+                next_column = column + d_column
+                if 0 <= next_row < GRID_SIZE and 0 <= next_column < GRID_SIZE:
+                    duration = rng.uniform(30.0, 120.0)
+                    edges.append(
+                        (row * GRID_SIZE + column, next_row * GRID_SIZE + next_column, duration, duration * 25.0)
+                    )
+    return latitudes, longitudes, edges
+
+
+def _dijkstra(node_count: int, edges: list[tuple[int, int, float, float]], source: int) -> list[float]:
+    adjacency: list[list[tuple[int, float]]] = [[] for _ in range(node_count)]
+    for edge_source, edge_target, duration, _ in edges:
+        adjacency[edge_source].append((edge_target, duration))
+
+    costs = [math.inf] * node_count
+    costs[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > costs[node]:
+            continue
+        for neighbor, weight in adjacency[node]:
+            if cost + weight < costs[neighbor]:
+                costs[neighbor] = cost + weight
+                heapq.heappush(heap, (cost + weight, neighbor))
+    return costs
+
+
+class RoadGraphTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_contraction_hierarchy_matches_plain_dijkstra(self):
+        latitudes, longitudes, edges = _grid_graph()
+        graph = RoadGraph.build(latitudes, longitudes, edges)
+        node_count = len(latitudes)
+
+        for source in (0, 9, 27, node_count - 1):
+            expected = _dijkstra(node_count, edges, source)
+            for target in range(node_count):
+                duration, distance, path = graph.shortest_path(source, target)
+                self.assertAlmostEqual(duration, expected[target], places=6)
+                self.assertAlmostEqual(distance, expected[target] * 25.0, places=4)
+                self.assertEqual((path[0], path[-1]), (source, target))
+
+    def test_graph_file_round_trip(self):
+        latitudes, longitudes, edges = _grid_graph()
+        graph = RoadGraph.build(latitudes, longitudes, edges)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "graph.bin"
+            graph.save(path)
+            loaded = RoadGraph.load(path)
+
+        self.assertEqual(loaded.shortest_path(0, 63), graph.shortest_path(0, 63))
+        self.assertEqual(loaded.nearest_node(30.101, -96.899), 2 * GRID_SIZE + 2)
+
+    def test_local_provider_routes_without_network(self):
+        latitudes, longitudes, edges = _grid_graph()
+        graph = RoadGraph.build(latitudes, longitudes, edges)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "graph.bin"
+            graph.save(path)
+            with override_settings(MAP_PROVIDER="local", LOCAL_ROAD_GRAPH_PATH=str(path)):
+                result = fetch_route(30.0, -97.0, 30.35, -96.65)
+
+        duration, distance, node_path = graph.shortest_path(0, GRID_SIZE * GRID_SIZE - 1)
+        self.assertEqual(result.provider, "local")
+        self.assertAlmostEqual(result.duration_minutes, duration / 60.0)
+        self.assertEqual(result.geometry[0], [-97.0, 30.0])
+        self.assertEqual(len(result.geometry), len(node_path))
+
+    def test_build_road_graph_command_parses_osm_extract(self):
+        osm = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="30.00" lon="-97.00"/>
+  <node id="2" lat="30.00" lon="-96.90"/>
+  <node id="3" lat="30.10" lon="-96.90"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="primary"/></way>
+  <way id="11"><nd ref="3"/><nd ref="1"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            osm_path = Path(tmpdir) / "extract.osm"
+            osm_path.write_text(osm)
+            output_path = Path(tmpdir) / "graph.bin"
+            call_command("build_road_graph", str(osm_path), output=str(output_path), stdout=StringIO())
+            graph = RoadGraph.load(output_path)
+
+        _, _, path = graph.shortest_path(graph.nearest_node(30.0, -97.0), graph.nearest_node(30.1, -96.9))
+        self.assertEqual(len(graph.latitudes), 3)
+        self.assertEqual(len(path), 3)
@@ -1,12 +1,22 @@
 from unittest.mock import Mock, patch
 
 from django.core.cache import cache
-from django.test import SimpleTestCase, override_settings
+from django.test import TestCase, override_settings
 
-from planner.services.routing import fetch_route, fetch_route_through_points
+from planner.domain.types import RouteResult
+from planner.models import CachedRoute
+from planner.services.polyline import decode_polyline, encode_polyline
+from planner.services.route_store import decode_geometry, encode_geometry, save_route
+from planner.services.routing import (
+    count_upstream_route_calls,
+    fetch_detour_distances,
+    fetch_route,
+    fetch_route_alternatives,
+    fetch_route_through_points,
+)
 
 
-class RoutingServiceTests(SimpleTestCase):
+class RoutingServiceTests(TestCase):
     def setUp(self):
         cache.clear()
 
@@ -85,3 +95,200 @@ class RoutingServiceTests(SimpleTestCase):
 
         called_url = mock_get.call_args.args[0]
         self.assertIn("-96.7969,32.7763;-95.3698,29.7604;-97.7431,30.2672", called_url)
+
+    @override_settings(MAP_PROVIDER="osrm", OSRM_API_BASE_URL="https://osrm.test")
+    @patch("planner.services.routing.requests.get")
+    def test_route_store_serves_repeat_lanes_after_memory_cache_is_lost(self, mock_get):
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "code": "Ok",
+            "routes": [
+                {
+                    "distance": 5000,
+                    "duration": 1800,
+                    "geometry": {"coordinates": [[-96.797, 32.7763], [-97.7431, 30.2672]]},
+                }
+            ],
+        }
+        mock_get.return_value = response
+
+        first = fetch_route(32.7763, -96.7969, 30.2672, -97.7431)
+        cache.clear()
+        second = fetch_route(32.7763, -96.7969, 30.2672, -97.7431)
+
+        mock_get.assert_called_once()
+        self.assertEqual(second.provider, "osrm")
+        self.assertAlmostEqual(second.distance_miles, first.distance_miles)
+        self.assertEqual(second.geometry, first.geometry)
+        self.assertEqual(CachedRoute.objects.count(), 1)
+
+    def test_route_store_evicts_least_recently_used_entries(self):
+        route = RouteResult(
+            distance_miles=10.0,
+            duration_minutes=12.0,
+            geometry=[[-97.0, 32.7], [-97.1, 32.8]],
+            provider="osrm",
+        )
+
+        with (
+            self.settings(ROUTE_STORE_MAX_BYTES=len(encode_geometry(route.geometry)), ROUTE_STORE_EVICT_EVERY=1),
+            patch("planner.services.route_store._pending_saves", 0),
+        ):
+            save_route("route::old", route)
+            save_route("route::new", route)
+
+        self.assertEqual(list(CachedRoute.objects.values_list("cache_key", flat=True)), ["route::new"])
+
+    def test_route_store_checks_budget_once_per_eviction_interval(self):
+        route = RouteResult(distance_miles=10.0, duration_minutes=12.0, geometry=[[-97.0, 32.7]], provider="osrm")
+
+        with (
+            self.settings(ROUTE_STORE_EVICT_EVERY=3),
+            patch("planner.services.route_store._pending_saves", 0),
+            patch("planner.services.route_store._evict_to_budget") as evict,
+        ):
+            for index in range(7):
+                save_route(f"route::{index}", route)
+
+        self.assertEqual(evict.call_count, 2)
+
+    def test_geometry_codec_round_trips_to_microdegrees(self):
+        geometry = [[-96.7969, 32.7763], [-95.369803, 29.760427], [-97.743061, 30.267153]]
+
+        self.assertEqual(decode_geometry(encode_geometry(geometry)), geometry)
+
+    @override_settings(MAP_PROVIDER="osrm", OSRM_API_BASE_URL="https://osrm.test")
+    @patch("planner.services.routing.requests.get")
+    def test_requests_and_decodes_polyline6_geometry(self, mock_get):
+        geometry = [[-96.7969, 32.7763], [-96.8001, 32.6512], [-97.7431, 30.2672]]
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "code": "Ok",
+            "routes": [{"distance": 3000, "duration": 1200, "geometry": encode_polyline(geometry)}],
+        }
+        mock_get.return_value = response
+
+        result = fetch_route(32.7763, -96.7969, 30.2672, -97.7431)
+
+        self.assertEqual(mock_get.call_args.kwargs["params"]["geometries"], "polyline6")
+        self.assertEqual(result.geometry, geometry)
+
+    def test_decodes_reference_polyline(self):
+        # Reference vector from the encoded polyline algorithm documentation (precision 5).
+        decoded = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@", precision=5)
+
+        self.assertEqual(decoded, [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]])
+
+    @override_settings(
+        MAP_PROVIDER="mapbox",
+        MAPBOX_ACCESS_TOKEN="token-123",
+        ROUTE_MAX_WAYPOINTS_PER_REQUEST=3,
+        ROUTE_LEG_MAX_WORKERS=2,
+        ROUTE_STORE_ENABLED=False,
+    )
+    @patch("planner.services.routing.requests.get")
+    def test_long_waypoint_chain_is_split_into_cached_overlapping_legs(self, mock_get):
+        def leg_response(url, params, timeout):
+            coordinate_string = url.rsplit("/", 1)[-1]
+            geometry = [[float(value) for value in pair.split(",")] for pair in coordinate_string.split(";")]
+            response = Mock()
+            response.raise_for_status.return_value = None
+            response.json.return_value = {
+                "code": "Ok",
+                "routes": [{"distance": 1000 * len(geometry), "duration": 60, "geometry": {"coordinates": geometry}}],
+            }
+            return response
+
+        mock_get.side_effect = leg_response
+        points = [(30.0 + idx, -97.0) for idx in range(6)]
+
+        result = fetch_route_through_points(points)
+
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(result.geometry, [[-97.0, 30.0 + idx] for idx in range(6)])
+        self.assertAlmostEqual(result.duration_minutes, 3.0)
+        self.assertEqual(result.provider, "mapbox")
+
+        fetch_route_through_points(points[2:5])
+        self.assertEqual(mock_get.call_count, 3)
+
+    @override_settings(MAP_PROVIDER="osrm", OSRM_API_BASE_URL="https://osrm.test")
+    @patch("planner.services.routing.requests.get")
+    def test_alternatives_are_fetched_in_one_upstream_call(self, mock_get):
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "code": "Ok",
+            "routes": [
+                {"distance": 1000, "duration": 600, "geometry": {"coordinates": [[-97.0, 32.7], [-97.1, 32.8]]}},
+                {"distance": 1200, "duration": 650, "geometry": {"coordinates": [[-97.0, 32.7], [-97.2, 32.8]]}},
+            ],
+        }
+        mock_get.return_value = response
+
+        routes = fetch_route_alternatives(32.7763, -96.7969, 30.2672, -97.7431, max_alternatives=2)
+        fetch_route_alternatives(32.7763, -96.7969, 30.2672, -97.7431, max_alternatives=2)
+
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["params"]["alternatives"], "2")
+        self.assertEqual(len(routes), 2)
+        self.assertEqual(len({route.cache_key for route in routes}), 2)
+
+    @override_settings(MAP_PROVIDER="auto", OSRM_API_BASE_URL="https://osrm.test")
+    @patch("planner.services.routing.requests.get")
+    def test_detour_distances_use_one_table_call_and_cache_pairs(self, mock_get):
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"code": "Ok", "distances": [[1609.344, 9999.0], [9999.0, 3218.688]]}
+        mock_get.return_value = response
+        pairs = [((32.0, -97.0), (32.01, -97.01)), ((33.0, -97.0), (33.02, -97.02))]
+
+        first = fetch_detour_distances(pairs)
+        second = fetch_detour_distances(pairs)
+
+        mock_get.assert_called_once()
+        self.assertIn("/table/v1/driving/", mock_get.call_args.args[0])
+        self.assertEqual(mock_get.call_args.kwargs["params"]["sources"], "0;1")
+        self.assertEqual(mock_get.call_args.kwargs["params"]["destinations"], "2;3")
+        self.assertAlmostEqual(first[0], 1.0, places=4)
+        self.assertAlmostEqual(first[1], 2.0, places=4)
+        self.assertEqual(first, second)
+
+    @override_settings(MAP_PROVIDER="osrm", OSRM_API_BASE_URL="https://osrm.test")
+    @patch("planner.services.routing.requests.get")
+    def test_detour_table_shares_repeated_anchors_and_stations(self, mock_get):
+        response = Mock()
+        response.raise_for_status.return_value = None
+        # Rows are the distinct anchors, columns the distinct stations.
+        response.json.return_value = {"code": "Ok", "distances": [[1609.344, 3218.688], [4828.032, 6437.376]]}
+        mock_get.return_value = response
+        anchor_a, anchor_b, station_x, station_y = (32.0, -97.0), (33.0, -97.0), (32.0, -97.01), (33.0, -97.01)
+        pairs = [(anchor_a, station_x), (anchor_a, station_y), (anchor_b, station_y), (anchor_a, station_x)]
+
+        distances = fetch_detour_distances(pairs)
+
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["params"]["sources"], "0;1")
+        self.assertEqual(mock_get.call_args.kwargs["params"]["destinations"], "2;3")
+        self.assertEqual([round(distance, 4) for distance in distances], [1.0, 2.0, 4.0, 1.0])
+
+    @override_settings(MAP_PROVIDER="osrm", OSRM_API_BASE_URL="https://osrm.test")
+    @patch("planner.services.routing.requests.get")
+    def test_upstream_call_counter_ignores_cache_hits(self, mock_get):
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "code": "Ok",
+            "routes": [
+                {"distance": 1000, "duration": 600, "geometry": {"coordinates": [[-97.0, 32.7], [-97.1, 32.8]]}}
+            ],
+        }
+        mock_get.return_value = response
+
+        with count_upstream_route_calls() as counter:
+            fetch_route(32.7763, -96.7969, 30.2672, -97.7431)
+            fetch_route(32.7763, -96.7969, 30.2672, -97.7431)
+
+        self.assertEqual(counter.calls, 1)
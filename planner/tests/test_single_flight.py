@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from planner.services.routing import fetch_route
+from planner.services.single_flight import single_flight
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_callers_share_one_fetch(self):
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(timeout=2)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(single_flight, "key", fetch) for _ in range(8)]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_waiters_receive_leader_exception(self):
+        release = threading.Event()
+
+        def fetch():
+            release.wait(timeout=2)
+            raise ValueError("upstream failed")
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(single_flight, "key", fetch) for _ in range(4)]
+            time.sleep(0.1)
+            release.set()
+            for future in futures:
+                with self.assertRaises(ValueError):
+                    future.result()
+
+    @override_settings(SINGLE_FLIGHT_SHARED_LOCK=True, SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS=5)
+    def test_shared_lock_waits_for_result_from_other_process(self):
+        cache.add("single-flight::key", "other-process", timeout=5)
+        fetch = Mock(return_value="local")
+
+        def finish_other_process():
+            time.sleep(0.1)
+            cache.set("key", "shared")
+            cache.delete("single-flight::key")
+
+        worker = threading.Thread(target=finish_other_process)
+        worker.start()
+        result = single_flight("key", fetch)
+        worker.join()
+
+        self.assertEqual(result, "shared")
+        fetch.assert_not_called()
+
+    @override_settings(MAP_PROVIDER="osrm", OSRM_API_BASE_URL="https://osrm.test", ROUTE_STORE_ENABLED=False)
+    @patch("planner.services.routing.requests.get")
+    def test_identical_route_requests_call_upstream_once(self, mock_get):
+        def slow_response(*args, **kwargs):
+            time.sleep(0.1)
+            response = Mock()
+            response.raise_for_status.return_value = None
+            response.json.return_value = {
+                "code": "Ok",
+                "routes": [
+                    {
+                        "distance": 1000,
+                        "duration": 600,
+                        "geometry": {"coordinates": [[-97.0, 32.7], [-97.1, 32.8]]},
+                    }
+                ],
+            }
+            return response
+
+        mock_get.side_effect = slow_response
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            futures = [executor.submit(fetch_route, 32.7763, -96.7969, 30.2672, -97.7431) for _ in range(6)]
+            providers = {future.result().provider for future in futures}
+
+        self.assertEqual(providers, {"osrm"})
+        mock_get.assert_called_once()
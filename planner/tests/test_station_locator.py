@@ -0,0 +1,152 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from planner.domain.types import RouteResult
+from planner.models import FuelPriceHistory, FuelStation
+from planner.services.price_regions import corridor_cells, publish_region_changes, region_cell
+from planner.services.route_artifacts import build_route_artifacts, get_route_artifacts
+from planner.services.station_locator import estimate_start_price
+
+ROUTE = RouteResult(
+    distance_miles=200.0,
+    duration_minutes=180.0,
+    geometry=[[-97.0, 32.0 + step * 0.25] for step in range(13)],
+    provider="osrm",
+    cache_key="route::test",
+)
+
+
+def _station(opis_id: str, price: str, latitude: float, longitude: float) -> FuelStation:
+    return FuelStation.objects.create(
+        opis_truckstop_id=opis_id,
+        truckstop_name=f"Station {opis_id}",
+        address="I-35",
+        city="City",
+        state="OK",
+        rack_id="1",
+        retail_price=Decimal(price),
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+class RouteArtifactTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _station("1", "3.10", 33.0, -97.1)
+        _station("2", "3.20", 34.5, -96.9)
+        _station("3", "2.90", 40.0, -80.0)
+
+    def test_projects_only_stations_inside_corridor(self):
+        artifacts = build_route_artifacts(ROUTE, corridor_miles=20.0)
+
+        self.assertEqual([candidate.opis_truckstop_id for candidate in artifacts.candidates], ["1", "2"])
+        self.assertEqual(len(artifacts.cumulative_miles), len(ROUTE.geometry))
+        self.assertEqual(artifacts.sample_indexes, list(range(13)))
+
+    @patch("planner.services.route_artifacts.build_route_artifacts", wraps=build_route_artifacts)
+    def test_reuses_artifacts_for_same_route_and_dataset(self, mock_build):
+        first = get_route_artifacts(ROUTE, corridor_miles=20.0)
+        second = get_route_artifacts(ROUTE, corridor_miles=20.0)
+
+        self.assertEqual(first, second)
+        mock_build.assert_called_once()
+
+    @patch("planner.services.route_artifacts.build_route_artifacts", wraps=build_route_artifacts)
+    def test_only_price_changes_along_the_corridor_invalidate_artifacts(self, mock_build):
+        get_route_artifacts(ROUTE, corridor_miles=20.0)
+        _station("4", "2.50", 33.5, -97.0)
+
+        publish_region_changes([region_cell(40.0, -80.0)])
+        get_route_artifacts(ROUTE, corridor_miles=20.0)
+        self.assertEqual(mock_build.call_count, 1)
+
+        publish_region_changes([region_cell(33.5, -97.0)])
+        artifacts = get_route_artifacts(ROUTE, corridor_miles=20.0)
+        self.assertEqual(mock_build.call_count, 2)
+        self.assertIn("4", [candidate.opis_truckstop_id for candidate in artifacts.candidates])
+
+    def test_candidate_prices_come_from_synced_micros_column(self):
+        station = FuelStation.objects.get(opis_truckstop_id="1")
+        station.retail_price = Decimal("3.456789")
+        station.save(update_fields=["retail_price"])
+
+        station.refresh_from_db()
+        self.assertEqual(station.retail_price_micros, 3_456_789)
+        candidate = build_route_artifacts(ROUTE, corridor_miles=20.0).candidates[0]
+        self.assertEqual(candidate.price_per_gallon, 3.456789)
+
+    def test_as_of_prices_candidates_from_history(self):
+        FuelPriceHistory.objects.bulk_create(
+            [
+                FuelPriceHistory(
+                    opis_truckstop_id="1", rack_id="1", effective_date=date(2026, 1, 1), price_tenths_cent=2999
+                ),
+                FuelPriceHistory(
+                    opis_truckstop_id="1", rack_id="1", effective_date=date(2026, 2, 1), price_tenths_cent=3100
+                ),
+                FuelPriceHistory(
+                    opis_truckstop_id="2", rack_id="1", effective_date=date(2026, 2, 1), price_tenths_cent=3200
+                ),
+            ]
+        )
+
+        january = get_route_artifacts(ROUTE, corridor_miles=20.0, as_of=date(2026, 1, 20))
+        february = get_route_artifacts(ROUTE, corridor_miles=20.0, as_of=date(2026, 2, 1))
+
+        self.assertEqual(
+            [(item.opis_truckstop_id, item.price_per_gallon) for item in january.candidates], [("1", 2.999)]
+        )
+        self.assertEqual(
+            [(item.opis_truckstop_id, item.price_per_gallon) for item in february.candidates],
+            [("1", 3.1), ("2", 3.2)],
+        )
+
+    def test_as_of_candidates_come_from_current_station_rows(self):
+        # Known limitation: the history log has no coordinates, so as-of plans only see stations that still
+        # exist, at their current position.
+        FuelPriceHistory.objects.bulk_create(
+            [
+                FuelPriceHistory(
+                    opis_truckstop_id=opis_id, rack_id="1", effective_date=date(2026, 1, 1), price_tenths_cent=3000
+                )
+                for opis_id in ("1", "2")
+            ]
+        )
+        FuelStation.objects.filter(opis_truckstop_id="1").delete()
+        FuelStation.objects.filter(opis_truckstop_id="2").update(latitude=40.0, longitude=-80.0)
+
+        artifacts = build_route_artifacts(ROUTE, corridor_miles=20.0, as_of=date(2026, 1, 20))
+
+        self.assertEqual(artifacts.candidates, [])
+
+    def test_as_of_start_price_falls_back_to_that_days_average(self):
+        FuelPriceHistory.objects.bulk_create(
+            [
+                FuelPriceHistory(
+                    opis_truckstop_id="1", rack_id="1", effective_date=date(2026, 1, 1), price_tenths_cent=2000
+                ),
+                FuelPriceHistory(
+                    opis_truckstop_id="1", rack_id="1", effective_date=date(2026, 2, 1), price_tenths_cent=5000
+                ),
+                FuelPriceHistory(
+                    opis_truckstop_id="9", rack_id="1", effective_date=date(2026, 1, 5), price_tenths_cent=3000
+                ),
+            ]
+        )
+
+        self.assertAlmostEqual(estimate_start_price([], as_of=date(2026, 1, 20)), 2.5)
+        self.assertAlmostEqual(estimate_start_price([], as_of=date(2026, 2, 1)), 4.0)
+
+    def test_corridor_cells_cover_every_station_within_the_corridor(self):
+        points = [(latitude, longitude) for longitude, latitude in ROUTE.geometry]
+        cells = corridor_cells(points, corridor_miles=20.0)
+
+        for candidate in build_route_artifacts(ROUTE, corridor_miles=20.0).candidates:
+            self.assertIn(region_cell(candidate.latitude, candidate.longitude), cells)
+        self.assertIn(region_cell(32.0, -97.28), cells)
+        self.assertNotIn(region_cell(40.0, -80.0), cells)
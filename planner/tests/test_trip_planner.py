@@ -0,0 +1,320 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from planner.domain.types import RouteResult
+from planner.models import FuelStation
+from planner.services.batch_planner import build_trip_plans
+from planner.services.geocoding import GeocodedPoint, GeocodingError
+from planner.services.rate_limit import RateLimitExceeded
+from planner.services.trip_planner import _extract_city_state, build_trip_plan
+
+
+def _route(longitude: float, duration_minutes: float, cache_key: str) -> RouteResult:
+    return RouteResult(
+        distance_miles=276.0,
+        duration_minutes=duration_minutes,
+        geometry=[[longitude, 32.0 + step * 0.25] for step in range(17)],
+        provider="osrm",
+        cache_key=cache_key,
+    )
+
+
+def _geocode(query: str) -> GeocodedPoint:
+    latitude = 32.0 if query.startswith("Origin") else 36.0
+    return GeocodedPoint(latitude=latitude, longitude=-97.0, display_name=query, source="test")
+
+
+class ExtractCityStateTests(SimpleTestCase):
+    def test_accepts_the_geocoder_city_state_forms(self):
+        self.assertEqual(_extract_city_state("Dallas TX"), ("Dallas", "TX"))
+        self.assertEqual(_extract_city_state("Fort Worth, tx 76102"), ("Fort Worth", "TX"))
+        self.assertEqual(_extract_city_state("Oklahoma City, Oklahoma"), ("Oklahoma City", "Oklahoma"))
+        self.assertEqual(_extract_city_state("Dallas"), ("Dallas", "-"))
+
+
+@override_settings(PLANNER_MAX_WORKERS=1, DEFAULT_TIME_VALUE_USD_PER_HOUR=60.0)
+@patch("planner.services.trip_planner.geocode_location", side_effect=_geocode)
+class TripPlannerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for opis_id, price, longitude in (("1", "4.00", -97.0), ("2", "2.00", -96.0)):
+            FuelStation.objects.create(
+                opis_truckstop_id=opis_id,
+                truckstop_name=f"Station {opis_id}",
+                address="Highway",
+                city="City",
+                state="OK",
+                rack_id="1",
+                retail_price=Decimal(price),
+                latitude=32.5,
+                longitude=longitude,
+            )
+
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_selects_alternative_with_lowest_fuel_plus_time_cost(self, mock_alternatives, _mock_geocode):
+        mock_alternatives.return_value = [
+            _route(-97.0, duration_minutes=240.0, cache_key="route::a#0"),
+            _route(-96.0, duration_minutes=260.0, cache_key="route::a#1"),
+        ]
+
+        plan = build_trip_plan("Origin, OK", "Destination, OK", route_alternatives=1)
+
+        mock_alternatives.assert_called_once()
+        self.assertEqual(mock_alternatives.call_args.kwargs["max_alternatives"], 1)
+        alternatives = plan["meta"]["route_alternatives"]
+        self.assertEqual([item["selected"] for item in alternatives], [False, True])
+        self.assertLess(alternatives[1]["estimated_total_cost_usd"], alternatives[0]["estimated_total_cost_usd"])
+        self.assertEqual(plan["fuel_plan"]["stops"][0]["price_per_gallon"], 2.0)
+        self.assertEqual(plan["route"]["duration_minutes"], 260.0)
+
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_time_cost_can_outweigh_fuel_savings(self, mock_alternatives, _mock_geocode):
+        mock_alternatives.return_value = [
+            _route(-97.0, duration_minutes=240.0, cache_key="route::b#0"),
+            _route(-96.0, duration_minutes=400.0, cache_key="route::b#1"),
+        ]
+
+        plan = build_trip_plan("Origin, OK", "Destination, OK", route_alternatives=1)
+
+        self.assertTrue(plan["meta"]["route_alternatives"][0]["selected"])
+        self.assertEqual(plan["route"]["duration_minutes"], 240.0)
+
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_direct_request_omits_alternative_summary(self, mock_alternatives, _mock_geocode):
+        mock_alternatives.return_value = [_route(-97.0, duration_minutes=240.0, cache_key="route::c")]
+
+        plan = build_trip_plan("Origin, OK", "Destination, OK")
+
+        self.assertNotIn("route_alternatives", plan["meta"])
+        self.assertEqual(mock_alternatives.call_args.kwargs["max_alternatives"], 0)
+
+    @patch("planner.services.trip_planner.fetch_detour_distances")
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_refined_detours_feed_back_into_filtering(self, mock_alternatives, mock_detours, _mock_geocode):
+        mock_alternatives.return_value = [_route(-97.0, duration_minutes=240.0, cache_key="route::d")]
+        mock_detours.return_value = [35.0]
+
+        plan = build_trip_plan("Origin, OK", "Destination, OK", max_stop_detour_miles=20, refine_detours=True)
+
+        (pairs,) = mock_detours.call_args.args
+        self.assertEqual(pairs, [((32.5, -97.0), (32.5, -97.0))])
+        self.assertEqual(plan["meta"]["detour_refinement"], {"status": "ok", "refined_candidates": 1})
+        self.assertEqual(plan["meta"]["candidate_stations_after_detour_filter"], 0)
+
+    @patch("planner.services.trip_planner.fetch_detour_distances")
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_alternatives_share_one_detour_lookup(self, mock_alternatives, mock_detours, _mock_geocode):
+        mock_alternatives.return_value = [
+            _route(-97.0, duration_minutes=240.0, cache_key="route::f#0"),
+            _route(-97.0, duration_minutes=250.0, cache_key="route::f#1"),
+        ]
+        mock_detours.side_effect = lambda pairs: [1.0 for _ in pairs]
+
+        plan = build_trip_plan("Origin, OK", "Destination, OK", route_alternatives=1, refine_detours=True)
+
+        mock_detours.assert_called_once_with([((32.5, -97.0), (32.5, -97.0))])
+        self.assertEqual(plan["meta"]["detour_refinement"], {"status": "ok", "refined_candidates": 1})
+
+    @override_settings(DETOUR_REFINEMENT_MAX_CANDIDATES=1)
+    @patch("planner.services.trip_planner.fetch_detour_distances")
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_alternatives_refine_at_most_the_candidate_cap(self, mock_alternatives, mock_detours, _mock_geocode):
+        mock_alternatives.return_value = [
+            _route(-97.0, duration_minutes=240.0, cache_key="route::h#0"),
+            _route(-96.0, duration_minutes=250.0, cache_key="route::h#1"),
+        ]
+        mock_detours.side_effect = lambda pairs: [1.0 for _ in pairs]
+
+        build_trip_plan("Origin, OK", "Destination, OK", route_alternatives=1, refine_detours=True)
+
+        mock_detours.assert_called_once()
+        self.assertEqual(len(mock_detours.call_args.args[0]), 1)
+
+    @patch("planner.services.trip_planner.fetch_route_through_points")
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_via_stops_splices_detour_legs_into_direct_route(self, mock_alternatives, mock_waypoints, _mock_geocode):
+        FuelStation.objects.create(
+            opis_truckstop_id="3",
+            truckstop_name="Station 3",
+            address="Highway",
+            city="City",
+            state="OK",
+            rack_id="1",
+            retail_price=Decimal("3.00"),
+            latitude=34.0,
+            longitude=-97.05,
+        )
+        direct = _route(-97.0, duration_minutes=240.0, cache_key="route::e")
+        mock_alternatives.return_value = [direct]
+        mock_waypoints.return_value = RouteResult(
+            distance_miles=6.0,
+            duration_minutes=8.0,
+            geometry=[[-97.0, 34.0], [-97.05, 34.0], [-97.0, 34.0]],
+            provider="osrm",
+        )
+
+        plan = build_trip_plan("Origin, OK", "Destination, OK", route_mode="via_stops")
+
+        mock_waypoints.assert_called_once_with([(34.0, -97.0), (34.0, -97.05), (34.0, -97.0)])
+        coordinates = plan["route"]["geometry"]["coordinates"]
+        self.assertEqual(coordinates[:11], direct.geometry[:9] + [[-97.05, 34.0], [-97.0, 34.0]])
+        self.assertEqual(coordinates[11:], direct.geometry[9:])
+        self.assertEqual(plan["route"]["distance_miles"], 282.0)
+        # Both routing entry points are mocked, so nothing went upstream.
+        self.assertEqual(plan["meta"]["route_api_calls"], 0)
+
+    @override_settings(MAP_PROVIDER="osrm", ROUTE_STORE_ENABLED=False)
+    @patch("planner.services.routing._fetch_osrm_routes")
+    def test_route_api_calls_counts_only_upstream_direct_routes(self, mock_osrm, _mock_geocode):
+        mock_osrm.return_value = [_route(-97.0, duration_minutes=240.0, cache_key="")]
+
+        first = build_trip_plan("Origin, OK", "Destination, OK")
+        second = build_trip_plan("Origin, OK", "Destination, OK")
+
+        mock_osrm.assert_called_once()
+        self.assertEqual(first["meta"]["route_api_calls"], 1)
+        self.assertEqual(second["meta"]["route_api_calls"], 0)
+
+
+@override_settings(
+    PLANNER_MAX_WORKERS=2,
+    DEFAULT_TIME_VALUE_USD_PER_HOUR=60.0,
+    MAP_PROVIDER="osrm",
+    OSRM_API_BASE_URL="https://osrm.test",
+    # The in-memory test database is shared-cache SQLite, which rejects concurrent writers outright.
+    ROUTE_STORE_ENABLED=False,
+)
+@patch("planner.services.trip_planner.geocode_location", side_effect=_geocode)
+class ConcurrentTripPlannerTests(TransactionTestCase):
+    """Alternatives and detour legs on real worker threads; committed rows are visible to their connections."""
+
+    def setUp(self):
+        cache.clear()
+        for opis_id, latitude in (("1", 33.0), ("2", 34.5)):
+            FuelStation.objects.create(
+                opis_truckstop_id=opis_id,
+                truckstop_name=f"Station {opis_id}",
+                address="Highway",
+                city="City",
+                state="OK",
+                rack_id="1",
+                retail_price=Decimal("3.00"),
+                latitude=latitude,
+                longitude=-97.05,
+            )
+
+    @patch("planner.services.routing.requests.get")
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    def test_plans_alternatives_and_counts_legs_across_workers(self, mock_alternatives, mock_get, _mock_geocode):
+        mock_alternatives.return_value = [
+            _route(-97.0, duration_minutes=240.0, cache_key="route::g#0"),
+            _route(-97.0, duration_minutes=250.0, cache_key="route::g#1"),
+        ]
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            "code": "Ok",
+            "routes": [{"distance": 1000, "duration": 60, "geometry": {"coordinates": [[-97.0, 33.0], [-97.0, 33.0]]}}],
+        }
+        mock_get.return_value = response
+
+        plan = build_trip_plan(
+            "Origin, OK", "Destination, OK", max_range_miles=120.0, route_alternatives=1, route_mode="via_stops"
+        )
+
+        self.assertEqual([item["selected"] for item in plan["meta"]["route_alternatives"]], [True, False])
+        # Fill-up at the origin plus both stations.
+        self.assertEqual(len(plan["fuel_plan"]["stops"]), 3)
+        # The direct route is mocked; each detour leg is one upstream call, counted from its worker thread.
+        self.assertEqual(plan["meta"]["route_api_calls"], 2)
+        self.assertEqual(mock_get.call_count, 2)
+
+
+def _geocode_many(queries: list[str]) -> list[GeocodedPoint | GeocodingError]:
+    return [
+        GeocodingError(f"Unknown: {query}") if query.startswith("Nowhere") else _geocode(query) for query in queries
+    ]
+
+
+@override_settings(PLANNER_MAX_WORKERS=1, TRIP_PLAN_BATCH_MAX_WORKERS=2)
+@patch("planner.services.batch_planner.geocode_many", side_effect=_geocode_many)
+@patch("planner.services.trip_planner.geocode_location", side_effect=_geocode)
+class BatchTripPlannerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        FuelStation.objects.create(
+            opis_truckstop_id="1",
+            truckstop_name="Station 1",
+            address="Highway",
+            city="City",
+            state="OK",
+            rack_id="1",
+            retail_price=Decimal("3.00"),
+            latitude=32.5,
+            longitude=-97.0,
+        )
+
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    @patch("planner.services.batch_planner.fetch_route_alternatives")
+    def test_shares_geocodes_and_lanes_and_reports_item_errors(
+        self, mock_warm_routes, mock_plan_routes, _mock_geocode, mock_geocode_many
+    ):
+        routes = [_route(-97.0, duration_minutes=240.0, cache_key="route::batch")]
+        mock_warm_routes.return_value = routes
+        mock_plan_routes.return_value = routes
+        lane = {"start_location": "Origin, OK", "end_location": "Destination, OK"}
+        items = [lane, dict(lane), {**lane, "mpg": 8.0}, {**lane, "start_location": "Nowhere, ZZ"}]
+
+        outcomes, stats = build_trip_plans(items)
+
+        mock_geocode_many.assert_called_once_with(["Origin, OK", "Destination, OK", "Nowhere, ZZ"])
+        mock_warm_routes.assert_called_once()
+        self.assertEqual(mock_plan_routes.call_count, 2)
+        self.assertEqual((stats.items, stats.unique_items, stats.unique_locations, stats.unique_routes), (4, 3, 3, 1))
+        self.assertIs(outcomes[0], outcomes[1])
+        self.assertEqual(outcomes[0]["fuel_plan"]["mpg"], 10.0)
+        self.assertEqual(outcomes[2]["fuel_plan"]["mpg"], 8.0)
+        self.assertIsInstance(outcomes[3], GeocodingError)
+
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    @patch("planner.services.batch_planner.fetch_route_alternatives")
+    def test_rate_limited_geocodes_keep_their_cause(
+        self, mock_warm_routes, mock_plan_routes, _mock_geocode, mock_geocode_many
+    ):
+        error = GeocodingError("Unable to geocode location right now: queue full")
+        error.__cause__ = RateLimitExceeded("queue full")
+        mock_geocode_many.side_effect = lambda queries: [error for _ in queries]
+
+        outcomes, _ = build_trip_plans([{"start_location": "Origin, OK", "end_location": "Destination, OK"}])
+
+        self.assertIsInstance(outcomes[0], RateLimitExceeded)
+        mock_plan_routes.assert_not_called()
+
+    @override_settings(PLANNER_MAX_WORKERS=4)
+    @patch("planner.services.trip_planner.fetch_route_alternatives")
+    @patch("planner.services.batch_planner.fetch_route_alternatives")
+    def test_items_plan_alternatives_inline_under_the_batch_pool(
+        self, mock_warm_routes, mock_plan_routes, _mock_geocode, _mock_geocode_many
+    ):
+        routes = [
+            _route(-97.0, duration_minutes=240.0, cache_key="route::batch#0"),
+            _route(-97.1, duration_minutes=250.0, cache_key="route::batch#1"),
+        ]
+        mock_warm_routes.return_value = routes
+        mock_plan_routes.return_value = routes
+        lane = {"start_location": "Origin, OK", "end_location": "Destination, OK", "route_alternatives": 1}
+        pool_sizes = []
+
+        def pool(max_workers):
+            pool_sizes.append(max_workers)
+            return ThreadPoolExecutor(max_workers=max_workers)
+
+        with patch("planner.services.concurrency.ThreadPoolExecutor", side_effect=pool):
+            outcomes, _ = build_trip_plans([lane, {**lane, "mpg": 8.0}])
+
+        self.assertEqual(pool_sizes, [2])
+        self.assertEqual([len(outcome["meta"]["route_alternatives"]) for outcome in outcomes], [2, 2])
@@ -0,0 +1,65 @@
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from planner.services import geocoding
+from planner.services.city_locator import CityLocator, write_city_index
+from planner.services.concurrency import map_concurrently
+from planner.services.warmup import warm_up
+
+
+class WarmUpTests(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.index_path = Path(tmpdir.name) / "city-index.bin"
+        write_city_index(self.index_path, [("TX", "Dallas", 32.78, -96.8), ("TX", "Austin", 30.27, -97.74)])
+
+        patcher = patch("planner.services.geocoding._city_locator", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warm_up_builds_locator_and_search_indexes_once(self):
+        with override_settings(CITY_INDEX_PATH=str(self.index_path), MAP_PROVIDER="osrm"):
+            timings = warm_up()
+            locator = geocoding.get_city_locator()
+
+        self.assertEqual(set(timings), {"city_locator_ms", "city_search_indexes_ms"})
+        self.assertIn("_trigram_postings", locator.__dict__)
+        self.assertIn("_prefix_index", locator.__dict__)
+        self.assertEqual(locator.match(city="Dalas", state="TX").name, "Dallas")
+
+    def test_concurrent_first_requests_build_one_locator(self):
+        barrier = threading.Barrier(4)
+        built: list[CityLocator] = []
+
+        def build(index_path):
+            built.append(CityLocator(index_path))
+            return built[-1]
+
+        def first_request(_):
+            barrier.wait()
+            return geocoding.get_city_locator()
+
+        with (
+            override_settings(CITY_INDEX_PATH=str(self.index_path)),
+            patch("planner.services.geocoding.CityLocator", side_effect=build),
+        ):
+            locators = map_concurrently(first_request, range(4), max_workers=4)
+
+        self.assertEqual(len(built), 1)
+        self.assertTrue(all(locator is built[0] for locator in locators))
+
+    def test_warm_up_skips_locator_without_city_index(self):
+        with (
+            override_settings(CITY_INDEX_PATH=str(self.index_path.with_name("missing.bin")), MAP_PROVIDER="osrm"),
+            patch("planner.services.warmup.get_city_locator") as get_city_locator,
+            self.assertLogs("planner.services.warmup", level="WARNING"),
+        ):
+            timings = warm_up()
+
+        self.assertEqual(timings, {})
+        get_city_locator.assert_not_called()
@@ -155,6 +155,9 @@ ROUTE_CORRIDOR_MILES = env_float("ROUTE_CORRIDOR_MILES", 60.0)
 DEFAULT_MAX_STOP_DETOUR_MILES = env_optional_float("DEFAULT_MAX_STOP_DETOUR_MILES", 20.0)
 DEFAULT_MIN_STOP_GALLONS = env_float("DEFAULT_MIN_STOP_GALLONS", 1.5)
 DEFAULT_STOP_PENALTY_USD = env_float("DEFAULT_STOP_PENALTY_USD", 1.5)
+DEFAULT_TIME_VALUE_USD_PER_HOUR = env_float("DEFAULT_TIME_VALUE_USD_PER_HOUR", 60.0)
+DEFAULT_REFINE_DETOURS = env_bool("DEFAULT_REFINE_DETOURS", False)
+DETOUR_REFINEMENT_MAX_CANDIDATES = env_int("DETOUR_REFINEMENT_MAX_CANDIDATES", 50)
 ENFORCE_ASSIGNMENT_CONSTRAINTS = env_bool("ENFORCE_ASSIGNMENT_CONSTRAINTS", True)
 ASSIGNMENT_REQUIRED_MPG = env_float("ASSIGNMENT_REQUIRED_MPG", 10.0)
 ASSIGNMENT_REQUIRED_MAX_RANGE_MILES = env_float("ASSIGNMENT_REQUIRED_MAX_RANGE_MILES", 500.0)
@@ -166,3 +169,25 @@ GEOLOOKUP_USER_AGENT = os.getenv(
 MAP_PROVIDER = os.getenv("MAP_PROVIDER", "auto").strip().lower()
 MAPBOX_ACCESS_TOKEN = os.getenv("MAPBOX_ACCESS_TOKEN", "")
 MAPBOX_DIRECTIONS_PROFILE = os.getenv("MAPBOX_DIRECTIONS_PROFILE", "driving")
+
+SINGLE_FLIGHT_SHARED_LOCK = env_bool("SINGLE_FLIGHT_SHARED_LOCK", False)
+SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS = env_int("SINGLE_FLIGHT_LOCK_TIMEOUT_SECONDS", 30)
+
+ROUTE_STORE_ENABLED = env_bool("ROUTE_STORE_ENABLED", True)
+ROUTE_STORE_MAX_BYTES = env_int("ROUTE_STORE_MAX_BYTES", 256 * 1024 * 1024)
+ROUTE_STORE_EVICT_EVERY = env_int("ROUTE_STORE_EVICT_EVERY", 50)
+ROUTE_MAX_WAYPOINTS_PER_REQUEST = env_int("ROUTE_MAX_WAYPOINTS_PER_REQUEST", 25)
+ROUTE_LEG_MAX_WORKERS = env_int("ROUTE_LEG_MAX_WORKERS", 4)
+LOCAL_ROAD_GRAPH_PATH = os.getenv("LOCAL_ROAD_GRAPH_PATH", str(BASE_DIR / "data" / "road-graph.bin"))
+CITY_INDEX_PATH = os.getenv("CITY_INDEX_PATH", str(BASE_DIR / "data" / "city-index.bin"))
+GEOCODE_FUZZY_MIN_CONFIDENCE = env_float("GEOCODE_FUZZY_MIN_CONFIDENCE", 0.75)
+GEOCODE_STORE_ENABLED = env_bool("GEOCODE_STORE_ENABLED", True)
+GEOCODE_NEGATIVE_TTL_SECONDS = env_int("GEOCODE_NEGATIVE_TTL_SECONDS", 60 * 60)
+NOMINATIM_MAX_REQUESTS_PER_SECOND = env_float("NOMINATIM_MAX_REQUESTS_PER_SECOND", 1.0)
+NOMINATIM_MAX_QUEUE_SECONDS = env_float("NOMINATIM_MAX_QUEUE_SECONDS", 10.0)
+GEOCODE_BATCH_MAX_LOCATIONS = env_int("GEOCODE_BATCH_MAX_LOCATIONS", 100)
+GEOCODE_BATCH_MAX_WORKERS = env_int("GEOCODE_BATCH_MAX_WORKERS", 4)
+PLANNER_MAX_WORKERS = env_int("PLANNER_MAX_WORKERS", 4)
+PLANNER_WARMUP_ON_STARTUP = env_bool("PLANNER_WARMUP_ON_STARTUP", False)
+TRIP_PLAN_BATCH_MAX_ITEMS = env_int("TRIP_PLAN_BATCH_MAX_ITEMS", 200)
+TRIP_PLAN_BATCH_MAX_WORKERS = env_int("TRIP_PLAN_BATCH_MAX_WORKERS", 4)
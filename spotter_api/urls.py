@@ -19,6 +19,22 @@ def root(_request):
                     "method": "POST",
                     "path": "/api/trip-plan/",
                 },
+                "trip_plan_batch": {
+                    "method": "POST",
+                    "path": "/api/trip-plans/batch/",
+                },
+                "geocode_batch": {
+                    "method": "POST",
+                    "path": "/api/geocode/batch/",
+                },
+                "location_suggest": {
+                    "method": "GET",
+                    "path": "/api/locations/suggest/?q=",
+                },
+                "price_summary": {
+                    "method": "GET",
+                    "path": "/api/prices/summary/",
+                },
                 "schema": "/api/schema/",
                 "swagger_ui": "/api/docs/swagger/",
                 "redoc": "/api/docs/redoc/",
@@ -7,10 +7,22 @@ For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 """
 
+import logging
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "spotter_api.settings")
 
 application = get_wsgi_application()
+
+if settings.PLANNER_WARMUP_ON_STARTUP:
+    # Under a preloading server this runs once before forking, so workers share the structures.
+    from planner.services.warmup import warm_up
+
+    try:
+        warm_up()
+    except Exception:
+        # Warm-up is an optimisation: everything it builds is built lazily on first use anyway.
+        logging.getLogger(__name__).exception("Planner warm-up failed; continuing without it")